@@ -0,0 +1,38 @@
+"""批处理：健康检查的一组命令逐条发送与用 batch 一次往返执行的耗时对比，
+分别在本机回环和经过 LatencyProxy 模拟的Wi-Fi往返时延下测量。
+"""
+from harness import Simulator, measure, parser, report
+
+COMMANDS = ["wifistatus", "sysinfo", "time", "ls"]
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--rtt", type=float, default=20, help="模拟的往返时延（毫秒），默认20")
+    p.add_argument("--devices", type=int, default=1, help="模拟依次检查的设备数，默认1")
+    args = p.parse_args()
+
+    rows = []
+    with Simulator() as sim:
+        for rtt in sorted({0, args.rtt / 1000}):
+            client = sim.client(rtt=rtt)
+
+            def sequential():
+                for _ in range(args.devices):
+                    for command in COMMANDS:
+                        assert client.send_command(command) is not None, f"{command} 失败"
+
+            def batched():
+                for _ in range(args.devices):
+                    results = client.batch(COMMANDS)
+                    assert results and all(result["ok"] for result in results), "批处理失败"
+
+            one_by_one, _ = measure(sequential, args.repeat)
+            batch, _ = measure(batched, args.repeat)
+            client.disconnect()
+            rows.append((f"{rtt * 1000:g}", len(COMMANDS) * args.devices, one_by_one * 1000, args.devices,
+                         batch * 1000, one_by_one / batch))
+    report(f"健康检查 {', '.join(COMMANDS)}（{args.devices} 台设备）",
+           ("RTT ms", "逐条请求数", "逐条 ms", "批处理请求数", "批处理 ms", "加速"), rows)
+
+if __name__ == "__main__":
+    main()
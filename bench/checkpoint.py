@@ -0,0 +1,44 @@
+"""上传检查点：每块都保存传输状态（原做法）与按字节数、时间批量保存的检查点策略对比，
+比较上传吞吐量和闪存写入次数（检查点写入、日志写入均来自设备端的 stats 统计）。
+"""
+import os
+import tempfile
+
+from harness import Simulator, measure, parser, payload, report, server_stats
+
+# (名称, CHECKPOINT_BYTES, CHECKPOINT_INTERVAL)；间隔为0时每收到一块就保存，即原来的逐块保存
+POLICIES = (
+    ("逐块（原做法）", 1024, 0),
+    ("4KB", 4096, 5),
+    ("16KB/5s（默认）", 16384, 5),
+    ("64KB/30s", 65536, 30),
+)
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--size", type=int, default=256, help="上传的数据大小（KB），默认256")
+    p.add_argument("--window", type=int, default=8, help="传输窗口，默认8")
+    args = p.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as local:
+        source = os.path.join(local, "source.bin")
+        with open(source, "wb") as f:
+            f.write(payload(args.size * 1024))
+        for name, every_bytes, every_seconds in POLICIES:
+            settings = {"CHECKPOINT_BYTES": every_bytes, "CHECKPOINT_INTERVAL": every_seconds}
+            with Simulator(settings) as sim:
+                client = sim.client(window=args.window, compress=False)
+                client.stats(reset=True)
+                elapsed, ok = measure(lambda: client.upload(source, "upload.bin"), args.repeat)
+                assert ok, "上传失败"
+                sections = server_stats(client)["sections"]
+                client.disconnect()
+            checkpoints = sections.get("checkpoint", {}).get("count", 0) / args.repeat
+            log_flushes = sections.get("log_flush", {}).get("count", 0) / args.repeat
+            rows.append((name, args.size / elapsed, checkpoints, log_flushes, checkpoints + log_flushes))
+    report(f"上传 {args.size} KB（窗口 {args.window}），每次上传的平均写入次数",
+           ("策略", "KB/s", "检查点写入", "日志写入", "合计"), rows)
+
+if __name__ == "__main__":
+    main()
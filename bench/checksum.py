@@ -0,0 +1,50 @@
+"""校验和：原来逐字节的 hash*31+byte 循环与 Checksum（binascii CRC32、纯Python CRC32后备、SHA-256）
+计算1MB数据的耗时对比，以及 calculate_file_hash 分块读取文件的耗时。
+"""
+from harness import load_firmware, measure, parser, payload, report
+
+# 原来的 calculate_hash（去掉了日志），作为对比基准
+def legacy_hash(data):
+    hash_value = 0
+    for byte in data:
+        hash_value = (hash_value * 31 + byte) % (2**32)
+    return hash_value
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--size", type=int, default=1024, help="数据大小（KB），默认1024")
+    p.set_defaults(repeat=3)
+    args = p.parse_args()
+
+    load_firmware()
+    from ep32.file_ops import Checksum, calculate_file_hash, _crc32_fallback
+
+    data = payload(args.size * 1024)
+    with open("data.bin", "wb") as f:
+        f.write(data)
+
+    def chunked(algorithm):
+        checksum = Checksum(algorithm)
+        view = memoryview(data)
+        for i in range(0, len(data), 1024):
+            checksum.update(view[i:i + 1024])
+        return checksum.hexdigest()
+
+    cases = (
+        ("原 hash*31+byte 循环", lambda: legacy_hash(data)),
+        ("纯Python CRC32（后备）", lambda: _crc32_fallback(data)),
+        ("Checksum crc32 分块", lambda: chunked("crc32")),
+        ("Checksum sha256 分块", lambda: chunked("sha256")),
+        ("calculate_file_hash crc32", lambda: calculate_file_hash("data.bin").hexdigest()),
+        ("calculate_file_hash sha256", lambda: calculate_file_hash("data.bin", "sha256").hexdigest()),
+    )
+    rows = []
+    baseline = None
+    for name, func in cases:
+        elapsed, _ = measure(func, args.repeat)
+        baseline = baseline or elapsed
+        rows.append((name, elapsed * 1000, args.size / 1024 / elapsed, baseline / elapsed))
+    report(f"计算 {args.size} KB 数据的校验和", ("方法", "ms", "MB/s", "加速"), rows)
+
+if __name__ == "__main__":
+    main()
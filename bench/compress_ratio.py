@@ -0,0 +1,45 @@
+"""传输压缩：开启与关闭压缩时下载（get）和上传（upload）的线路字节数、压缩率和耗时。
+线路字节数来自设备端 stats 的命令收发统计；本机回环上带宽不是瓶颈，另按 --link 估算Wi-Fi上的传输时间。
+"""
+import os
+import tempfile
+
+from harness import Simulator, measure, parser, payload, report, server_stats
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--size", type=int, default=128, help="数据大小（KB），默认128")
+    p.add_argument("--link", type=float, default=100, help="估算用的Wi-Fi有效带宽（KB/s），默认100")
+    p.set_defaults(repeat=3)
+    args = p.parse_args()
+
+    size = args.size * 1024
+    rows = []
+    with Simulator() as sim, tempfile.TemporaryDirectory() as local:
+        clients = {compress: sim.client(compress=compress) for compress in (False, True)}
+        for kind in ("text", "random"):
+            data = payload(size, kind)
+            source = os.path.join(local, "source.bin")
+            with open(source, "wb") as f:
+                f.write(data)
+            sim.write_file("download.bin", data)
+            for command in ("get", "upload"):
+                for compress, client in clients.items():
+                    def run():
+                        client.stats(reset=True)
+                        if command == "get":
+                            assert client.download("download.bin", os.path.join(local, "out.bin"), resume=False), "下载失败"
+                        else:
+                            assert client.upload(source, "upload.bin"), "上传失败"
+                        entry = server_stats(client)["commands"][command]
+                        return entry["tx"] if command == "get" else entry["rx"]
+                    elapsed, wire = measure(run, args.repeat)
+                    rows.append((kind, command, "开" if compress else "关", wire, size / wire,
+                                 elapsed * 1000, wire / 1024 / args.link * 1000))
+        for client in clients.values():
+            client.disconnect()
+    report(f"{args.size} KB 数据的压缩传输（text为日志/JSON样式文本，random不可压缩）",
+           ("数据", "命令", "压缩", "线路字节", "压缩率", "回环 ms", f"{args.link:g}KB/s估算 ms"), rows)
+
+if __name__ == "__main__":
+    main()
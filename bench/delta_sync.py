@@ -0,0 +1,64 @@
+"""增量同步：设备上已有旧版本文件时，sync 与完整 upload 在线路上传输的字节数和耗时对比。
+字节数来自设备端 stats 统计的命令收发字节（含签名和增量）；两者都关闭压缩，只比较增量的效果。
+"""
+import os
+import tempfile
+
+from harness import Simulator, measure, parser, payload, report, server_stats
+
+def edits(original):
+    """(名称, 新版本) 列表，模拟对脚本和配置文件的常见修改"""
+    data = bytearray(original)
+    one_byte = bytearray(data)
+    one_byte[len(data) // 2] ^= 1
+    scattered = bytearray(data)
+    for i in range(10):
+        position = (i * 2 + 1) * len(data) // 20
+        scattered[position:position + 8] = b"modified"
+    return (
+        ("改1字节", bytes(one_byte)),
+        ("10处小修改", bytes(scattered)),
+        ("开头插入100字节", b"#" * 100 + original),
+        ("末尾追加1KB", original + payload(1024, "text", seed=3)),
+        ("整个文件重写", payload(len(original), "text", seed=4)),
+    )
+
+def transferred(client, command):
+    """设备上一条命令收发的字节数"""
+    entry = server_stats(client, reset=True)["commands"].get(command, {})
+    return entry.get("rx", 0) + entry.get("tx", 0)
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--size", type=int, default=64, help="文件大小（KB），默认64")
+    p.add_argument("--block", type=int, default=512, help="同步的块大小（字节），64-4096，默认512")
+    p.set_defaults(repeat=3)
+    args = p.parse_args()
+
+    original = payload(args.size * 1024, "text")
+    rows = []
+    with Simulator() as sim, tempfile.TemporaryDirectory() as local:
+        client = sim.client(compress=False)
+        source = os.path.join(local, "config.txt")
+        for name, data in edits(original):
+            with open(source, "wb") as f:
+                f.write(data)
+            results = []
+            for method in ("upload", "sync"):
+                def run():
+                    sim.write_file("config.txt", original)
+                    client.stats(reset=True)
+                    if method == "upload":
+                        assert client.upload(source, "config.txt"), "上传失败"
+                    else:
+                        assert client.sync(source, "config.txt", args.block), "同步失败"
+                    return transferred(client, method)
+                elapsed, wire = measure(run, args.repeat)
+                results += [wire, elapsed * 1000]
+            rows.append((name, len(data), *results, results[0] / results[2]))
+        client.disconnect()
+    report(f"{args.size} KB 文件的增量同步（块大小 {args.block}）",
+           ("修改", "文件字节", "upload字节", "upload ms", "sync字节", "sync ms", "字节节省倍数"), rows)
+
+if __name__ == "__main__":
+    main()
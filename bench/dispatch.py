@@ -0,0 +1,61 @@
+"""命令分派：原 if/elif 链（每个分支重新解码并比较字符串）与命令注册表查表的单条命令耗时对比。
+原链已被替换，这里按注册顺序逐个解码、比较来重现它的开销；另测 handle_client_command 的完整处理耗时。
+"""
+import runpy
+import time
+
+from harness import load_firmware, parser, report
+
+COMMANDS = ["hello", "time", "debug status", "resume x", "bogus"]
+
+# 回复直接丢弃
+class NullSocket:
+    def send(self, data):
+        return len(data)
+
+    sendall = send
+
+def per_call(func, data, count):
+    """执行count次，返回每次的平均耗时（微秒）"""
+    started = time.perf_counter()
+    for _ in range(count):
+        func(data)
+    return (time.perf_counter() - started) / count * 1000000
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--count", type=int, default=20000, help="每条命令执行的次数，默认20000")
+    args = p.parse_args()
+
+    load_firmware()
+    import sim
+    from ep32 import commands
+    boot = runpy.run_path(sim.BOOT_FILE, run_name="bench")
+    handle = boot["handle_client_command"]
+    names = list(commands._commands)
+
+    def linear_dispatch(data):
+        # 原链的每个分支都调用一次data.decode()，匹配整条命令或"命令名 "前缀
+        for name in names:
+            text = data.decode()
+            if text == name or text.startswith(name + " "):
+                return name
+        return None
+
+    cl = NullSocket()
+    credentials = {"username": "root", "password": "root"}
+    session = {"window": 1, "compress": False, "frame": False}
+    rows = []
+    for command in COMMANDS:
+        data = command.encode()
+        position = names.index(command.split()[0]) + 1 if command.split()[0] in names else len(names)
+        old = min(per_call(linear_dispatch, data, args.count) for _ in range(args.repeat))
+        new = min(per_call(commands.find_command, data, args.count) for _ in range(args.repeat))
+        full = min(per_call(lambda d: handle(cl, d, credentials, session), data, args.count // 10)
+                   for _ in range(args.repeat))
+        rows.append((command, position, old, new, old / new, full))
+    report(f"单条命令的分派耗时（微秒，共注册 {len(names)} 个命令名）",
+           ("命令", "链中比较次数", "原if/elif链", "注册表查表", "加速", "完整处理"), rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""基准测试的公共部分：启动模拟器、连接客户端、计时和输出结果。
+
+每个脚本测一项优化，在仓库根目录运行，如 python bench/window.py --help。
+Simulator 在子进程中运行 python -m sim，脚本与访问真实设备一样通过TCP连接；
+load_firmware() 在当前进程中加载固件模块，用于不经网络的微基准和内存统计。
+结果是本机CPython上的相对比较，绝对数值与设备不同。
+"""
+import argparse
+import http.server
+import json
+import os
+import queue
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import l
+from l import ESP32Client, ESP32Session
+
+# 客户端在l.py中逐条打印交互信息，基准测试只输出结果
+l.print = lambda *args, **kwargs: None
+
+def parser(description):
+    """命令行参数：--repeat 为每项测量的重复次数，脚本可以再添加自己的参数"""
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("--repeat", type=int, default=5, help="每项测量重复的次数，取中位数，默认5")
+    return p
+
+def free_port():
+    """取一个本机空闲的TCP端口"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def payload(size, kind="random", seed=1):
+    """生成确定的测试数据：random 为不可压缩的随机字节，text 为类似日志和JSON的可压缩文本"""
+    rng = random.Random(seed)
+    if kind == "random":
+        return rng.randbytes(size)
+    lines = []
+    length = 0
+    while length < size:
+        line = (f"[2026-10-18 12:{rng.randrange(60):02d}:{rng.randrange(60):02d}] D "
+                f'{{"cmd": "{rng.choice(("ls", "time", "get", "upload", "sysinfo"))}", '
+                f'"bytes": {rng.randrange(100000)}, "ms": {rng.randrange(1000)}}}\n')
+        lines.append(line)
+        length += len(line)
+    return "".join(lines).encode()[:size]
+
+def measure(func, repeat=5):
+    """执行func repeat次，返回 (各次耗时的中位数（秒）, 最后一次的返回值)"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+def report(title, header, rows):
+    """按列对齐输出一张结果表，数值保留两位小数"""
+    cells = [[f"{value:.2f}" if isinstance(value, float) else str(value) for value in row] for row in rows]
+    widths = [max(len(str(h)), *(len(row[i]) for row in cells)) for i, h in enumerate(header)]
+    print(f"\n{title}")
+    print("  ".join(str(h).rjust(w) for h, w in zip(header, widths)))
+    for row in cells:
+        print("  ".join(cell.rjust(w) for cell, w in zip(row, widths)))
+
+# ipinfo.io/json 的响应
+IPINFO = {"ip": "203.0.113.7", "city": "Hangzhou", "region": "Zhejiang", "country": "CN",
+          "loc": "30.2936,120.1614", "timezone": "Asia/Shanghai"}
+
+def wttr_payload(days=3, seed=1):
+    """与wttr.in format=j1结构相同的天气响应（dict）：当前天气和多日逐3小时预报，序列化后几十KB"""
+    rng = random.Random(seed)
+
+    def condition():
+        return {
+            "FeelsLikeC": str(rng.randrange(-5, 35)), "cloudcover": str(rng.randrange(100)),
+            "humidity": str(rng.randrange(20, 100)), "precipMM": f"{rng.random() * 5:.1f}",
+            "pressure": str(rng.randrange(990, 1030)), "temp_C": str(rng.randrange(-5, 35)),
+            "uvIndex": str(rng.randrange(11)), "visibility": str(rng.randrange(1, 20)),
+            "weatherCode": "116", "weatherDesc": [{"value": "Partly cloudy"}],
+            "lang_zh": [{"value": "局部多云"}], "winddir16Point": "NE", "windspeedKmph": str(rng.randrange(40)),
+        }
+
+    current = condition()
+    current["observation_time"] = "04:12 AM"
+    weather = []
+    for day in range(days):
+        hourly = []
+        for hour in range(8):
+            entry = condition()
+            entry["time"] = str(hour * 300)
+            for name in ("DewPointC", "HeatIndexC", "WindChillC", "WindGustKmph", "chanceoffog", "chanceoffrost",
+                         "chanceofhightemp", "chanceofovercast", "chanceofrain", "chanceofremdry", "chanceofsnow",
+                         "chanceofsunshine", "chanceofthunder", "chanceofwindy", "diffRad", "shortRad", "winddirDegree"):
+                entry[name] = str(rng.randrange(100))
+            hourly.append(entry)
+        weather.append({"date": f"2026-10-{18 + day}", "maxtempC": "24", "mintempC": "15", "sunHour": "8.7",
+                        "astronomy": [{"sunrise": "06:02 AM", "sunset": "05:31 PM", "moon_phase": "Waxing Gibbous"}],
+                        "hourly": hourly})
+    return {"current_condition": [current],
+            "nearest_area": [{"areaName": [{"value": IPINFO["city"]}], "country": [{"value": "China"}]}],
+            "request": [{"query": "Lat 30.29 and Lon 120.16", "type": "LatLon"}],
+            "weather": weather}
+
+class StandinServer:
+    """本地HTTP替身服务器，配合模拟器的urequests.standin离线测试联网功能（请求路径为 /<原主机><原路径>）。
+    routes 为 路径前缀 -> 响应体（bytes），hits 记录每个前缀的请求次数；
+    delay 为每次响应前的等待（秒），status 为返回的状态码，都可以随时修改"""
+
+    def __init__(self, routes, delay=0, status=200):
+        self.routes = routes
+        self.delay = delay
+        self.status = status
+        self.hits = {prefix: 0 for prefix in routes}
+        standin = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(standin.delay)
+                for prefix, body in standin.routes.items():
+                    if self.path.startswith(prefix):
+                        standin.hits[prefix] += 1
+                        self.send_response(standin.status)
+                        self.send_header("Content-Type", "application/json")
+                        self.send_header("Content-Length", str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                        return
+                self.send_error(404)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.address = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def weather(cls, **options):
+        """提供ipinfo.io和wttr.in的替身服务器"""
+        return cls({"/ipinfo.io/": json.dumps(IPINFO).encode(),
+                    "/wttr.in/": json.dumps(wttr_payload()).encode()}, **options)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class LatencyProxy:
+    """在客户端和模拟器之间转发TCP数据，每个方向延迟 rtt/2 秒，模拟Wi-Fi的往返时延；
+    本机回环几乎没有时延，逐块确认、批处理这类减少往返次数的优化需要经过它才能体现"""
+
+    def __init__(self, port, rtt):
+        self.target = ("127.0.0.1", port)
+        self.delay = rtt / 2
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                downstream, _ = self.server.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self.target)
+            for s in (downstream, upstream):
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(downstream, upstream)
+            self._pipe(upstream, downstream)
+
+    def _pipe(self, src, dst):
+        """一个方向的转发：读线程给数据打上到期时间，写线程到期后发出，数据顺序不变"""
+        pending = queue.Queue()
+
+        def read():
+            while True:
+                try:
+                    data = src.recv(65536)
+                except OSError:
+                    data = b""
+                pending.put((time.monotonic() + self.delay, data))
+                if not data:
+                    return
+
+        def write():
+            while True:
+                due, data = pending.get()
+                wait = due - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    if not data:
+                        dst.shutdown(socket.SHUT_WR)
+                        return
+                    dst.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+    def close(self):
+        self.server.close()
+
+class Simulator:
+    """在子进程中运行模拟器：settings 为覆盖 ep32.config 的配置项，http 为urequests替身服务器的 (主机, 端口)。
+    用作上下文管理器，退出时停止进程并删除模拟闪存目录"""
+
+    def __init__(self, settings=None, trace_heap=False, http=None, metrics=False):
+        self.settings = settings or {}
+        self.trace_heap = trace_heap
+        self.http = http
+        self.metrics_port = free_port() if metrics else 0
+        self.port = free_port()
+        self._dir = tempfile.TemporaryDirectory(prefix="esp32-bench-")
+        self.root = os.path.join(self._dir.name, "flash")
+        self.log_name = os.path.join(self._dir.name, "sim.log")
+        self.process = None
+        self._proxies = {}
+
+    def start(self, timeout=15):
+        """启动模拟器并等待端口可以连接"""
+        command = [sys.executable, "-m", "sim", "--root", self.root, "--port", str(self.port),
+                   "--metrics-port", str(self.metrics_port)]
+        for name, value in self.settings.items():
+            command += ["--set", f"{name}={value!r}"]
+        if self.trace_heap:
+            command.append("--trace-heap")
+        if self.http:
+            command += ["--http", f"{self.http[0]}:{self.http[1]}"]
+        with open(self.log_name, "ab") as log:
+            self.process = subprocess.Popen(command, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"模拟器启动失败:\n{self.log()[-2000:]}")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.1)
+        self.stop()
+        raise RuntimeError(f"模拟器在{timeout}秒内没有开始监听")
+
+    def stop(self):
+        """停止模拟器进程，模拟闪存中的文件保留到退出上下文"""
+        for proxy in self._proxies.values():
+            proxy.close()
+        self._proxies.clear()
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        self._dir.cleanup()
+
+    def log(self):
+        """模拟器的输出（固件日志）"""
+        with open(self.log_name, encoding="utf-8", errors="replace") as f:
+            return f.read()
+
+    def path(self, name):
+        """模拟闪存中文件的路径"""
+        return os.path.join(self.root, name)
+
+    def write_file(self, name, data):
+        """直接在模拟闪存中放一个文件"""
+        with open(self.path(name), "wb") as f:
+            f.write(data)
+
+    def address(self, rtt=0):
+        """客户端连接的端口，rtt（秒）不为0时经过模拟该往返时延的LatencyProxy"""
+        if not rtt:
+            return self.port
+        if rtt not in self._proxies:
+            self._proxies[rtt] = LatencyProxy(self.port, rtt)
+        return self._proxies[rtt].port
+
+    def client(self, rtt=0, **options):
+        """连接到模拟器，options 为 ESP32Client 的参数（window、compress、framed）"""
+        client = ESP32Client("127.0.0.1", self.address(rtt), **options)
+        if not client.connect():
+            raise RuntimeError("无法连接到模拟器")
+        return client
+
+def server_stats(client, reset=False):
+    """读取设备端的运行统计（见 ESP32Client.stats），reset 为True时读取后清空"""
+    result = client.stats()
+    if reset:
+        client.stats(reset=True)
+    return result
+
+def load_firmware(settings=None, root=None):
+    """在当前进程中加载固件：安装模拟模块，覆盖配置，切换到模拟闪存目录（默认新建临时目录）。
+    必须在导入 ep32 的其他模块之前调用；默认只记录错误日志，避免打印掩盖结果"""
+    import sim
+    sim.install()
+    import ep32.config as config
+    settings = dict({"LOG_LEVEL": "error"}, **(settings or {}))
+    for name, value in settings.items():
+        if not hasattr(config, name):
+            raise ValueError(f"未知的配置项: {name}")
+        setattr(config, name, value)
+    root = root or tempfile.mkdtemp(prefix="esp32-bench-")
+    os.chdir(root)
+    return root
@@ -0,0 +1,62 @@
+"""天气响应解析：原来用 response.json() 解析完整的wttr.in响应，现在用 scan_json 从响应流中只提取需要的字段，
+比较解析期间的内存峰值（模拟器中gc.mem_alloc()在跟踪时即tracemalloc的统计）和耗时。
+响应由本地替身服务器提供，按预报天数改变大小。
+"""
+import json
+import time
+import tracemalloc
+
+from harness import StandinServer, load_firmware, parser, report, wttr_payload
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--days", default="1,3,7", help="预报天数，逗号分隔，默认1,3,7（响应越大差距越明显）")
+    args = p.parse_args()
+
+    load_firmware()
+    import urequests
+    from ep32.jsonscan import scan_json
+    from ep32.utils import _WEATHER_FIELDS
+
+    def full_parse(response):
+        data = response.json()
+        values = {}
+        for path in _WEATHER_FIELDS.values():
+            value = data
+            for key in path:
+                value = value[key]
+            values[path] = value
+        return values
+
+    def streaming(response):
+        try:
+            return scan_json(response.raw, _WEATHER_FIELDS.values())
+        finally:
+            response.close()
+
+    rows = []
+    for days in (int(d) for d in args.days.split(",")):
+        body = json.dumps(wttr_payload(days)).encode()
+        with StandinServer({"/wttr.in/": body}) as server:
+            urequests.standin = server.address
+            results = []
+            for parse in (full_parse, streaming):
+                peaks = []
+                times = []
+                for _ in range(args.repeat):
+                    tracemalloc.start()
+                    started = time.perf_counter()
+                    values = parse(urequests.get("http://wttr.in/Hangzhou?format=j1"))
+                    times.append(time.perf_counter() - started)
+                    peaks.append(tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+                results.append((values, min(peaks), min(times)))
+        assert results[0][0] == results[1][0], "两种解析结果不一致"
+        (_, full_peak, full_time), (_, scan_peak, scan_time) = results
+        rows.append((days, len(body) // 1024, full_peak / 1024, scan_peak / 1024, full_peak / scan_peak,
+                     full_time * 1000, scan_time * 1000))
+    report(f"提取 {len(_WEATHER_FIELDS)} 个天气字段（含请求和响应流）",
+           ("预报天数", "响应KB", "json() 峰值KB", "scan_json 峰值KB", "峰值比", "json() ms", "scan_json ms"), rows)
+
+if __name__ == "__main__":
+    main()
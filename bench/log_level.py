@@ -0,0 +1,44 @@
+"""日志级别关闭时日志调用在热路径上的开销：原来先用f-string拼好消息再由 debug_log 判断是否记录，
+现在按 % 格式传入参数，级别不够时比较一次后直接返回；只为日志解码请求的代码由 log_enabled() 跳过。
+"""
+from harness import load_firmware, measure, parser, report
+
+# 原来的 debug_log：消息在调用前已格式化，函数内才判断是否记录
+DEBUG_MODE = False
+
+def legacy_debug_log(message):
+    if DEBUG_MODE:
+        print(message)
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--calls", type=int, default=200000, help="每项测量的调用次数，默认200000")
+    args = p.parse_args()
+
+    load_firmware({"LOG_LEVEL": "error"})
+    from ep32.logger import DEBUG, debug_log, log_enabled
+
+    sent, total, window = 8192, 262144, 8
+    addr = ("192.168.1.10", 50312)
+    data = b"upload firmware.bin"
+    calls = range(args.calls)
+
+    # (消息, 原做法, 现在的做法)，均为传输和命令处理中每块或每条命令执行的日志
+    cases = (
+        ("无参数", lambda: [legacy_debug_log("握手成功") for _ in calls],
+         lambda: [debug_log("握手成功") for _ in calls]),
+        ("三个参数", lambda: [legacy_debug_log(f"发送数据块: {sent}/{total} 字节，窗口: {window}") for _ in calls],
+         lambda: [debug_log("发送数据块: %s/%s 字节，窗口: %s", sent, total, window) for _ in calls]),
+        ("解码请求", lambda: [legacy_debug_log(f"接收到的数据({addr}): {data.decode()}") for _ in calls],
+         lambda: [debug_log("接收到的数据(%s): %s", addr, data.decode()) for _ in calls if log_enabled(DEBUG)]),
+    )
+    rows = []
+    for name, legacy, lazy in cases:
+        legacy_time, _ = measure(legacy, args.repeat)
+        lazy_time, _ = measure(lazy, args.repeat)
+        rows.append((name, legacy_time / args.calls * 1e9, lazy_time / args.calls * 1e9, legacy_time / lazy_time))
+    report(f"日志级别为 error 时每次 debug 日志调用的耗时（{args.calls} 次）",
+           ("消息", "f-string ns/次（原做法）", "惰性格式化 ns/次", "加速"), rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""调试日志：关闭日志、逐条写入闪存（原做法：每条日志打开、追加、关闭文件）与内存缓冲批量写入时的
+命令吞吐量和上传吞吐量，以及设备端 stats 统计的日志写入文件次数。
+"""
+import os
+import tempfile
+
+from harness import Simulator, measure, parser, payload, report, server_stats
+
+# (名称, 配置)；LOG_FLUSH_BYTES为1时每条日志都立即写入文件，即原来的做法
+CONFIGS = (
+    ("关闭（仅错误）", {"LOG_LEVEL": "error"}),
+    ("逐条写入（原做法）", {"LOG_LEVEL": "debug", "LOG_FLUSH_BYTES": 1}),
+    ("缓冲批量写入（默认）", {"LOG_LEVEL": "debug"}),
+)
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--commands", type=int, default=500, help="每轮发送的命令数，默认500")
+    p.add_argument("--size", type=int, default=128, help="上传的数据大小（KB），默认128")
+    p.set_defaults(repeat=3)
+    args = p.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as local:
+        source = os.path.join(local, "source.bin")
+        with open(source, "wb") as f:
+            f.write(payload(args.size * 1024))
+        for name, settings in CONFIGS:
+            with Simulator(settings) as sim:
+                client = sim.client(window=1, compress=False)
+                client.stats(reset=True)
+
+                def commands():
+                    for _ in range(args.commands):
+                        assert client.send_command("time") is not None, "命令失败"
+
+                command_time, _ = measure(commands, args.repeat)
+                upload_time, ok = measure(lambda: client.upload(source, "upload.bin"), args.repeat)
+                assert ok, "上传失败"
+                sections = server_stats(client)["sections"]
+                client.disconnect()
+            flushes = sections.get("log_flush", {}).get("count", 0)
+            lines = sections.get("log", {}).get("count", 0)
+            rows.append((name, args.commands / command_time, args.size / upload_time, lines, flushes))
+    report(f"日志对吞吐量的影响（{args.commands} 条 time 命令，上传 {args.size} KB，窗口1，各 {args.repeat} 轮）",
+           ("日志", "命令/秒", "上传 KB/s", "日志条数", "写入文件次数"), rows)
+
+if __name__ == "__main__":
+    main()
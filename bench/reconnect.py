@@ -0,0 +1,57 @@
+"""持久会话：首次响应时间（原来连接前先ping、再探测端口，与跳过探测直接连接对比），
+以及设备重启后 ESP32Session 恢复的时间（下一次请求时重连、空闲时由心跳重连）。
+"""
+import time
+
+from harness import ESP32Client, ESP32Session, Simulator, measure, parser, report
+
+def first_response(sim, probe):
+    client = ESP32Client("127.0.0.1", sim.port)
+    if probe:
+        assert client.test_connection() and client.test_port(), "探测失败"
+    assert client.connect(), "连接失败"
+    assert client.send_command("time") is not None, "命令失败"
+    client.disconnect()
+
+def restart(sim, downtime):
+    """重启模拟器，停机downtime秒，返回重新开始监听的时间"""
+    sim.stop()
+    time.sleep(downtime)
+    sim.start()
+    return time.perf_counter()
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--downtime", type=float, default=1, help="模拟设备重启时停机的秒数，默认1")
+    p.set_defaults(repeat=3)
+    args = p.parse_args()
+
+    with Simulator() as sim:
+        probed, _ = measure(lambda: first_response(sim, True), args.repeat)
+        direct, _ = measure(lambda: first_response(sim, False), args.repeat)
+        report("首次响应时间（连接、握手并完成一条命令）", ("方式", "ms"),
+               [("ping + 端口探测 + 连接（原做法）", probed * 1000), ("直接连接（--no-probe）", direct * 1000)])
+
+        rows = []
+        # 关闭心跳时由下一次请求发现断开并重连（发现断开的那次请求返回None）；开启心跳时空闲也会自动重连
+        for name, heartbeat in (("下一次请求", 0), ("心跳（间隔1秒）", 1)):
+            session = ESP32Session(ESP32Client("127.0.0.1", sim.port), heartbeat=heartbeat, backoff=0.2, max_backoff=1)
+            assert session.open(), "连接失败"
+            for _ in range(args.repeat):
+                old = session.client.socket
+                up = restart(sim, args.downtime)
+                failed = 0
+                if heartbeat:
+                    # 重连后客户端换用新的socket
+                    while session.client.socket is old or not session.client.connected:
+                        time.sleep(0.01)
+                else:
+                    while session.send_command("time") is None:
+                        failed += 1
+                rows.append((name, (time.perf_counter() - up) * 1000, failed))
+            session.close()
+    report(f"设备重启（停机 {args.downtime:g} 秒）后会话恢复的时间，从设备重新监听时算起",
+           ("恢复方式", "ms", "失败的请求"), rows)
+
+if __name__ == "__main__":
+    main()
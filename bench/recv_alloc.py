@@ -0,0 +1,107 @@
+"""接收路径的内存分配：原来每块 socket.recv() 新建bytes、内存模式下 data += chunk 拼接，
+现在复用预分配的bytearray（recv_into + memoryview）。比较每MB新建的接收缓冲区个数、内存峰值和耗时。
+客户端在子进程中发送，统计只包含固件一侧。两条路径都不保存传输状态，检查点的开销见 checkpoint.py。
+"""
+import os
+import socket
+import time
+import tracemalloc
+
+from harness import ESP32Client, load_firmware, parser, payload, report
+
+# 原来的 receive_chunked_data（去掉了日志和传输状态保存），作为对比基准
+def legacy_receive(socket, filename=None):
+    total_length = int(socket.recv(1024).decode())
+    socket.send("OK".encode())
+    received = 0
+    if filename:
+        with open(filename, "wb") as f:
+            while received < total_length:
+                chunk = socket.recv(1024)
+                f.write(chunk)
+                received += len(chunk)
+                socket.send("OK".encode())
+        return filename, total_length
+    data = b""
+    while received < total_length:
+        chunk = socket.recv(1024)
+        data += chunk
+        received += len(chunk)
+        socket.send("OK".encode())
+    return data.decode(), total_length
+
+# 统计接收调用：recv()每次返回新的bytes，recv_into()写入已有的缓冲区
+class CountingSocket:
+    def __init__(self, sock):
+        self.sock = sock
+        self.recv_calls = 0
+        self.recv_into_calls = 0
+
+    def recv(self, size):
+        self.recv_calls += 1
+        return self.sock.recv(size)
+
+    def recv_into(self, buffer, size=0):
+        self.recv_into_calls += 1
+        return self.sock.recv_into(buffer, size)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+def run(receive, data, window):
+    """客户端在子进程中发送data，当前进程调用receive(socket)接收；返回 (耗时, 内存峰值, CountingSocket)"""
+    ours, theirs = socket.socketpair()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ours.close()
+            client = ESP32Client("local", window=window, compress=False, framed=False)
+            client.socket = theirs
+            client.connected = True
+            client.send_chunked(data)
+        finally:
+            os._exit(0)
+    theirs.close()
+    counting = CountingSocket(ours)
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = receive(counting)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    os.waitpid(pid, 0)
+    ours.close()
+    assert result[1] == len(data), "接收长度不符"
+    return elapsed, peak, counting
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--size", type=int, default=1024, help="接收的数据大小（KB），默认1024")
+    p.set_defaults(repeat=1)
+    args = p.parse_args()
+
+    # 检查点间隔大于数据量，传输中不保存状态
+    load_firmware({"CHECKPOINT_BYTES": (args.size + 1) * 1024, "CHECKPOINT_INTERVAL": 3600})
+    from ep32.server import receive_chunked_data
+
+    # 文本数据，内存模式返回解码后的字符串
+    data = payload(args.size * 1024, "text")
+    megabytes = len(data) / (1 << 20)
+    cases = (
+        ("原做法", "文件", 1, lambda s: legacy_receive(s, "rx.bin")),
+        ("原做法", "内存", 1, lambda s: legacy_receive(s)),
+        ("recv_into", "文件", 1, lambda s: receive_chunked_data(s, "rx.bin", window=1)),
+        ("recv_into", "文件", 8, lambda s: receive_chunked_data(s, "rx.bin", window=8)),
+        ("recv_into", "内存", 1, lambda s: receive_chunked_data(s, window=1)),
+        ("recv_into", "内存", 8, lambda s: receive_chunked_data(s, window=8)),
+    )
+    rows = []
+    for name, target, window, receive in cases:
+        elapsed, peak, counting = min((run(receive, data, window) for _ in range(args.repeat)), key=lambda r: r[0])
+        rows.append((name, target, window, counting.recv_calls / megabytes, counting.recv_into_calls / megabytes,
+                     peak / 1024, elapsed * 1000))
+    report(f"接收 {args.size} KB（recv() 次数即新建的接收缓冲区个数）",
+           ("接收路径", "写入", "窗口", "recv()/MB", "recv_into()/MB", "峰值KB", "ms"), rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""滑动窗口传输：逐块确认（窗口1）与窗口N的上传、下载吞吐量对比。
+
+本机回环上往返时延接近0，默认同时测量经过LatencyProxy模拟Wi-Fi往返时延的情况。
+"""
+import os
+import tempfile
+
+from harness import Simulator, measure, parser, payload, report
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--size", type=int, default=128, help="传输的数据大小（KB），默认128")
+    p.add_argument("--rtt", type=float, default=10, help="模拟的往返时延（毫秒），默认10，0只测本机回环")
+    p.add_argument("--windows", default="1,2,4,8", help="比较的窗口大小，逗号分隔，默认1,2,4,8")
+    p.set_defaults(repeat=3)
+    args = p.parse_args()
+
+    data = payload(args.size * 1024)
+    windows = [int(w) for w in args.windows.split(",")]
+    rtts = sorted({0, args.rtt / 1000})
+    rows = []
+    with Simulator() as sim, tempfile.TemporaryDirectory() as local:
+        source = os.path.join(local, "source.bin")
+        with open(source, "wb") as f:
+            f.write(data)
+        sim.write_file("download.bin", data)
+        for rtt in rtts:
+            baseline = None
+            for window in windows:
+                # 随机数据不可压缩，关闭压缩只比较窗口的影响
+                client = sim.client(rtt=rtt, window=window, compress=False)
+                up, ok = measure(lambda: client.upload(source, "upload.bin"), args.repeat)
+                assert ok, "上传失败"
+                target = os.path.join(local, "download.bin")
+                down, ok = measure(lambda: client.download("download.bin", target, resume=False), args.repeat)
+                assert ok, "下载失败"
+                client.disconnect()
+                if baseline is None:
+                    baseline = (up, down)
+                rows.append((f"{rtt * 1000:g}", window, args.size / up, args.size / down,
+                             baseline[0] / up, baseline[1] / down))
+    report(f"{args.size} KB 传输吞吐量（上传、下载均包含校验和查询）",
+           ("RTT ms", "窗口", "上传 KB/s", "下载 KB/s", "上传加速", "下载加速"), rows)
+
+if __name__ == "__main__":
+    main()
@@ -1,289 +1,202 @@
 # main.py
 import time
-import network
-import machine
-import gc
-import esp32
-from ep32.config import DEBUG_MODE, DEBUG_LOG_FILE, MONITOR_INTERVAL
-from ep32.utils import debug_log, monitor_system_status, format_time, get_weather, get_ip_location
+import json
+from ep32.config import DEBUG_LOG_FILE, MONITOR_INTERVAL, SERVER_MODE, LED_HEARTBEAT, LOG_TAIL_LINES
+from ep32.logger import log_buffer, flush_log, set_level, get_level, log_enabled, DEBUG
+from ep32.utils import debug_log, log_error, log_warn, monitor_system_status
 from ep32.wifi import connect_wifi
 from ep32.bluetooth import setup_bluetooth
-from ep32.server import start_server, handle_client_connection, send_chunked_data, receive_chunked_data
-from ep32.led import blink_led, led_on, led_off
-from ep32.file_ops import (
-    init_userpass, update_userpass, list_files, read_file, write_file, 
-    delete_file, get_transfer_status, delete_transfer_status
+from ep32.server import (
+    start_server, start_async_server, start_poll_server, start_metrics_server, wait_readable, handle_client_connection,
+    send_chunked_data, send_file_chunked, read_frame, run_framed_command, run_stream, CaptureSocket,
+    LogTail, LOG_TAIL_END
 )
+from ep32.led import blink_led, mute_blink, led_error, led_heartbeat, led_on, led_off
+from ep32.file_ops import init_userpass, gc_transfer_status
+from ep32.commands import command, find_command, help_text
+from ep32.cache import refresh_cache
+from ep32 import stats
+from ep32.timeseries import system_series
 
-# 处理客户端命令
-def handle_client_command(cl, data, credentials):
-    if data.decode() == "hello":
-        blink_led(times=1)  # 接收到数据后闪烁一次
-        cl.send('你好，esp32单片机'.encode())
-    elif data.decode() == "exit" or data.decode() == "Exit":
-        blink_led(times=1)
-        cl.send('本服务端即将关闭，请关闭此程序，再次打开服务端，请按esp32上的boot按键即可！'.encode())
-        cl.close()
-        led_off()
-        return False  # 返回False表示退出命令循环
-    elif data.decode() == "help":
-        blink_led(times=1)
-        cl.send("""
-可用命令:
-hello - 测试连接
-exit - 退出服务端
-help - 显示帮助信息
-ledon - 打开LED
-ledoff - 关闭LED
-blink <次数> <间隔> - 控制LED闪烁
-wifistatus - 查询Wi-Fi状态
-sysinfo - 显示系统信息
-reboot - 重启系统
-changepass <新密码> - 修改密码
-user1024 - 用户名验证
-passwd1024 - 密码验证
-time - 显示当前时间
-weather - 查询天气信息(自动定位)
-location - 查询位置信息
-ls - 列出文件
-cat <文件名> - 读取文件内容
-write <文件名> <内容> - 写入文件
-del <文件名> - 删除文件
-upload <文件名> - 上传文件
-get <文件名> - 下载文件
-resume <文件名> - 断点续传
-debug on - 开启调试模式
-debug off - 关闭调试模式
-debug status - 查看调试模式状态
-debug log - 查看调试日志
-debug clear - 清空调试日志
-""".encode())
-    elif data.decode() == "ledon":
-        led_on()
-        cl.send('LED已打开'.encode())
-    elif data.decode() == "ledoff":
-        led_off()
-        cl.send('LED已关闭'.encode())
-    elif data.decode().startswith("blink "):
-        try:
-            # 解析闪烁次数和间隔
-            params = data.decode()[6:].split()
-            times = int(params[0]) if len(params) > 0 else 1
-            interval = float(params[1]) if len(params) > 1 else 0.5
-            blink_led(times, interval)
-            cl.send(f'LED已闪烁{times}次，间隔{interval}秒'.encode())
-        except Exception as e:
-            debug_log(f"LED闪烁参数错误: {str(e)}")
-            cl.send('闪烁参数错误，格式: blink <次数> <间隔(秒)>'.encode())
-    elif data.decode() == "wifistatus":
-        wlan = network.WLAN(network.STA_IF)
-        if wlan.isconnected():
-            status = f"Wi-Fi已连接\nIP地址: {wlan.ifconfig()[0]}\n子网掩码: {wlan.ifconfig()[1]}\n网关: {wlan.ifconfig()[2]}\nDNS: {wlan.ifconfig()[3]}"
-            debug_log(f"Wi-Fi状态: 已连接, IP: {wlan.ifconfig()[0]}")
-        else:
-            status = "Wi-Fi未连接"
-            debug_log("Wi-Fi状态: 未连接")
-        cl.send(status.encode())
-    elif data.decode() == "sysinfo":
-        debug_log("获取系统信息")
-        freq = machine.freq()
-        mem_free = gc.mem_free()
-        mem_alloc = gc.mem_alloc()
-        try:
-            temp = esp32.raw_temperature()
-            temp_info = f"内部温度: {temp} °C"
-        except:
-            temp_info = "内部温度: 不可用"
-        try:
-            hall = esp32.hall_sensor()
-            hall_info = f"霍尔传感器: {hall}"
-        except AttributeError:
-            hall_info = "霍尔传感器: 不可用"
-        info = f"系统信息:\nCPU频率: {freq/1000000} MHz\n空闲内存: {mem_free} 字节\n已分配内存: {mem_alloc} 字节\n{temp_info}\n{hall_info}"
-        debug_log(f"系统信息: CPU频率: {freq/1000000} MHz, 空闲内存: {mem_free} 字节")
-        cl.send(info.encode())
-    elif data.decode().startswith("changepass "):
-        try:
-            # 解析新密码
-            new_password = data.decode()[11:].strip()
-            if new_password:
-                # 更新密码
-                credentials = update_userpass(credentials["username"], new_password)
-                cl.send('密码已更新'.encode())
-            else:
-                cl.send('密码不能为空'.encode())
-        except Exception as e:
-            debug_log(f"修改密码失败: {str(e)}")
-            cl.send('修改密码失败'.encode())
-    elif data.decode() == "user1024":
-        debug_log("请求用户名")
-        cl.send(credentials["username"].encode())
-    elif data.decode() == "passwd1024":
-        debug_log("请求密码")
-        cl.send(credentials["password"].encode())
-    elif data.decode() == "time":
-        current_time = time.time()
-        debug_log(f"请求当前时间: {format_time(current_time)}")
-        cl.send(f"当前时间: {format_time(current_time)}".encode())
-    elif data.decode() == "weather":
-        weather = get_weather()
-        if "error" in weather:
-            cl.send(weather["error"].encode())
-        else:
-            weather_info = f"位置: {weather['city']}, {weather['region']}, {weather['country']}\n"
-            weather_info += f"坐标: {weather['lat']}, {weather['lon']}\n"
-            weather_info += f"时区: {weather['timezone']}\n"
-            weather_info += f"温度: {weather['temperature']}°C\n"
-            weather_info += f"体感温度: {weather['feels_like']}°C\n"
-            weather_info += f"天气: {weather['description']}\n"
-            weather_info += f"湿度: {weather['humidity']}%\n"
-            weather_info += f"气压: {weather['pressure']} hPa\n"
-            weather_info += f"能见度: {weather['visibility']} km\n"
-            weather_info += f"紫外线指数: {weather['uv_index']}"
-            cl.send(weather_info.encode())
-    elif data.decode() == "location":
-        location = get_ip_location()
-        if "error" in location:
-            cl.send(location["error"].encode())
-        else:
-            location_info = f"国家: {location['country']}\n"
-            location_info += f"地区: {location['region']}\n"
-            location_info += f"城市: {location['city']}\n"
-            location_info += f"坐标: {location['lat']}, {location['lon']}\n"
-            location_info += f"时区: {location['timezone']}\n"
-            location_info += f"IP地址: {location['ip']}"
-            cl.send(location_info.encode())
-    elif data.decode() == "ls":
-        files = list_files()
-        cl.send(files.encode())
-    elif data.decode().startswith("cat "):
-        filename = data.decode()[4:].strip()
-        if filename:
-            content = read_file(filename)
-            if not content.startswith("读取文件错误"):
-                # 使用分块发送
-                if not send_chunked_data(cl, content):
-                    cl.send('文件发送失败'.encode())
-            else:
-                cl.send(content.encode())
-        else:
-            cl.send('请指定文件名'.encode())
-    elif data.decode().startswith("write "):
-        try:
-            params = data.decode()[6:].split(maxsplit=1)
-            if len(params) >= 2:
-                filename, content = params[0], params[1]
-                result = write_file(filename, content)
-                cl.send(result.encode())
-            else:
-                cl.send('格式: write <文件名> <内容>'.encode())
-        except Exception as e:
-            debug_log(f"写入文件错误: {str(e)}")
-            cl.send(f'写入文件错误: {str(e)}'.encode())
-    elif data.decode().startswith("del "):
-        filename = data.decode()[4:].strip()
-        if filename:
-            result = delete_file(filename)
-            cl.send(result.encode())
-        else:
-            cl.send('请指定文件名'.encode())
-    elif data.decode().startswith("upload "):
-        filename = data.decode()[7:].strip()
-        if filename:
-            # 检查是否已有传输状态
-            transfer_status = get_transfer_status()
-            if transfer_status and transfer_status["filename"] == filename:
-                # 断点续传
-                cl.send(f"RESUME:{transfer_status['position']}:{transfer_status['total_size']}".encode())
-                # 接收文件数据
-                received_filename, received_size = receive_chunked_data(cl, filename, transfer_status["position"])
-                if received_filename:
-                    cl.send(f"文件 {filename} 上传成功，共 {received_size} 字节".encode())
-                else:
-                    cl.send("文件上传失败".encode())
-            else:
-                # 新上传
-                cl.send("READY".encode())
-                # 接收文件数据
-                received_filename, received_size = receive_chunked_data(cl, filename)
-                if received_filename:
-                    cl.send(f"文件 {filename} 上传成功，共 {received_size} 字节".encode())
-                else:
-                    cl.send("文件上传失败".encode())
-        else:
-            cl.send('请指定文件名'.encode())
-    elif data.decode().startswith("get "):
-        filename = data.decode()[4:].strip()
-        if filename:
-            if filename in os.listdir():
-                # 读取文件内容
-                with open(filename, "rb") as f:
-                    content = f.read()
-                # 发送文件大小
-                cl.send(str(len(content)).encode())
-                # 等待客户端确认
-                ack = cl.recv(10)
-                if ack.decode() == "OK":
-                    # 分块发送文件内容
-                    chunk_size = 1024
-                    for i in range(0, len(content), chunk_size):
-                        chunk = content[i:i+chunk_size]
-                        cl.send(chunk)
-                        # 等待客户端确认
-                        ack = cl.recv(10)
-                        if ack.decode() != "OK":
-                            break
-                    cl.send("COMPLETE".encode())
-                else:
-                    cl.send("文件下载失败".encode())
-            else:
-                cl.send("文件不存在".encode())
-        else:
-            cl.send('请指定文件名'.encode())
-    elif data.decode().startswith("resume "):
-        filename = data.decode()[7:].strip()
-        if filename:
-            # 检查是否已有传输状态
-            transfer_status = get_transfer_status()
-            if transfer_status and transfer_status["filename"] == filename:
-                cl.send(f"FOUND:{transfer_status['position']}:{transfer_status['total_size']}".encode())
-            else:
-                cl.send("NOTFOUND".encode())
-        else:
-            cl.send('请指定文件名'.encode())
-    # 调试命令
-    elif data.decode() == "debug on":
-        global DEBUG_MODE
-        DEBUG_MODE = True
+# 批处理中不能执行的命令：需要与客户端交互的传输命令，以及退出和嵌套批处理
+BATCH_EXCLUDED = ("exit", "Exit", "debug log", "debug tail", "upload ", "get ", "cat ", "sync ", "batch ")
+
+# 依次执行一组命令，收集每条命令的输出
+def run_batch(commands, credentials, session=None):
+    # 批处理内的命令直接返回文本，不走分块压缩
+    batch_session = dict(session) if session else {"window": 1}
+    batch_session["compress"] = False
+    results = []
+    # 批处理期间不为每条命令排队闪烁
+    mute_blink(True)
+    try:
+        for command in commands:
+            command = str(command)
+            if command.startswith(BATCH_EXCLUDED):
+                results.append({"cmd": command, "ok": False, "output": "批处理中不支持该命令"})
+                continue
+            capture = CaptureSocket()
+            try:
+                handler, _, args = find_command(command.encode())
+                if handler is None:
+                    results.append({"cmd": command, "ok": False, "output": "未知命令"})
+                    continue
+                batch_session["credentials"] = credentials
+                handler(capture, args, batch_session)
+                results.append({"cmd": command, "ok": True, "output": capture.getvalue().decode()})
+            except Exception as e:
+                log_error("批处理命令执行错误: %s: %s", command, e)
+                results.append({"cmd": command, "ok": False, "output": str(e)})
+    finally:
+        mute_blink(False)
+    return results
+
+# 测试连接命令
+@command("hello", help="hello - 测试连接")
+def cmd_hello(cl, args, session):
+    blink_led(times=1)  # 接收到数据后闪烁一次
+    cl.send('你好，esp32单片机'.encode())
+
+# 心跳命令，客户端空闲时用来确认连接仍然可用，不闪烁LED
+@command("ping", help="ping - 心跳检测")
+def cmd_ping(cl, args, session):
+    cl.send('pong'.encode())
+
+# 退出命令
+@command("exit", "Exit", help="exit - 退出服务端")
+def cmd_exit(cl, args, session):
+    blink_led(times=1)
+    cl.send('本服务端即将关闭，请关闭此程序，再次打开服务端，请按esp32上的boot按键即可！'.encode())
+    cl.close()
+    led_off()
+    return False  # 返回False表示退出命令循环
+
+# 帮助命令，列出所有已注册命令
+@command("help", help="help - 显示帮助信息")
+def cmd_help(cl, args, session):
+    blink_led(times=1)
+    cl.send(help_text().encode())
+
+# 批处理命令
+@command("batch", help="batch <JSON命令列表> - 批量执行命令，结果以JSON返回")
+def cmd_batch(cl, args, session):
+    try:
+        commands = json.loads(args)
+        if not isinstance(commands, list):
+            raise ValueError("需要命令列表")
+    except Exception as e:
+        cl.send(f'批处理格式错误: {str(e)}，格式: batch ["命令1", "命令2"]'.encode())
+        return
+    debug_log("批量执行 %s 条命令", len(commands))
+    results = run_batch(commands, session["credentials"], session)
+    if session["frame"]:
+        # 帧模式下响应自带长度，结果直接作为响应发送，整个批处理只需一次往返
+        cl.send(json.dumps(results).encode())
+    # 文本模式下结果可能超过一个数据包，按分块协议发送
+    elif not send_chunked_data(cl, json.dumps(results), window=session["window"], compress=session["compress"]):
+        cl.send('批处理结果发送失败'.encode())
+
+# 调试命令
+@command("debug", help="debug on - 开启调试模式\ndebug off - 关闭调试模式（只记录错误）\ndebug level <error|warn|info|debug|off> - 设置日志级别\ndebug status - 查看调试模式状态\ndebug log - 查看调试日志\ndebug tail [-n 条数] [-f] - 查看最近的日志，-f 持续跟随新日志\ndebug clear - 清空调试日志")
+def cmd_debug(cl, args, session):
+    action = args.strip()
+    if action == "on":
+        set_level(DEBUG)
         debug_log("调试模式已开启")
         cl.send('调试模式已开启'.encode())
-    elif data.decode() == "debug off":
+    elif action == "off":
         debug_log("调试模式即将关闭")
-        DEBUG_MODE = False
+        set_level("error")
         cl.send('调试模式已关闭'.encode())
-    elif data.decode() == "debug status":
-        status = "调试模式: " + ("开启" if DEBUG_MODE else "关闭")
+    elif action.startswith("level"):
+        level = action[5:].strip()
+        if set_level(level):
+            cl.send(f'日志级别: {level}'.encode())
+        else:
+            cl.send('格式: debug level <error|warn|info|debug|off>'.encode())
+    elif action == "status":
+        status = "调试模式: " + ("开启" if log_enabled(DEBUG) else "关闭") + f"，日志级别: {get_level()}"
         cl.send(status.encode())
-    elif data.decode() == "debug log":
+    elif action == "log":
         try:
-            with open(DEBUG_LOG_FILE, "r") as f:
-                log_content = f.read()
-            if not send_chunked_data(cl, log_content):
+            flush_log()
+            # 从文件流式发送，不把整个日志读入内存
+            if not send_file_chunked(cl, DEBUG_LOG_FILE, window=session["window"], compress=session["compress"]):
                 cl.send('日志发送失败'.encode())
         except Exception as e:
             cl.send(f'读取日志失败: {str(e)}'.encode())
-    elif data.decode() == "debug clear":
+    elif action.startswith("tail"):
+        params = action.split()[1:]
+        try:
+            lines = int(params[params.index("-n") + 1]) if "-n" in params else LOG_TAIL_LINES
+        except (ValueError, IndexError):
+            cl.send('格式: debug tail [-n 条数] [-f]'.encode())
+            return
+        # 从内存缓冲区取最近的日志，跟随模式下由会话循环继续推送新日志
+        tail = LogTail(cl, log_buffer.seq - min(max(0, lines), len(log_buffer.entries)))
+        tail.send_new()
+        if "-f" in params:
+            session["stream"] = tail
+        else:
+            cl.send(LOG_TAIL_END)
+    elif action == "clear":
         try:
-            with open(DEBUG_LOG_FILE, "w") as f:
-                f.write("")
+            log_buffer.clear()
             cl.send('调试日志已清空'.encode())
         except Exception as e:
             cl.send(f'清空日志失败: {str(e)}'.encode())
     else:
-        blink_led(times=1)
+        cl.send('格式: debug on|off|level|status|log|clear'.encode())
+
+# 运行统计命令
+@command("stats", help="stats - 查看各命令和关键环节的耗时与字节数统计\nstats reset - 清空统计")
+def cmd_stats(cl, args, session):
+    action = args.strip()
+    if action == "reset":
+        stats.reset()
+        cl.send('统计已清空'.encode())
+    elif action:
+        cl.send('格式: stats [reset]'.encode())
+    elif isinstance(cl, CaptureSocket):
+        # 批处理中直接返回文本
+        cl.send(stats.report().encode())
+    # 统计表可能超过一个数据包，按分块协议发送
+    elif not send_chunked_data(cl, stats.report(), window=session["window"], compress=session["compress"]):
+        cl.send('统计发送失败'.encode())
+
+# 监控样本查询命令，since为时间戳（秒），负数表示最近多少秒
+@command("metrics", help="metrics [since] - 以CSV返回时间戳晚于since的监控样本（负数表示最近多少秒）")
+def cmd_metrics(cl, args, session):
+    try:
+        since = int(args.strip() or 0)
+    except ValueError:
+        cl.send('格式: metrics [since]'.encode())
+        return
+    if since < 0:
+        since += int(time.time())
+    if isinstance(cl, CaptureSocket):
+        # 批处理中直接返回文本
+        cl.send(system_series.csv(since).encode())
+    # 样本可能超过一个数据包，按分块协议发送
+    elif not send_chunked_data(cl, system_series.csv(since), window=session["window"], compress=session["compress"]):
+        cl.send('监控样本发送失败'.encode())
+
+# 处理客户端命令：解码一次，按命令名查表分发
+def handle_client_command(cl, data, credentials, session=None):
+    if session is None:
+        session = {"window": 1, "compress": False}
+    session["credentials"] = credentials
+    handler, name, args = find_command(data)
+    if handler is None:
+        led_error()
         cl.send('错误，发送的指令不对！'.encode())
-    
-    return True  # 返回True表示继续命令循环
+        return True
+    # 按命令名统计耗时和字节数，未注册的命令不统计，统计表的大小不受客户端输入影响
+    started = stats.begin_command(name, len(data))
+    try:
+        return handler(cl, args, session) is not False  # 返回True表示继续命令循环
+    finally:
+        stats.end_command(started)
 
 # 主程序
 def main():
@@ -291,21 +204,41 @@ def main():
     
     # 初始化用户名和密码
     credentials = init_userpass()
-    debug_log(f"用户名初始化完成: {credentials['username']}")
+    debug_log("用户名初始化完成: %s", credentials['username'])
+    
+    # 清理过期的断点续传记录
+    gc_transfer_status()
     
     # 连接Wi-Fi
-    if not connect_wifi():
-        debug_log("Wi-Fi连接失败，系统将以离线模式运行")
+    wifi_connected = connect_wifi()
+    if not wifi_connected:
+        log_warn("Wi-Fi连接失败，系统将以离线模式运行")
 
     # 设置蓝牙
     bt = setup_bluetooth()
 
-    # 启动TCP服务器
+    # 连接成功后闪烁LED，失败时快速闪烁提示错误
+    if wifi_connected:
+        debug_log("Wi-Fi已连接，开始闪烁LED")
+        blink_led(times=3)  # Wi-Fi连接成功后，闪烁3次
+    else:
+        led_error()
+    if LED_HEARTBEAT:
+        led_heartbeat()
+
+    # 异步模式：多个客户端会话并发，监控任务独立运行
+    if SERVER_MODE == "async":
+        start_async_server(handle_client_command, credentials)
+        return
+
+    # 启动TCP服务器，以及供监控系统抓取的指标HTTP服务器
     server = start_server()
+    metrics = start_metrics_server()
 
-    # 连接成功后闪烁LED
-    debug_log("Wi-Fi已连接，开始闪烁LED")
-    blink_led(times=3)  # Wi-Fi连接成功后，闪烁3次
+    # poll模式：事件循环同时处理连接、握手、指标抓取和定时任务
+    if server and SERVER_MODE == "poll":
+        start_poll_server(server, handle_client_command, credentials, metrics)
+        return
 
     debug_log("进入主循环，等待客户端连接")
     
@@ -321,29 +254,52 @@ def main():
         # 等待客户端连接
         try:
             debug_log("等待客户端连接...")
+            # 空闲等待连接前把缓冲的日志写入闪存，刷新已过期的缓存
+            flush_log()
+            refresh_cache()
+            # 等待连接和命令期间回复指标抓取
+            if metrics:
+                wait_readable(server, metrics)
             cl, addr = server.accept()
             
-            # 处理客户端连接
-            if not handle_client_connection(cl, addr, credentials):
+            # 处理客户端连接，握手时协商会话参数
+            session = handle_client_connection(cl, addr, credentials)
+            if not session:
                 continue
                 
             # 接收客户端数据
             while True:
                 led_on()
                 try:
-                    data = cl.recv(1024)
-                    if not data:
+                    if metrics:
+                        wait_readable(cl, metrics)
+                    # 帧模式下按帧头读取完整的请求，文本模式下每次读取视为一条命令
+                    if session["frame"]:
+                        request = read_frame(cl)
+                        request_id, data = request if request else (0, None)
+                    else:
+                        data = cl.recv(1024) or None
+                    if data is None:
                         debug_log("客户端断开连接")
                         led_off()
                         break
-                    debug_log(f'接收到的数据: {data.decode()}')
+                    if log_enabled(DEBUG):
+                        debug_log('接收到的数据: %s', data.decode())
                     
                     # 处理命令
-                    if not handle_client_command(cl, data, credentials):
+                    if session["frame"]:
+                        keep = run_framed_command(cl, request_id, data, handle_client_command, credentials, session)
+                    else:
+                        keep = handle_client_command(cl, data, credentials, session)
+                    if not keep:
                         break
+                    # 日志跟随等数据流，直到客户端停止
+                    run_stream(session)
+                    # 回复客户端之后再刷新已过期的缓存
+                    refresh_cache()
                     
                 except OSError as e:
-                    debug_log(f"客户端断开连接: {str(e)}")
+                    debug_log("客户端断开连接: %s", e)
                     led_off()
                     try:
                         cl.close()
@@ -351,11 +307,15 @@ def main():
                         pass
                     break
         except OSError as e:
-            debug_log(f"接受连接时出错: {str(e)}")
+            log_error("接受连接时出错: %s", e)
             time.sleep(1)  # 等待一秒后继续尝试接受连接
         except Exception as e:
-            debug_log(f"未知错误: {str(e)}")
+            log_error("未知错误: %s", e)
             time.sleep(1)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # 异常退出或中断时保存尚未写入的日志
+        flush_log()
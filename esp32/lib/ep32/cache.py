@@ -0,0 +1,121 @@
+# cache.py
+# 带有效期的查询缓存：有效期内直接返回；过期后一段时间内仍先返回旧值，
+# 并登记刷新，由主循环在回复客户端之后执行（stale-while-revalidate）
+import os
+import json
+import time
+from ep32.config import CACHE_FILE, CACHE_MAX_ENTRIES, CACHE_ERROR_TTL
+from ep32.logger import debug_log, log_warn
+
+class TTLCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, filename=CACHE_FILE):
+        self.max_entries = max_entries
+        self.filename = filename
+        # 键 -> [值, 写入时间, 有效期, 过期后可用时长, 是否持久化]，首次使用时从文件加载
+        self.entries = None
+        # 键 -> (失败时间, 错误信息)，失败后一段时间内直接返回错误，避免离线时每次都阻塞
+        self.failures = {}
+        # 待刷新的键 -> (加载函数, 有效期, 过期后可用时长, 是否持久化)
+        self.pending = {}
+
+    # 从闪存加载持久化的条目
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        try:
+            with open(self.filename, "r") as f:
+                for key, entry in json.load(f).items():
+                    self.entries[key] = entry + [True]
+        except (OSError, ValueError):
+            pass
+
+    # 保存需要持久化的条目，先写临时文件再替换
+    def _store(self):
+        data = {}
+        for key, entry in self.entries.items():
+            if entry[4]:
+                data[key] = entry[:4]
+        try:
+            tmp = self.filename + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            try:
+                os.rename(tmp, self.filename)
+            except OSError:
+                # 部分文件系统不允许覆盖已有文件
+                os.remove(self.filename)
+                os.rename(tmp, self.filename)
+        except OSError as e:
+            log_warn("保存缓存失败: %s", e)
+
+    # 写入条目，超过条目上限时淘汰最早写入的
+    def put(self, key, value, ttl, stale=0, persist=False):
+        self._load()
+        self.entries[key] = [value, time.time(), ttl, stale, persist]
+        while len(self.entries) > self.max_entries:
+            oldest = min(self.entries, key=lambda k: self.entries[k][1])
+            persist = self.entries.pop(oldest)[4] or persist
+        if persist:
+            self._store()
+
+    # 查询条目，未命中或过期太久时调用loader加载，loader失败时抛出异常
+    def get(self, key, loader, ttl, stale=0, persist=False):
+        self._load()
+        now = time.time()
+        entry = self.entries.get(key)
+        failure = self.failures.get(key)
+        recently_failed = failure and 0 <= now - failure[0] < CACHE_ERROR_TTL
+        # 时钟回拨（如重启后尚未同步时间）时视为过期
+        if entry and entry[1] <= now:
+            age = now - entry[1]
+            if age < entry[2]:
+                return entry[0]
+            if age < entry[2] + entry[3]:
+                if not recently_failed:
+                    self.pending[key] = (loader, ttl, stale, persist)
+                debug_log("缓存已过期，先返回旧值: %s", key)
+                return entry[0]
+        if recently_failed:
+            raise OSError(failure[1])
+        return self._fetch(key, loader, ttl, stale, persist)
+
+    def _fetch(self, key, loader, ttl, stale, persist):
+        try:
+            value = loader()
+        except Exception as e:
+            self.failures[key] = (time.time(), str(e))
+            raise
+        self.failures.pop(key, None)
+        self.put(key, value, ttl, stale, persist)
+        return value
+
+    # 执行一个登记的刷新，返回是否执行了刷新
+    def refresh_pending(self):
+        if not self.pending:
+            return False
+        key = next(iter(self.pending))
+        loader, ttl, stale, persist = self.pending.pop(key)
+        debug_log("后台刷新缓存: %s", key)
+        try:
+            self._fetch(key, loader, ttl, stale, persist)
+        except Exception as e:
+            log_warn("刷新缓存失败: %s: %s", key, e)
+        return True
+
+    # 清空缓存
+    def clear(self):
+        self.entries = {}
+        self.failures = {}
+        self.pending = {}
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
+
+# 全局缓存
+ttl_cache = TTLCache()
+
+# 执行登记的缓存刷新，在回复客户端之后或空闲时调用
+def refresh_cache():
+    return ttl_cache.refresh_pending()
@@ -0,0 +1,33 @@
+# commands.py
+# 命令注册表：各模块用 @command 注册处理函数，收到命令后只解码、分割一次，再按命令名查表
+
+# 命令名 -> 处理函数
+_commands = {}
+# 帮助信息，按注册顺序排列
+_help = []
+
+# 注册命令处理函数：handler(cl, args, session)，args为命令名之后的参数字符串
+# 返回False表示结束会话，其他返回值表示继续
+def command(*names, help=None):
+    def register(handler):
+        for name in names:
+            _commands[name] = handler
+        if help:
+            _help.append(help)
+        return handler
+    return register
+
+# 解析命令，返回(处理函数, 命令名, 参数)；未注册的命令返回(None, 命令名, 参数)
+# 参数保留原样（如write的内容），由处理函数按需去除空白
+def find_command(data):
+    text = data.decode()
+    index = text.find(" ")
+    if index < 0:
+        name = text.strip()
+        return _commands.get(name), name, ""
+    name = text[:index]
+    return _commands.get(name), name, text[index + 1:]
+
+# 生成帮助信息
+def help_text():
+    return "\n可用命令:\n" + "\n".join(_help) + "\n"
@@ -0,0 +1,92 @@
+# compress.py
+# 传输压缩：设备上使用deflate模块（MicroPython 1.21+），主机模拟环境下使用zlib
+import io
+from ep32.config import COMPRESS_WBITS
+
+try:
+    import deflate
+except ImportError:
+    deflate = None
+
+try:
+    import zlib
+    if not hasattr(zlib, "compressobj"):
+        zlib = None
+except ImportError:
+    zlib = None
+
+# 收集压缩输出的流
+class _Sink(io.IOBase):
+    def __init__(self):
+        self.data = b""
+
+    def write(self, buf):
+        self.data += bytes(buf)
+        return len(buf)
+
+    def take(self):
+        data = self.data
+        self.data = b""
+        return data
+
+# 流式压缩器：compress()返回目前可发送的压缩数据，flush()结束压缩流
+class Compressor:
+    def __init__(self):
+        if zlib:
+            self._z = zlib.compressobj(6, zlib.DEFLATED, COMPRESS_WBITS)
+            self._sink = None
+        else:
+            self._sink = _Sink()
+            self._z = deflate.DeflateIO(self._sink, deflate.ZLIB, COMPRESS_WBITS)
+
+    def compress(self, data):
+        if self._sink is None:
+            return self._z.compress(data)
+        self._z.write(data)
+        return self._sink.take()
+
+    def flush(self):
+        if self._sink is None:
+            return self._z.flush()
+        self._z.close()
+        return self._sink.take()
+
+# zlib解压读取器，提供与DeflateIO相同的readinto接口
+class _ZlibReader:
+    def __init__(self, stream):
+        self._stream = stream
+        self._z = zlib.decompressobj()
+        self._buffer = bytearray(256)
+        self._pending = b""
+
+    def readinto(self, buf):
+        while not self._pending:
+            if self._z.eof:
+                return 0
+            n = self._stream.readinto(self._buffer)
+            if not n:
+                return 0
+            self._pending = self._z.decompress(bytes(self._buffer[:n]))
+        n = min(len(buf), len(self._pending))
+        buf[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+# 打开解压读取器，从stream读取压缩数据，readinto返回解压后的数据
+def open_decompressor(stream):
+    if zlib:
+        return _ZlibReader(stream)
+    return deflate.DeflateIO(stream, deflate.ZLIB)
+
+_available = None
+
+# 检查当前固件是否支持压缩（deflate模块可能只编译了解压功能）
+def compression_available():
+    global _available
+    if _available is None:
+        try:
+            Compressor().compress(b"x")
+            _available = True
+        except Exception:
+            _available = False
+    return _available
@@ -1,10 +1,26 @@
 # config.py
-# 调试模式标志
+# 调试模式标志，关闭时不记录任何日志
 DEBUG_MODE = True
 
+# 启动时的日志级别: "error", "warn", "info", "debug"，运行时可用 debug level 命令修改
+LOG_LEVEL = "debug"
+
 # 调试日志文件路径
 DEBUG_LOG_FILE = "debug.log"
 
+# 调试日志缓冲：内存中保留最近多少条，攒够多少字节或经过多少秒写入一次闪存
+LOG_RING_SIZE = 64
+LOG_FLUSH_BYTES = 2048
+LOG_FLUSH_INTERVAL = 5
+
+# 日志文件超过该大小（字节）后轮转为debug.log.1、debug.log.2…，保留的旧文件个数
+LOG_MAX_SIZE = 32768
+LOG_BACKUPS = 2
+
+# debug tail 默认显示的条数，跟随模式下检查新日志的间隔（秒）
+LOG_TAIL_LINES = 20
+LOG_TAIL_INTERVAL = 0.5
+
 # 配置Wi-Fi连接信息
 SSID = "CU-C1E0"
 PASSWORD = "26782811"
@@ -18,8 +34,84 @@ TRANSFER_STATUS_FILE = "transfer_status.txt"
 # GPIO配置
 LED_PIN = 2  # LED连接到GPIO2
 
+# LED闪烁由定时器驱动：定时器编号、节拍（毫秒）、最多排队的闪烁模式数
+LED_TIMER_ID = 0
+LED_TICK_MS = 50
+LED_QUEUE_MAX = 8
+
+# 空闲时LED显示心跳
+LED_HEARTBEAT = False
+
 # 服务器配置
 SERVER_PORT = 5555
 
 # 系统监控间隔（秒）
 MONITOR_INTERVAL = 60
+
+# 监控样本的时间序列分级: (每个样本覆盖的秒数, 保留的样本数)，
+# 每级把上一级（第一级为监控样本）的若干个样本取平均，默认保留1小时的分钟、1天的小时和30天的每日样本
+METRICS_TIERS = ((60, 60), (3600, 24), (86400, 30))
+
+# 传输分块大小（字节）
+TRANSFER_CHUNK_SIZE = 1024
+
+# 滑动窗口最大在途块数，握手时与客户端协商
+MAX_WINDOW = 8
+
+# 服务器模式: "poll" 基于select.poll的事件循环（多客户端，定时任务按时运行）,
+# "async" 基于uasyncio的多客户端并发, "blocking" 单客户端阻塞循环。
+# 各模式下命令都是同步执行的：一个会话的传输命令（upload、get、cat、sync）执行期间，其他会话要等它结束
+SERVER_MODE = "poll"
+
+# 最大连接数：poll和异步模式下超过时拒绝新连接；阻塞模式一次只服务一个会话，其余连接在队列中等待，
+# 各模式的监听队列长度都为该值
+MAX_CLIENTS = 8
+
+# 等待客户端握手确认的超时时间（秒）
+HANDSHAKE_TIMEOUT = 5
+
+# 分块传输中等待客户端数据或确认的超时时间（秒），客户端停止响应时放弃传输；
+# 传输期间其他会话都在等待，这也是一个停止响应的客户端每次读写能让其他会话等待的最长时间
+TRANSFER_TIMEOUT = 5
+
+# Prometheus监控指标HTTP端口（GET /metrics），与命令端口分开，设为None不启动；
+# 抓取连接发送完整请求的期限（秒），请求在事件循环中读取，等待期间不阻塞命令连接
+METRICS_PORT = 9100
+METRICS_TIMEOUT = 1
+
+# 上传检查点策略：每接收多少字节或经过多少秒保存一次传输状态，连接断开时也会保存
+CHECKPOINT_BYTES = 16384
+CHECKPOINT_INTERVAL = 5
+
+# 传输状态索引最多保存的未完成传输条数，以及过期时间（秒）
+TRANSFER_INDEX_MAX = 16
+TRANSFER_MAX_AGE = 7 * 24 * 3600
+
+# 增量同步的默认块大小（字节），以及客户端可指定的范围（签名和应用增量时按块大小分配缓冲区）
+SYNC_BLOCK_SIZE = 512
+SYNC_MIN_BLOCK_SIZE = 64
+SYNC_MAX_BLOCK_SIZE = 4096
+
+# 压缩传输：压缩窗口位数（2^10=1KB，限制设备内存占用），小于该大小的数据不压缩
+COMPRESS_WBITS = 10
+COMPRESS_MIN_SIZE = 256
+
+# 网络查询缓存：缓存文件、最多条目数、查询失败后多少秒内不再重试
+CACHE_FILE = "cache.json"
+CACHE_MAX_ENTRIES = 8
+CACHE_ERROR_TTL = 60
+
+# 位置和天气的有效期（秒），以及过期后仍可先返回旧值、同时在后台刷新的时长（秒）
+LOCATION_TTL = 3600
+LOCATION_STALE = 24 * 3600
+WEATHER_TTL = 600
+WEATHER_STALE = 3 * 3600
+
+# 流式解析HTTP响应中JSON时使用的读取缓冲区大小（字节）
+JSON_SCAN_BUFFER = 256
+
+# 运行统计：是否记录各命令和关键环节（握手、分块收发、日志、检查点）的耗时与字节数，
+# 最多记录的名称数（超出的计入"other"），耗时直方图的桶数（按2的幂划分微秒，最后一桶包含更长的耗时）
+STATS_ENABLED = True
+STATS_MAX_NAMES = 24
+STATS_BUCKETS = 24
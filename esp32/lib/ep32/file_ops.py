@@ -1,8 +1,16 @@
 # file_ops.py
 import os
 import json
-from ep32.utils import debug_log
-from ep32.config import USERPASS_FILE, TRANSFER_STATUS_FILE
+import time
+import ustruct
+from ep32.utils import debug_log, log_error
+from ep32.logger import log_enabled, DEBUG
+from ep32.commands import command
+from ep32 import stats
+from ep32.config import (
+    USERPASS_FILE, TRANSFER_STATUS_FILE, TRANSFER_INDEX_MAX, TRANSFER_MAX_AGE,
+    CHECKPOINT_BYTES, CHECKPOINT_INTERVAL, SYNC_BLOCK_SIZE
+)
 
 # 初始化用户名和密码
 def init_userpass():
@@ -28,7 +36,7 @@ def init_userpass():
 
 # 更新用户名和密码
 def update_userpass(username, password):
-    debug_log(f"更新用户名和密码: {username}")
+    debug_log("更新用户名和密码: %s", username)
     credentials = {
         "username": username,
         "password": password
@@ -49,85 +57,435 @@ def list_files():
             result += f"{f} - {size} 字节\n"
         except:
             result += f"{f} - [目录]\n"
-    debug_log(f"找到 {len(files)} 个文件/目录")
+    debug_log("找到 %s 个文件/目录", len(files))
     return result
 
 # 读取文件
 def read_file(filename):
-    debug_log(f"读取文件: {filename}")
+    debug_log("读取文件: %s", filename)
     try:
         with open(filename, "r") as f:
             content = f.read()
-        debug_log(f"成功读取文件: {filename}, 大小: {len(content)} 字节")
+        debug_log("成功读取文件: %s, 大小: %s 字节", filename, len(content))
         return content
     except Exception as e:
-        debug_log(f"读取文件错误: {str(e)}")
+        log_error("读取文件错误: %s", e)
         return f"读取文件错误: {str(e)}"
 
+# 获取文件大小，文件不存在或为目录时返回-1
+def get_file_size(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return -1
+    if stat[0] & 0x4000:
+        return -1
+    return stat[6]
+
 # 写入文件
 def write_file(filename, content):
-    debug_log(f"写入文件: {filename}")
+    debug_log("写入文件: %s", filename)
     try:
         with open(filename, "w") as f:
             f.write(content)
-        debug_log(f"文件 {filename} 已保存")
+        debug_log("文件 %s 已保存", filename)
         return f"文件 {filename} 已保存"
     except Exception as e:
-        debug_log(f"写入文件错误: {str(e)}")
+        log_error("写入文件错误: %s", e)
         return f"写入文件错误: {str(e)}"
 
 # 删除文件
 def delete_file(filename):
-    debug_log(f"删除文件: {filename}")
+    debug_log("删除文件: %s", filename)
     try:
         os.remove(filename)
-        debug_log(f"文件 {filename} 已删除")
+        debug_log("文件 %s 已删除", filename)
         return f"文件 {filename} 已删除"
     except Exception as e:
-        debug_log(f"删除文件错误: {str(e)}")
+        log_error("删除文件错误: %s", e)
         return f"删除文件错误: {str(e)}"
 
+# 传输状态索引，键为"方向:文件名"，值为[位置, 总大小, 哈希, 更新时间]
+# 首次使用时从文件加载到内存，之后按键直接查找
+_transfer_index = None
+
+# 传输方向
+UPLOAD = "up"
+DOWNLOAD = "down"
+
+def _index_key(filename, direction):
+    return f"{direction}:{filename}"
+
+# 加载传输状态索引
+def _load_transfer_index():
+    global _transfer_index
+    if _transfer_index is None:
+        _transfer_index = {}
+        try:
+            if TRANSFER_STATUS_FILE in os.listdir():
+                with open(TRANSFER_STATUS_FILE, "r") as f:
+                    data = json.load(f)
+                if "filename" in data:
+                    # 兼容旧格式：只保存一条上传记录
+                    key = _index_key(data["filename"], UPLOAD)
+                    _transfer_index[key] = [data["position"], data["total_size"], data["file_hash"], int(time.time())]
+                else:
+                    _transfer_index = data
+        except Exception as e:
+            log_error("加载传输状态索引错误: %s", e)
+    return _transfer_index
+
+# 保存传输状态索引
+def _store_transfer_index():
+    # 先写临时文件再重命名，断电时不会留下写了一半的状态文件
+    temp_file = TRANSFER_STATUS_FILE + ".tmp"
+    with open(temp_file, "w") as f:
+        json.dump(_transfer_index, f)
+    try:
+        os.rename(temp_file, TRANSFER_STATUS_FILE)
+    except OSError:
+        # 部分文件系统不允许覆盖已有文件
+        os.remove(TRANSFER_STATUS_FILE)
+        os.rename(temp_file, TRANSFER_STATUS_FILE)
+
 # 保存传输状态
-def save_transfer_status(filename, position, total_size, file_hash):
-    debug_log(f"保存传输状态: {filename}, 位置: {position}/{total_size}")
-    status = {
+def save_transfer_status(filename, position, total_size, file_hash, direction=UPLOAD):
+    debug_log("保存传输状态: %s %s, 位置: %s/%s", direction, filename, position, total_size)
+    index = _load_transfer_index()
+    index[_index_key(filename, direction)] = [position, total_size, file_hash, int(time.time())]
+    # 条目过多时淘汰最久未更新的记录
+    while len(index) > TRANSFER_INDEX_MAX:
+        oldest = min(index, key=lambda k: index[k][3])
+        del index[oldest]
+    _store_transfer_index()
+
+# 传输检查点：每接收一定字节数或经过一定时间才保存一次传输状态，减少闪存写入
+# 保存前先刷新文件数据，保证记录的位置之前的数据已经落盘
+class TransferCheckpoint:
+    def __init__(self, filename, total_size, position=0, direction=UPLOAD,
+                 every_bytes=CHECKPOINT_BYTES, every_seconds=CHECKPOINT_INTERVAL):
+        self.filename = filename
+        self.total_size = total_size
+        self.direction = direction
+        self.every_bytes = every_bytes
+        self.every_seconds = every_seconds
+        self.saved_position = position
+        self.saved_time = time.time()
+        self.writes = 0
+
+    # 检查是否到达检查点，到达时保存；file_hash为截至position的CRC32
+    def update(self, f, position, file_hash=0):
+        if (position - self.saved_position >= self.every_bytes or
+                time.time() - self.saved_time >= self.every_seconds):
+            self.save(f, position, file_hash)
+
+    # 立即保存检查点，连接断开时调用
+    def save(self, f, position, file_hash=0):
+        if position == self.saved_position:
+            return
+        started = stats.start()
+        if f:
+            f.flush()
+        save_transfer_status(self.filename, position, self.total_size, file_hash, self.direction)
+        stats.record(stats.CHECKPOINT, started)
+        self.saved_position = position
+        self.saved_time = time.time()
+        self.writes += 1
+
+# 获取传输状态
+def get_transfer_status(filename, direction=UPLOAD):
+    record = _load_transfer_index().get(_index_key(filename, direction))
+    if record is None:
+        return None
+    debug_log("找到传输状态: %s %s, 位置: %s/%s", direction, filename, record[0], record[1])
+    return {
         "filename": filename,
-        "position": position,
-        "total_size": total_size,
-        "file_hash": file_hash
+        "direction": direction,
+        "position": record[0],
+        "total_size": record[1],
+        "file_hash": record[2],
+        "time": record[3]
     }
-    with open(TRANSFER_STATUS_FILE, "w") as f:
-        json.dump(status, f)
 
-# 获取传输状态
-def get_transfer_status():
-    debug_log("获取传输状态")
-    try:
-        if TRANSFER_STATUS_FILE in os.listdir():
-            with open(TRANSFER_STATUS_FILE, "r") as f:
-                status = json.load(f)
-            debug_log(f"找到传输状态: {status['filename']}, 位置: {status['position']}/{status['total_size']}")
-            return status
-    except Exception as e:
-        debug_log(f"获取传输状态错误: {str(e)}")
-    return None
+# 列出所有未完成的传输
+def list_transfer_status():
+    index = _load_transfer_index()
+    return [get_transfer_status(key.split(":", 1)[1], key.split(":", 1)[0]) for key in index]
 
 # 删除传输状态
-def delete_transfer_status():
-    debug_log("删除传输状态")
+def delete_transfer_status(filename, direction=UPLOAD):
+    debug_log("删除传输状态: %s %s", direction, filename)
+    index = _load_transfer_index()
+    if index.pop(_index_key(filename, direction), None) is None:
+        return
     try:
-        if TRANSFER_STATUS_FILE in os.listdir():
+        if index:
+            _store_transfer_index()
+        elif TRANSFER_STATUS_FILE in os.listdir():
             os.remove(TRANSFER_STATUS_FILE)
-            debug_log("传输状态已删除")
+        debug_log("传输状态已删除")
     except Exception as e:
-        debug_log(f"删除传输状态错误: {str(e)}")
+        log_error("删除传输状态错误: %s", e)
+
+# 清理过期的传输状态：超过保留时间，或上传的目标文件已不存在/比断点短
+def gc_transfer_status(max_age=TRANSFER_MAX_AGE):
+    index = _load_transfer_index()
+    now = time.time()
+    stale = []
+    for key, record in index.items():
+        direction, filename = key.split(":", 1)
+        if now - record[3] > max_age:
+            stale.append(key)
+        elif direction == UPLOAD and get_file_size(filename) < record[0]:
+            stale.append(key)
+    for key in stale:
+        del index[key]
+    if stale:
+        debug_log("清理过期传输状态: %s 条", len(stale))
+        try:
+            if index:
+                _store_transfer_index()
+            elif TRANSFER_STATUS_FILE in os.listdir():
+                os.remove(TRANSFER_STATUS_FILE)
+        except Exception as e:
+            log_error("清理传输状态错误: %s", e)
+    return len(stale)
+
+# CRC32表，仅在固件没有binascii.crc32时使用
+_crc32_table = None
 
-# 计算文件哈希
-def calculate_hash(data):
-    debug_log("计算文件哈希")
-    # 简单的哈希计算，实际应用中可以使用更复杂的算法
-    hash_value = 0
+# 纯Python实现的CRC32，作为后备
+def _crc32_fallback(data, crc=0):
+    global _crc32_table
+    if _crc32_table is None:
+        _crc32_table = []
+        for i in range(256):
+            c = i
+            for _ in range(8):
+                c = (c >> 1) ^ 0xEDB88320 if c & 1 else c >> 1
+            _crc32_table.append(c)
+    table = _crc32_table
+    crc ^= 0xFFFFFFFF
     for byte in data:
-        hash_value = (hash_value * 31 + byte) % (2**32)
-    debug_log(f"文件哈希: {hash_value}")
-    return hash_value
+        crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+try:
+    from binascii import crc32 as _crc32
+except ImportError:
+    _crc32 = _crc32_fallback
+
+# 增量校验和：按块更新，支持crc32（默认，状态可保存用于续传）和sha256（需固件支持hashlib）
+class Checksum:
+    def __init__(self, algorithm="crc32", value=0):
+        self.algorithm = algorithm
+        if algorithm == "crc32":
+            self.value = value
+        elif algorithm == "sha256":
+            import hashlib
+            self.hasher = hashlib.sha256()
+        else:
+            raise ValueError(f"不支持的校验算法: {algorithm}")
+
+    def update(self, data):
+        if self.algorithm == "crc32":
+            self.value = _crc32(data, self.value) & 0xFFFFFFFF
+        else:
+            self.hasher.update(data)
+
+    def hexdigest(self):
+        if self.algorithm == "crc32":
+            return f"{self.value:08x}"
+        return "".join(f"{b:02x}" for b in self.hasher.digest())
+
+# 计算数据的CRC32，hash_value为之前数据的校验值，可分块累计计算
+def calculate_hash(data, hash_value=0):
+    return _crc32(data, hash_value) & 0xFFFFFFFF
+
+# 分块计算文件的校验和，length指定只计算前若干字节；文件不存在时返回None
+def calculate_file_hash(filename, algorithm="crc32", length=None, chunk_size=1024):
+    debug_log("计算文件校验和: %s, 算法: %s", filename, algorithm)
+    file_size = get_file_size(filename)
+    if file_size < 0:
+        return None
+    remaining = file_size if length is None else min(length, file_size)
+    checksum = Checksum(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(filename, "rb") as f:
+        while remaining > 0:
+            n = f.readinto(view[:min(chunk_size, remaining)])
+            if not n:
+                break
+            checksum.update(view[:n])
+            remaining -= n
+    if log_enabled(DEBUG):
+        debug_log("文件校验和: %s", checksum.hexdigest())
+    return checksum
+
+# 续传前校验已接收部分，文件内容与记录的CRC32一致时才允许从断点继续
+def verify_transfer_status(filename, status):
+    if get_file_size(filename) < status["position"]:
+        return False
+    checksum = calculate_file_hash(filename, length=status["position"])
+    return checksum is not None and checksum.value == status["file_hash"]
+
+# rsync式弱校验和：a为字节和，b为加权和，各取16位，客户端可按字节滚动计算
+def weak_checksum(data):
+    a = sum(data)
+    b = 0
+    n = len(data)
+    for x in data:
+        b += n * x
+        n -= 1
+    return ((b & 0xFFFF) << 16) | (a & 0xFFFF)
+
+# 计算文件的分块签名：每块8字节，依次为弱校验和与CRC32；文件不存在时返回空签名
+def file_signature(filename, block_size=SYNC_BLOCK_SIZE):
+    debug_log("计算文件签名: %s, 块大小: %s", filename, block_size)
+    signature = bytearray()
+    if get_file_size(filename) < 0:
+        return signature
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    with open(filename, "rb") as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            block = view[:n]
+            signature += ustruct.pack(">II", weak_checksum(block), calculate_hash(block))
+    debug_log("文件签名完成: %s 块", len(signature) // 8)
+    return signature
+
+# 应用增量数据生成新文件
+# 增量格式: b"C" + (起始块号, 块数) 复制原文件的块; b"D" + 长度 + 数据 为新数据
+def apply_delta(filename, delta_filename, block_size=SYNC_BLOCK_SIZE):
+    debug_log("应用增量: %s", filename)
+    new_filename = filename + ".new"
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    has_original = get_file_size(filename) >= 0
+    old = open(filename, "rb") if has_original else None
+    try:
+        with open(delta_filename, "rb") as delta, open(new_filename, "wb") as out:
+            while True:
+                op = delta.read(1)
+                if not op:
+                    break
+                if op == b"C":
+                    start, count = ustruct.unpack(">II", delta.read(8))
+                    if old is None:
+                        raise ValueError("原文件不存在，无法复制块")
+                    old.seek(start * block_size)
+                    source, remaining = old, count * block_size
+                elif op == b"D":
+                    source, remaining = delta, ustruct.unpack(">I", delta.read(4))[0]
+                else:
+                    raise ValueError(f"无效的增量指令: {op}")
+                while remaining > 0:
+                    n = source.readinto(view[:min(block_size, remaining)])
+                    if not n:
+                        break
+                    out.write(view[:n])
+                    remaining -= n
+    finally:
+        if old:
+            old.close()
+    if has_original:
+        os.remove(filename)
+    os.rename(new_filename, filename)
+    os.remove(delta_filename)
+    size = get_file_size(filename)
+    debug_log("增量应用完成: %s, 大小: %s 字节", filename, size)
+    return size
+
+# 修改密码命令，直接更新会话共享的凭据
+@command("changepass", help="changepass <新密码> - 修改密码")
+def cmd_changepass(cl, args, session):
+    credentials = session["credentials"]
+    try:
+        # 解析新密码
+        new_password = args.strip()
+        if new_password:
+            # 更新密码
+            credentials.update(update_userpass(credentials["username"], new_password))
+            cl.send('密码已更新'.encode())
+        else:
+            cl.send('密码不能为空'.encode())
+    except Exception as e:
+        log_error("修改密码失败: %s", e)
+        cl.send('修改密码失败'.encode())
+
+# 用户名验证命令
+@command("user1024", help="user1024 - 用户名验证")
+def cmd_user(cl, args, session):
+    debug_log("请求用户名")
+    cl.send(session["credentials"]["username"].encode())
+
+# 密码验证命令
+@command("passwd1024", help="passwd1024 - 密码验证")
+def cmd_passwd(cl, args, session):
+    debug_log("请求密码")
+    cl.send(session["credentials"]["password"].encode())
+
+# 写入文件命令
+@command("write", help="write <文件名> <内容> - 写入文件")
+def cmd_write(cl, args, session):
+    try:
+        params = args.split(None, 1)
+        if len(params) >= 2:
+            filename, content = params[0], params[1]
+            cl.send(write_file(filename, content).encode())
+        else:
+            cl.send('格式: write <文件名> <内容>'.encode())
+    except Exception as e:
+        log_error("写入文件错误: %s", e)
+        cl.send(f'写入文件错误: {str(e)}'.encode())
+
+# 删除文件命令
+@command("del", help="del <文件名> - 删除文件")
+def cmd_del(cl, args, session):
+    filename = args.strip()
+    if filename:
+        cl.send(delete_file(filename).encode())
+    else:
+        cl.send('请指定文件名'.encode())
+
+# 文件校验和命令
+@command("checksum", help="checksum <文件名> [crc32|sha256] - 计算文件校验和")
+def cmd_checksum(cl, args, session):
+    filename = args.strip()
+    algorithm = "crc32"
+    # 文件名可以含空格，最后一个词是算法名且整个参数不是已存在的文件时才作为算法
+    if " " in filename and get_file_size(filename) < 0:
+        head, tail = filename.rsplit(" ", 1)
+        if tail in ("crc32", "sha256"):
+            filename, algorithm = head.rstrip(), tail
+    if not filename:
+        cl.send('请指定文件名'.encode())
+        return
+    try:
+        checksum = calculate_file_hash(filename, algorithm)
+        if checksum is None:
+            cl.send("文件不存在".encode())
+        else:
+            cl.send(f"CHECKSUM:{checksum.hexdigest()}:{get_file_size(filename)}".encode())
+    except Exception as e:
+        log_error("计算校验和错误: %s", e)
+        cl.send(f'计算校验和错误: {str(e)}'.encode())
+
+# 查询断点续传位置命令
+@command("resume", help="resume <文件名> [up|down] - 查询断点续传位置")
+def cmd_resume(cl, args, session):
+    params = args.split()
+    if not params:
+        cl.send('请指定文件名'.encode())
+        return
+    # 检查是否已有传输状态，可指定方向 up(上传) 或 down(下载)
+    direction = params[1] if len(params) > 1 else UPLOAD
+    transfer_status = get_transfer_status(params[0], direction)
+    if transfer_status:
+        cl.send(f"FOUND:{transfer_status['position']}:{transfer_status['total_size']}".encode())
+    else:
+        cl.send("NOTFOUND".encode())
@@ -0,0 +1,215 @@
+# jsonscan.py
+# 流式JSON字段提取：用固定大小的缓冲区逐块读取，只保留指定路径上的值，不构建完整的JSON对象
+# 路径为键和数组下标组成的元组，如 ("current_condition", 0, "temp_C")
+from ep32.config import JSON_SCAN_BUFFER
+
+# 解析状态
+_VALUE = 0    # 等待值
+_AFTER = 1    # 值之后，等待 , ] }
+_KEY = 2      # 对象中等待键
+_COLON = 3    # 键之后，等待 :
+_STRING = 4   # 字符串中
+_ESCAPE = 5   # 字符串中的转义字符
+_UNICODE = 6  # \uXXXX 转义
+_ATOM = 7     # 数字、true、false、null
+
+_WHITESPACE = b" \t\r\n"
+_DELIMITERS = b" \t\r\n,]}"
+_ESCAPES = {0x6E: 0x0A, 0x74: 0x09, 0x72: 0x0D, 0x62: 0x08, 0x66: 0x0C}
+
+class JsonScanner:
+    def __init__(self, paths, max_token=128):
+        self.wanted = set(paths)
+        self.results = {}
+        self.max_token = max_token
+        # 当前路径及每层是否为数组
+        self.path = []
+        self.arrays = []
+        self.state = _VALUE
+        self.token = bytearray()
+        self.is_key = False
+        self.capture = False
+        self.code = 0
+        self.code_digits = 0
+        # 等待低位代理的高位代理（\uD800-\uDBFF），两个\u转义合成一个字符
+        self.high = 0
+        # 所有路径都已找到，或整个JSON已结束
+        self.done = False
+
+    # 输入一段数据，返回是否已完成
+    def feed(self, data, size=None):
+        if size is None:
+            size = len(data)
+        token = self.token
+        i = 0
+        while i < size and not self.done:
+            c = data[i]
+            state = self.state
+            if state == _STRING:
+                if c == 0x22:
+                    if self.high:
+                        self._lone_surrogate()
+                    self._end_string()
+                elif c == 0x5C:
+                    self.state = _ESCAPE
+                elif self.capture and len(token) < self.max_token:
+                    if self.high:
+                        self._lone_surrogate()
+                    token.append(c)
+                i += 1
+                continue
+            if state == _ESCAPE:
+                if c == 0x75:
+                    self.state = _UNICODE
+                    self.code = 0
+                    self.code_digits = 0
+                else:
+                    if self.high:
+                        self._lone_surrogate()
+                    if self.capture:
+                        token.append(_ESCAPES.get(c, c))
+                    self.state = _STRING
+                i += 1
+                continue
+            if state == _UNICODE:
+                self.code = self.code * 16 + int(chr(c), 16)
+                self.code_digits += 1
+                if self.code_digits == 4:
+                    self._unicode(self.code)
+                    self.state = _STRING
+                i += 1
+                continue
+            if state == _ATOM:
+                if c in _DELIMITERS:
+                    # 分隔符留给下一个状态处理
+                    self._end_atom()
+                    continue
+                if self.capture and len(token) < self.max_token:
+                    token.append(c)
+                i += 1
+                continue
+            i += 1
+            if c in _WHITESPACE:
+                continue
+            if state == _VALUE:
+                if c == 0x7B or c == 0x5B:  # { [
+                    self._begin(c == 0x5B)
+                elif c == 0x5D:  # 空数组
+                    self._end_container()
+                elif c == 0x22:
+                    self._begin_string(False)
+                else:
+                    self.capture = tuple(self.path) in self.wanted
+                    token[:] = b""
+                    token.append(c)
+                    self.state = _ATOM
+            elif state == _KEY:
+                if c == 0x22:
+                    self._begin_string(True)
+                elif c == 0x7D:  # 空对象
+                    self._end_container()
+            elif state == _COLON:
+                if c == 0x3A:
+                    self.state = _VALUE
+            elif state == _AFTER:
+                if c == 0x2C:  # ,
+                    if self.arrays[-1]:
+                        self.path[-1] += 1
+                        self.state = _VALUE
+                    else:
+                        self.state = _KEY
+                elif c == 0x7D or c == 0x5D:
+                    self._end_container()
+        return self.done
+
+    def _begin(self, is_array):
+        # 路径指向对象或数组本身时只记录其存在
+        self._found(True)
+        self.path.append(0 if is_array else None)
+        self.arrays.append(is_array)
+        self.state = _VALUE if is_array else _KEY
+
+    def _end_container(self):
+        self.path.pop()
+        self.arrays.pop()
+        self.state = _AFTER
+        if not self.path:
+            self.done = True
+
+    def _begin_string(self, is_key):
+        self.is_key = is_key
+        self.capture = is_key or tuple(self.path) in self.wanted
+        self.token[:] = b""
+        self.state = _STRING
+
+    # \uXXXX转义结束：高位代理先保存，与随后的低位代理合成一个字符；单独出现的代理替换为U+FFFD
+    def _unicode(self, code):
+        if 0xD800 <= code < 0xDC00:
+            if self.high:
+                self._lone_surrogate()
+            self.high = code
+            return
+        if 0xDC00 <= code < 0xE000:
+            if self.high:
+                code = 0x10000 + ((self.high - 0xD800) << 10) + (code - 0xDC00)
+                self.high = 0
+            else:
+                code = 0xFFFD
+        elif self.high:
+            self._lone_surrogate()
+        if self.capture:
+            self.token.extend(chr(code).encode())
+
+    # 高位代理之后没有低位代理
+    def _lone_surrogate(self):
+        self.high = 0
+        if self.capture:
+            self.token.extend(chr(0xFFFD).encode())
+
+    def _end_string(self):
+        if self.is_key:
+            self.path[-1] = self.token.decode()
+            self.state = _COLON
+            return
+        if self.capture:
+            self._found(self.token.decode())
+        self._after_value()
+
+    def _end_atom(self):
+        if self.capture:
+            text = self.token.decode()
+            if text == "true":
+                value = True
+            elif text == "false":
+                value = False
+            elif text == "null":
+                value = None
+            elif "." in text or "e" in text or "E" in text:
+                value = float(text)
+            else:
+                value = int(text)
+            self._found(value)
+        self._after_value()
+
+    def _after_value(self):
+        self.state = _AFTER
+        if not self.path:
+            self.done = True
+
+    def _found(self, value):
+        path = tuple(self.path)
+        if path in self.wanted:
+            self.results[path] = value
+            if len(self.results) == len(self.wanted):
+                self.done = True
+
+# 从流中提取指定路径的值，找齐后立即停止读取；返回 {路径: 值}，未找到的路径不在结果中
+def scan_json(stream, paths, buffer_size=JSON_SCAN_BUFFER):
+    scanner = JsonScanner(paths)
+    buffer = bytearray(buffer_size)
+    while not scanner.done:
+        size = stream.readinto(buffer)
+        if not size:
+            break
+        scanner.feed(buffer, size)
+    return scanner.results
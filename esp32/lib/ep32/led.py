@@ -1,27 +1,141 @@
 # led.py
 import machine
-import time
 from ep32.utils import debug_log
-from ep32.config import LED_PIN
+from ep32.config import LED_PIN, LED_TIMER_ID, LED_TICK_MS, LED_QUEUE_MAX
+from ep32.commands import command
 
 # 初始化LED
 led_pin = machine.Pin(LED_PIN, machine.Pin.OUT)
 
-# 控制LED闪烁
+# 闪烁模式：(亮灭时长序列(毫秒), 重复次数)，序列从亮开始亮灭交替
+HEARTBEAT = ((100, 150, 100, 650), 1)
+ERROR = ((100, 100), 5)
+
+# 等待播放的闪烁模式队列
+_queue = []
+# 正在播放的模式: [时长序列, 剩余重复次数, 当前步骤, 当前步骤剩余毫秒]
+_current = None
+# 没有闪烁时LED保持的状态（led_on/led_off设置）
+_base = 0
+_heartbeat = False
+_timer = None
+
+# 批量执行命令时暂停闪烁，避免一批命令排满闪烁队列
+_blink_muted = False
+
+# 暂停或恢复LED闪烁
+def mute_blink(muted):
+    global _blink_muted
+    _blink_muted = muted
+
+# 定时器回调：推进当前模式，模式结束后取下一个；空闲时播放心跳或恢复常态
+def _tick(timer):
+    global _current
+    if _current is None:
+        if _queue:
+            pattern = _queue.pop(0)
+        elif _heartbeat and not _base:
+            pattern = HEARTBEAT
+        else:
+            return
+        _current = [pattern[0], pattern[1], 0, pattern[0][0]]
+        led_pin.value(1)
+        return
+    current = _current
+    current[3] -= LED_TICK_MS
+    if current[3] > 0:
+        return
+    current[2] += 1
+    if current[2] == len(current[0]):
+        current[2] = 0
+        current[1] -= 1
+        if current[1] <= 0:
+            _current = None
+            led_pin.value(_base)
+            return
+    led_pin.value(1 - current[2] % 2)
+    current[3] = current[0][current[2]]
+
+# 首次使用时启动定时器
+def _start_timer():
+    global _timer
+    if _timer is None:
+        _timer = machine.Timer(LED_TIMER_ID)
+        _timer.init(period=LED_TICK_MS, mode=machine.Timer.PERIODIC, callback=_tick)
+
+# 排队播放一个闪烁模式，立即返回；队列满时丢弃
+def play_pattern(pattern):
+    if _blink_muted or len(_queue) >= LED_QUEUE_MAX:
+        return
+    _queue.append(pattern)
+    _start_timer()
+
+# 控制LED闪烁，不阻塞调用者；次数不大于0时不闪烁
 def blink_led(times=1, interval=0.5):
-    debug_log(f"LED闪烁 {times} 次，间隔 {interval} 秒")
-    for _ in range(times):
-        led_pin.value(1)  # 开灯
-        time.sleep(interval)
-        led_pin.value(0)  # 关灯
-        time.sleep(interval)
+    if times <= 0:
+        return
+    debug_log("LED闪烁 %s 次，间隔 %s 秒", times, interval)
+    step = max(LED_TICK_MS, int(interval * 1000))
+    play_pattern(((step, step), times))
+
+# 错误指示：快速闪烁
+def led_error():
+    play_pattern(ERROR)
+
+# 开启或关闭空闲心跳
+def led_heartbeat(enabled=True):
+    global _heartbeat
+    _heartbeat = enabled
+    if enabled:
+        _start_timer()
+
+# 清空排队的闪烁，恢复常态
+def led_stop():
+    global _current
+    _queue.clear()
+    _current = None
+    led_pin.value(_base)
 
 # 打开LED
 def led_on():
+    global _base
     debug_log("LED已打开")
-    led_pin.value(1)
+    _base = 1
+    if _current is None:
+        led_pin.value(1)
 
 # 关闭LED
 def led_off():
+    global _base
     debug_log("LED已关闭")
-    led_pin.value(0)
+    _base = 0
+    if _current is None:
+        led_pin.value(0)
+
+# 打开LED命令
+@command("ledon", help="ledon - 打开LED")
+def cmd_ledon(cl, args, session):
+    led_on()
+    cl.send('LED已打开'.encode())
+
+# 关闭LED命令
+@command("ledoff", help="ledoff - 关闭LED")
+def cmd_ledoff(cl, args, session):
+    led_off()
+    cl.send('LED已关闭'.encode())
+
+# LED闪烁命令，闪烁在后台进行，命令立即返回
+@command("blink", help="blink <次数> <间隔> - 控制LED闪烁")
+def cmd_blink(cl, args, session):
+    try:
+        # 解析闪烁次数和间隔
+        params = args.split()
+        times = int(params[0]) if len(params) > 0 else 1
+        interval = float(params[1]) if len(params) > 1 else 0.5
+        if times <= 0:
+            raise ValueError(f"闪烁次数必须大于0: {times}")
+        blink_led(times, interval)
+        cl.send(f'LED开始闪烁{times}次，间隔{interval}秒'.encode())
+    except Exception as e:
+        debug_log("LED闪烁参数错误: %s", e)
+        cl.send('闪烁参数错误，格式: blink <次数> <间隔(秒)>'.encode())
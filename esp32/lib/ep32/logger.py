@@ -0,0 +1,176 @@
+# logger.py
+# 调试日志缓冲：日志先写入内存环形缓冲区，攒够一定大小或经过一定时间后批量追加到闪存，
+# 文件超过大小限制时轮转，避免每条日志都打开文件，也避免日志写满闪存
+import os
+import time
+from ep32.config import (
+    DEBUG_MODE, LOG_LEVEL, DEBUG_LOG_FILE, LOG_RING_SIZE, LOG_FLUSH_BYTES, LOG_FLUSH_INTERVAL,
+    LOG_MAX_SIZE, LOG_BACKUPS
+)
+from ep32 import stats
+
+# 日志级别，数值越大记录越详细
+OFF = 0
+ERROR = 1
+WARN = 2
+INFO = 3
+DEBUG = 4
+LEVEL_NAMES = ("off", "error", "warn", "info", "debug")
+_LEVEL_TAGS = ("-", "E", "W", "I", "D")
+
+class LogBuffer:
+    def __init__(self, filename=DEBUG_LOG_FILE, size=LOG_RING_SIZE):
+        self.filename = filename
+        self.entries = [None] * size
+        # seq为下一条日志的序号，flushed为第一条尚未写入文件的日志序号，
+        # cleared为清空后的第一条日志序号（序号不归零，正在跟随的debug tail仍能接着读取）
+        self.seq = 0
+        self.flushed = 0
+        self.cleared = 0
+        self.pending_bytes = 0
+        self.last_flush = time.time()
+
+    # 追加一条日志，达到批量写入条件时写入文件
+    def write(self, entry):
+        size = len(self.entries)
+        # 缓冲区已满且仍未写入的最早一条将被覆盖，先写入文件
+        if self.seq - self.flushed >= size:
+            self.flush()
+        self.entries[self.seq % size] = entry
+        self.seq += 1
+        self.pending_bytes += len(entry)
+        if self.pending_bytes >= LOG_FLUSH_BYTES or time.time() - self.last_flush >= LOG_FLUSH_INTERVAL:
+            self.flush()
+
+    # 将未写入的日志一次追加到文件
+    def flush(self):
+        self.last_flush = time.time()
+        if self.flushed == self.seq:
+            return
+        started = stats.start()
+        size = len(self.entries)
+        # 写入失败时丢弃这批日志，避免反复重试
+        start = max(self.flushed, self.seq - size)
+        end = self.seq
+        self.flushed = end
+        self.pending_bytes = 0
+        try:
+            self._rotate()
+            with open(self.filename, "a") as f:
+                for seq in range(start, end):
+                    f.write(self.entries[seq % size])
+        except Exception as e:
+            print(f"无法写入调试日志: {str(e)}")
+        stats.record(stats.LOG_FLUSH, started)
+
+    # 文件超过大小限制时轮转: debug.log -> debug.log.1 -> debug.log.2 …
+    def _rotate(self):
+        try:
+            if os.stat(self.filename)[6] < LOG_MAX_SIZE:
+                return
+        except OSError:
+            return
+        for index in range(LOG_BACKUPS, 0, -1):
+            older = f"{self.filename}.{index}"
+            newer = f"{self.filename}.{index - 1}" if index > 1 else self.filename
+            try:
+                os.remove(older)
+            except OSError:
+                pass
+            try:
+                os.rename(newer, older)
+            except OSError:
+                pass
+        if not LOG_BACKUPS:
+            os.remove(self.filename)
+
+    # 读取序号since之后仍在缓冲区中的日志，返回(下一序号, 日志列表, 已被覆盖的条数)
+    def read_since(self, since):
+        size = len(self.entries)
+        oldest = max(self.seq - size, self.cleared, 0)
+        start = max(since, oldest)
+        entries = [self.entries[seq % size] for seq in range(start, self.seq)]
+        # 清空前的日志不算丢失
+        lost = oldest - max(since, self.cleared) if since >= 0 else 0
+        return self.seq, entries, max(lost, 0)
+
+    # 清空日志文件和缓冲区
+    def clear(self):
+        self.flushed = self.seq
+        self.cleared = self.seq
+        self.pending_bytes = 0
+        for index in range(len(self.entries)):
+            self.entries[index] = None
+        with open(self.filename, "w") as f:
+            f.write("")
+
+# 全局日志缓冲区
+log_buffer = LogBuffer()
+
+# 立即写入缓冲区中的日志，空闲时、重启前和异常退出时调用
+def flush_log():
+    log_buffer.flush()
+
+# 当前日志级别，高于该级别的日志调用直接返回，不格式化消息也不写缓冲区
+_level = LEVEL_NAMES.index(LOG_LEVEL) if DEBUG_MODE else OFF
+
+# 设置日志级别，可传入级别名或数值，无效时返回False
+def set_level(level):
+    global _level
+    if level in LEVEL_NAMES:
+        level = LEVEL_NAMES.index(level)
+    if not isinstance(level, int) or not OFF <= level <= DEBUG:
+        return False
+    _level = level
+    return True
+
+# 当前日志级别名
+def get_level():
+    return LEVEL_NAMES[_level]
+
+# 判断某级别的日志是否会被记录，用于跳过只为日志准备数据的代码
+def log_enabled(level):
+    return level <= _level
+
+# 时间戳缓存：同一秒内的日志复用格式化结果
+_stamp_time = None
+_stamp = ""
+
+def _timestamp():
+    global _stamp_time, _stamp
+    now = time.time()
+    if now != _stamp_time:
+        tm = time.localtime(now)
+        _stamp = "{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}".format(tm[0], tm[1], tm[2], tm[3], tm[4], tm[5])
+        _stamp_time = now
+    return _stamp
+
+# 格式化并记录一条日志，参数按 % 格式化，只在需要记录时才执行
+def _emit(level, message, args):
+    started = stats.start()
+    if args:
+        message = message % args
+    entry = f"[{_timestamp()}] {_LEVEL_TAGS[level]} {message}\n"
+    print(entry)
+    log_buffer.write(entry)
+    stats.record(stats.LOG, started)
+
+# 错误日志
+def log_error(message, *args):
+    if _level >= ERROR:
+        _emit(ERROR, message, args)
+
+# 警告日志
+def log_warn(message, *args):
+    if _level >= WARN:
+        _emit(WARN, message, args)
+
+# 信息日志
+def log_info(message, *args):
+    if _level >= INFO:
+        _emit(INFO, message, args)
+
+# 调试日志，如 debug_log("接收 %d 字节", size)
+def debug_log(message, *args):
+    if _level >= DEBUG:
+        _emit(DEBUG, message, args)
@@ -1,18 +1,53 @@
 # server.py
+import io
 import socket
 import time
 import os
-from ep32.utils import debug_log
-from ep32.config import SERVER_PORT
+import ustruct
+import select
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+from ep32.utils import debug_log, log_error, log_warn, monitor_system_status, sample_system_status
+from ep32.config import (
+    SERVER_PORT, TRANSFER_CHUNK_SIZE, MAX_WINDOW, MAX_CLIENTS, MONITOR_INTERVAL, COMPRESS_MIN_SIZE,
+    SYNC_BLOCK_SIZE, LOG_FLUSH_INTERVAL, LOG_TAIL_INTERVAL, HANDSHAKE_TIMEOUT, METRICS_PORT, METRICS_TIMEOUT,
+    TRANSFER_TIMEOUT, SYNC_MIN_BLOCK_SIZE, SYNC_MAX_BLOCK_SIZE
+)
 from ep32.led import led_on, led_off
-from ep32.file_ops import get_transfer_status, save_transfer_status, delete_transfer_status
+from ep32.file_ops import (
+    TransferCheckpoint, Checksum, delete_transfer_status, DOWNLOAD, UPLOAD, list_files, get_file_size,
+    get_transfer_status, verify_transfer_status, calculate_file_hash, file_signature, apply_delta
+)
+from ep32.commands import command
+from ep32.logger import log_buffer, flush_log, log_enabled, DEBUG
+from ep32.cache import refresh_cache
+from ep32.compress import Compressor, open_decompressor, compression_available
+from ep32.timeseries import MISSING
+from ep32 import stats
+
+# 毫秒时钟：设备上使用ticks系列函数（会回绕），主机模拟环境下由time.time换算
+try:
+    _ticks_ms = time.ticks_ms
+    _ticks_add = time.ticks_add
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    def _ticks_ms():
+        return int(time.time() * 1000)
+
+    def _ticks_add(ticks, delta):
+        return ticks + delta
+
+    def _ticks_diff(end, start):
+        return end - start
 
 # 启动服务器，监听端口5555
 def start_server():
     debug_log("启动TCP服务器，监听端口5555")
     try:
         addr = socket.getaddrinfo('0.0.0.0', SERVER_PORT)[0][-1]
-        debug_log(f"获取地址信息成功: {addr}")
+        debug_log("获取地址信息成功: %s", addr)
         
         s = socket.socket()
         debug_log("创建socket成功")
@@ -23,9 +58,10 @@ def start_server():
         
         # 不设置超时时间，使用阻塞模式
         s.bind(addr)
-        debug_log(f"绑定地址成功: {addr}")
+        debug_log("绑定地址成功: %s", addr)
         
-        s.listen(1)
+        # 连接队列与最大连接数一致，多个客户端同时连接时不会因队列已满而卡在握手
+        s.listen(MAX_CLIENTS)
         debug_log('服务器启动成功，正在监听端口 5555...')
         
         # 添加额外的调试信息，确认服务器状态
@@ -33,13 +69,13 @@ def start_server():
         wlan = network.WLAN(network.STA_IF)
         if wlan.isconnected():
             ip = wlan.ifconfig()[0]
-            debug_log(f"Wi-Fi连接状态: 已连接, IP: {ip}")
+            debug_log("Wi-Fi连接状态: 已连接, IP: %s", ip)
         else:
             debug_log("Wi-Fi连接状态: 未连接")
             
         return s
     except Exception as e:
-        debug_log(f"启动服务器时出错: {str(e)}")
+        log_error("启动服务器时出错: %s", e)
         # 尝试重新启动服务器
         debug_log("尝试重新启动服务器...")
         try:
@@ -48,127 +84,1335 @@ def start_server():
             time.sleep(1)
             return start_server()
         except Exception as e2:
-            debug_log(f"重新启动服务器失败: {str(e2)}")
+            log_warn("重新启动服务器失败: %s", e2)
             return None
 
-# 分块发送数据
-def send_chunked_data(socket, data, chunk_size=1024):
-    debug_log(f"分块发送数据，总大小: {len(data)} 字节")
+# 启动监控指标HTTP服务器，监听METRICS_PORT，返回MetricsServer，未配置端口或启动失败时返回None
+def start_metrics_server():
+    if not METRICS_PORT:
+        return None
+    s = None
+    try:
+        addr = socket.getaddrinfo('0.0.0.0', METRICS_PORT)[0][-1]
+        s = socket.socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind(addr)
+        s.listen(2)
+        debug_log("监控指标HTTP服务器启动成功，正在监听端口 %s...", METRICS_PORT)
+        return MetricsServer(s)
+    except Exception as e:
+        log_error("启动监控指标HTTP服务器时出错: %s", e)
+        if s:
+            s.close()
+        return None
+
+# 生成一组Prometheus指标: 说明、类型和各样本行，samples为[(标签, 值)]
+def _metric_family(lines, name, kind, help, samples):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{labels} {value}")
+
+# Prometheus文本格式的监控指标：系统状态、运行时长、各命令和关键环节的次数、耗时与字节数
+def metrics_text():
+    mem_free, mem_alloc, rssi, temp, files = sample_system_status()
+    lines = []
+    _metric_family(lines, "esp32_memory_free_bytes", "gauge", "Free heap memory.", [("", mem_free)])
+    _metric_family(lines, "esp32_memory_allocated_bytes", "gauge", "Allocated heap memory.", [("", mem_alloc)])
+    _metric_family(lines, "esp32_wifi_connected", "gauge", "Whether Wi-Fi is connected and reports signal strength.", [("", 0 if rssi == MISSING else 1)])
+    if rssi != MISSING:
+        _metric_family(lines, "esp32_wifi_rssi_dbm", "gauge", "Wi-Fi signal strength.", [("", rssi)])
+    if temp != MISSING:
+        _metric_family(lines, "esp32_temperature_fahrenheit", "gauge", "Internal temperature sensor reading.", [("", temp)])
+    if files != MISSING:
+        _metric_family(lines, "esp32_files", "gauge", "Files in the root directory.", [("", files)])
+    _metric_family(lines, "esp32_uptime_seconds", "gauge", "Seconds since boot.", [("", stats.uptime())])
+    commands = []
+    sections = []
+    for name, entry in stats.entries():
+        if name.startswith("@"):
+            sections.append((f'{{operation="{name[1:]}"}}', entry))
+        else:
+            commands.append((f'{{command="{name}"}}', entry))
+    _metric_family(lines, "esp32_commands_total", "counter", "Commands executed.",
+                   [(labels, entry.count) for labels, entry in commands])
+    for family, help, items in (("esp32_command", "Command execution time.", commands),
+                                ("esp32_operation", "Time spent in handshakes, transfers, logging, checkpoints and scrapes.", sections)):
+        lines.append(f"# HELP {family}_duration_seconds {help}")
+        lines.append(f"# TYPE {family}_duration_seconds summary")
+        for labels, entry in items:
+            lines.append(f"{family}_duration_seconds_sum{labels} {entry.total / 1000000}")
+            lines.append(f"{family}_duration_seconds_count{labels} {entry.count}")
+    _metric_family(lines, "esp32_command_received_bytes_total", "counter", "Bytes received by each command, including uploads.",
+                   [(labels, entry.rx) for labels, entry in commands])
+    _metric_family(lines, "esp32_command_chunked_sent_bytes_total", "counter",
+                   "Bytes sent by each command through chunked transfers; plain replies are not counted.",
+                   [(labels, entry.tx) for labels, entry in commands])
+    received = sent = 0
+    for labels, entry in sections:
+        received += entry.rx
+        sent += entry.tx
+    _metric_family(lines, "esp32_transfer_received_bytes_total", "counter", "Bytes received by chunked transfers.", [("", received)])
+    _metric_family(lines, "esp32_transfer_sent_bytes_total", "counter", "Bytes sent by chunked transfers.", [("", sent)])
+    return "\n".join(lines) + "\n"
+
+# 根据HTTP请求生成完整响应：GET /metrics 返回指标，其他请求返回404
+def metrics_response(request):
+    started = stats.start()
+    parts = request.split(b" ", 2)
+    path = parts[1].split(b"?", 1)[0] if len(parts) > 2 else b""
+    if parts[0] == b"GET" and path == b"/metrics":
+        status = "200 OK"
+        body = metrics_text().encode()
+    else:
+        status = "404 Not Found"
+        body = b"Not Found\n"
+    response = f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    stats.record(stats.SCRAPE, started)
+    return response
+
+# 监控指标HTTP服务器：新连接和抓取请求都在poll循环中处理，读取请求不阻塞命令连接，
+# 未在METRICS_TIMEOUT秒内发来完整请求的连接由expire()关闭
+class MetricsServer:
+    def __init__(self, server):
+        self.server = server
+        self.server_key = _poll_key(server)
+        self.poller = None
+        # 键 -> [socket, 已收到的请求, 超时时间]
+        self.clients = {}
+
+    # 把监听socket和未完成的抓取连接登记到poller，此后的新连接也登记到该poller
+    def attach(self, poller):
+        self.poller = poller
+        poller.register(self.server, select.POLLIN)
+        for client in self.clients.values():
+            poller.register(client[0], select.POLLIN)
+
+    # 处理poll返回的事件，不属于指标服务器时返回False
+    def handle(self, key):
+        if key == self.server_key:
+            self._accept()
+        elif key in self.clients:
+            self._read(key)
+        else:
+            return False
+        return True
+
+    # 距最早的抓取超时的毫秒数，没有未完成的抓取时返回-1
+    def timeout(self, now):
+        timeout = -1
+        for client in self.clients.values():
+            remaining = max(0, _ticks_diff(client[2], now))
+            if timeout < 0 or remaining < timeout:
+                timeout = remaining
+        return timeout
+
+    # 关闭超时仍未发来完整请求的连接
+    def expire(self, now):
+        for key, client in list(self.clients.items()):
+            if _ticks_diff(client[2], now) <= 0:
+                debug_log("指标抓取超时")
+                self._close(key)
+
+    def _accept(self):
+        try:
+            cl, addr = self.server.accept()
+        except OSError as e:
+            log_warn("接受指标抓取连接时出错: %s", e)
+            return
+        if len(self.clients) >= MAX_CLIENTS:
+            log_warn("指标抓取连接过多，拒绝: %s", addr)
+            cl.close()
+            return
+        key = _poll_key(cl)
+        self.clients[key] = [cl, b"", _ticks_add(_ticks_ms(), METRICS_TIMEOUT * 1000)]
+        self.poller.register(cl, select.POLLIN)
+
+    # 可读时只接收一次；收到完整的请求头（或512字节）后回复并关闭连接
+    def _read(self, key):
+        client = self.clients[key]
+        cl = client[0]
+        try:
+            chunk = cl.recv(512 - len(client[1]))
+            if chunk:
+                client[1] += chunk
+                if b"\r\n\r\n" not in client[1] and len(client[1]) < 512:
+                    return
+                # 响应不超过几KB，可直接放入发送缓冲区；对方不接收时最多等待METRICS_TIMEOUT秒
+                cl.settimeout(METRICS_TIMEOUT)
+                cl.sendall(metrics_response(client[1]))
+        except OSError as e:
+            debug_log("指标抓取出错: %s", e)
+        self._close(key)
+
+    def _close(self, key):
+        cl = self.clients.pop(key)[0]
+        self.poller.unregister(key)
+        try:
+            cl.close()
+        except OSError:
+            pass
+
+# 阻塞模式下等待sock可读（监听socket有新连接或客户端发来命令），等待期间处理指标抓取
+def wait_readable(sock, metrics):
+    poller = select.poll()
+    poller.register(sock, select.POLLIN)
+    metrics.attach(poller)
+    key = _poll_key(sock)
+    while True:
+        events = poller.poll(metrics.timeout(_ticks_ms()))
+        for obj, event in events:
+            if _poll_key(obj) == key:
+                return
+            metrics.handle(_poll_key(obj))
+        metrics.expire(_ticks_ms())
+
+# 累计确认长度，格式: A<8位十六进制已接收字节数>\n
+ACK_SIZE = 10
+
+# 接收指定字节数的数据，连接断开时返回已收到的部分
+def recv_exact(socket, size):
+    data = b""
+    while len(data) < size:
+        chunk = socket.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+# 把数据直接收进缓冲区（memoryview），返回字节数，连接断开时返回0
+# CPython的socket提供recv_into；MicroPython的socket提供readinto，读满缓冲区才返回
+def recv_into(socket, buf):
+    if hasattr(socket, "recv_into"):
+        return socket.recv_into(buf)
+    return socket.readinto(buf) or 0
+
+# 读满缓冲区（memoryview，切片不复制），返回实际读到的字节数（连接断开时小于缓冲区长度）
+def recv_exact_into(socket, buf):
+    received = 0
+    size = len(buf)
+    while received < size:
+        n = recv_into(socket, buf[received:] if received else buf)
+        if not n:
+            break
+        received += n
+    return received
+
+# 帧模式：每帧为8字节头（负载长度、请求ID、状态码）加负载
+FRAME_HEADER = ">IHH"
+FRAME_HEADER_SIZE = 8
+FRAME_MAX_REQUEST = 16384
+STATUS_OK = 0
+STATUS_MORE = 1
+STATUS_ERROR = 2
+
+# 发送一帧
+def send_frame(socket, request_id, status, payload=b""):
+    socket.sendall(ustruct.pack(FRAME_HEADER, len(payload), request_id, status) + payload)
+
+# 解析帧头，返回(负载长度, 请求ID, 状态码)
+def parse_frame_header(header):
+    return ustruct.unpack(FRAME_HEADER, header)
+
+# 读取一个请求帧，连接断开时返回None
+def read_frame(socket):
+    header = recv_exact(socket, FRAME_HEADER_SIZE)
+    if len(header) < FRAME_HEADER_SIZE:
+        return None
+    length, request_id, _ = parse_frame_header(header)
+    if length > FRAME_MAX_REQUEST:
+        raise OSError(f"请求帧过大: {length}")
+    payload = recv_exact(socket, length)
+    if len(payload) < length:
+        return None
+    return request_id, payload
+
+# 帧模式下交给命令处理函数的socket：发送的数据先缓存，
+# 在读取客户端数据前或缓存满一块时作为中间帧发出，命令结束时发出最终帧
+class FramedSocket:
+    def __init__(self, socket, request_id):
+        self.socket = socket
+        self.request_id = request_id
+        self.parts = []
+        self.size = 0
+        self.closed = False
+
+    def send(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        if self.size >= TRANSFER_CHUNK_SIZE:
+            self.flush(STATUS_MORE)
+        return len(data)
+
+    def sendall(self, data):
+        self.send(data)
+
+    def recv(self, size):
+        self.flush(STATUS_MORE)
+        return self.socket.recv(size)
+
+    def recv_into(self, buf):
+        self.flush(STATUS_MORE)
+        return recv_into(self.socket, buf)
+
+    def flush(self, status):
+        if self.parts or status != STATUS_MORE:
+            send_frame(self.socket, self.request_id, status, b"".join(self.parts))
+            self.parts = []
+            self.size = 0
+
+    # 丢弃未发出的输出，改为发送错误信息
+    def fail(self, message):
+        self.parts = [message.encode()]
+        self.size = len(self.parts[0])
+        self.finish(STATUS_ERROR)
+
+    def finish(self, status=STATUS_OK):
+        if not self.closed:
+            self.flush(status)
+            self.closed = True
+
+    def close(self):
+        self.finish()
+        self.socket.close()
+
+    def __getattr__(self, name):
+        return getattr(self.socket, name)
+
+# 批处理时收集单条命令输出的socket，不支持需要与客户端交互的命令
+class CaptureSocket:
+    def __init__(self):
+        self.parts = []
+
+    def send(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def sendall(self, data):
+        self.send(data)
+
+    def recv(self, size):
+        raise ValueError("批处理中不支持交互式命令")
+
+    def recv_into(self, buf):
+        self.recv(len(buf))
+
+    def close(self):
+        pass
+
+    def getvalue(self):
+        return b"".join(self.parts)
+
+# 日志流结束标志，日志内容中不会出现
+LOG_TAIL_END = b"\x04"
+
+# 检查客户端是否发来了数据（或已断开），不阻塞
+def _client_readable(cl):
+    poller = select.poll()
+    poller.register(cl.socket if isinstance(cl, FramedSocket) else cl, select.POLLIN)
+    return bool(poller.poll(0))
+
+# 日志跟随：命令返回后由会话循环定期调用pump()发送新日志，
+# 客户端发送任意数据或断开时结束，最后发送结束标志
+class LogTail:
+    def __init__(self, cl, since):
+        self.cl = cl
+        self.since = since
+
+    # 发送新日志
+    def send_new(self):
+        self.since, entries, lost = log_buffer.read_since(self.since)
+        if lost:
+            self.cl.send(f"... 丢失 {lost} 条日志 ...\n".encode())
+        for entry in entries:
+            self.cl.send(entry.encode())
+        if isinstance(self.cl, FramedSocket):
+            self.cl.flush(STATUS_MORE)
+
+    # 发送新日志，返回是否继续跟随
+    def pump(self):
+        self.send_new()
+        if _client_readable(self.cl):
+            self.cl.recv(16)
+            return False
+        return True
+
+    def finish(self):
+        self.cl.send(LOG_TAIL_END)
+        if isinstance(self.cl, FramedSocket):
+            self.cl.finish()
+
+# 阻塞模式下持续推送会话中的数据流（如日志跟随），直到客户端停止
+def run_stream(session):
+    stream = session.pop("stream", None)
+    if stream is None:
+        return
+    try:
+        while stream.pump():
+            time.sleep(LOG_TAIL_INTERVAL)
+    finally:
+        stream.finish()
+
+# 以帧模式执行一条命令，返回是否继续会话
+def run_framed_command(cl, request_id, payload, handler, credentials, session):
+    framed = FramedSocket(cl, request_id)
+    try:
+        keep = handler(framed, payload, credentials, session)
+    except OSError:
+        raise
+    except Exception as e:
+        log_error("命令执行出错: %s", e)
+        framed.fail(f"命令执行出错: {str(e)}")
+        return True
+    # 命令留下了数据流时，由数据流结束时发送最终帧
+    if "stream" not in session:
+        framed.finish()
+    return keep
+
+# 发送端流量控制：窗口为1时每块等待"OK"，否则允许多块在途并使用累计确认
+class _AckWindow:
+    def __init__(self, socket, window, chunk_size):
+        self.socket = socket
+        self.window = window
+        self.chunk_size = chunk_size
+        self.sent = 0
+        self.acked = 0
+
+    # 读取确认，直到未确认字节数不超过limit；按定长读取，不会读走后续数据
+    def wait(self, limit):
+        while self.sent - self.acked > limit:
+            if self.window == 1:
+                if recv_exact(self.socket, 2) != b"OK":
+                    return False
+                self.acked = self.sent
+                continue
+            ack = recv_exact(self.socket, ACK_SIZE)
+            if len(ack) != ACK_SIZE or ack[0:1] != b"A":
+                return False
+            position = int(ack[1:9], 16)
+            if position > self.acked:
+                self.acked = position
+        return True
+
+    # 发送一块数据，窗口已满时等待确认
+    def send(self, chunk):
+        self.socket.sendall(chunk)
+        self.sent += len(chunk)
+        return self.wait((self.window - 1) * self.chunk_size)
+
+    # 等待全部数据被确认
+    def finish(self):
+        return self.wait(0)
+
+# 接收端确认：每收满一块确认一次，窗口模式下发送累计字节数
+class _Acker:
+    def __init__(self, socket, window, chunk_size):
+        self.socket = socket
+        self.window = window
+        self.chunk_size = chunk_size
+        self.received = 0
+        self.unacked = 0
+
+    # 本次最多可读取的字节数，保证确认与发送端的分块对齐
+    def want(self, remaining):
+        return min(self.chunk_size - self.unacked, remaining)
+
+    def update(self, n, done=False):
+        self.received += n
+        self.unacked += n
+        if self.unacked >= self.chunk_size or (done and self.unacked):
+            if self.window == 1:
+                self.socket.send("OK".encode())
+            else:
+                self.socket.send(f"A{self.received:08x}\n".encode())
+            self.unacked = 0
+
+# 设置socket超时，None为阻塞；批处理收集输出的socket没有超时设置，直接跳过
+def _set_timeout(socket, timeout):
+    try:
+        socket.settimeout(timeout)
+    except AttributeError:
+        pass
+
+# 分块传输的装饰器：传输期间socket读写超过TRANSFER_TIMEOUT秒抛出OSError，
+# 客户端中途停止响应时放弃本次传输，事件循环和其他会话最多等待这一次超时；结束后恢复阻塞模式
+def _transfer(func):
+    def wrapper(socket, *args, **kwargs):
+        _set_timeout(socket, TRANSFER_TIMEOUT)
+        try:
+            return func(socket, *args, **kwargs)
+        finally:
+            _set_timeout(socket, None)
+    return wrapper
+
+# 发送数据总长度并等待客户端确认，压缩传输时长度前加"Z"
+def _send_length(socket, total_length, compress=False):
+    socket.send((f"Z{total_length}" if compress else str(total_length)).encode())
+    if recv_exact(socket, 2) != b"OK":
+        log_warn("分块发送数据失败: 客户端未确认总长度")
+        return False
+    return True
+
+# 发送数据体。read(size)返回下一段原始数据，返回空表示数据已读完
+# 压缩传输时数据按段发送：2字节长度 + 压缩数据，长度为0的段表示结束，每段确认一次
+def _send_body(socket, total_length, read, chunk_size, window, compress):
+    sender = _AckWindow(socket, window, chunk_size + 2 if compress else chunk_size)
+    compressor = Compressor() if compress else None
+    pending = b""
+    sent = 0
+    while sent < total_length:
+        chunk = read(min(chunk_size, total_length - sent))
+        if not chunk:
+            return sender, False
+        sent += len(chunk)
+        if compressor is None:
+            if not sender.send(chunk):
+                return sender, False
+            continue
+        pending += compressor.compress(chunk)
+        while len(pending) >= chunk_size:
+            if not sender.send(ustruct.pack(">H", chunk_size) + pending[:chunk_size]):
+                return sender, False
+            pending = pending[chunk_size:]
+    if compressor is not None:
+        pending += compressor.flush()
+        while pending:
+            segment = pending[:chunk_size]
+            if not sender.send(ustruct.pack(">H", len(segment)) + segment):
+                return sender, False
+            pending = pending[chunk_size:]
+        if not sender.send(b"\x00\x00"):
+            return sender, False
+    return sender, sender.finish()
+
+# 分块发送数据，compress为True时压缩发送（数据太小时不压缩）
+@_transfer
+def send_chunked_data(socket, data, chunk_size=TRANSFER_CHUNK_SIZE, window=1, compress=False):
+    if isinstance(data, str):
+        data = data.encode()
     total_length = len(data)
+    compress = compress and total_length >= COMPRESS_MIN_SIZE
+    debug_log("分块发送数据，总大小: %s 字节，窗口: %s，压缩: %s", total_length, window, compress)
+    started = stats.start()
     # 首先发送数据总长度
-    socket.send(str(total_length).encode())
-    # 等待客户端确认
-    ack = socket.recv(10)
-    if ack.decode() != "OK":
-        debug_log("分块发送数据失败: 客户端未确认总长度")
+    if not _send_length(socket, total_length, compress):
         return False
     
-    # 分块发送数据
-    for i in range(0, total_length, chunk_size):
-        chunk = data[i:i+chunk_size]
-        socket.send(chunk.encode())
-        # 等待客户端确认
-        ack = socket.recv(10)
-        if ack.decode() != "OK":
-            debug_log(f"分块发送数据失败: 客户端未确认块 {i//chunk_size}")
-            return False
+    # 分块发送数据，窗口内的块无需逐块等待确认
+    view = memoryview(data)
+    position = 0
+    def read(size):
+        nonlocal position
+        chunk = view[position:position+size]
+        position += size
+        return chunk
+    sender, ok = _send_body(socket, total_length, read, chunk_size, window, compress)
+    stats.record(stats.SEND, started, tx=sender.sent)
+    if not ok:
+        log_warn("分块发送数据失败: 客户端已确认 %s 字节", sender.acked)
+        return False
     
     debug_log("分块发送数据成功")
     return True
 
+# 流式分块发送文件：复用一个预分配缓冲区，内存占用与文件大小无关
+# offset/length指定发送范围，用于断点续传下载；中断时记录客户端已确认的位置
+@_transfer
+def send_file_chunked(socket, filename, chunk_size=TRANSFER_CHUNK_SIZE, window=1, offset=0, length=None, compress=False):
+    # 在发送长度头之前检查范围，负数会让客户端与服务端互相等待
+    if offset < 0 or (length is not None and length < 0):
+        raise ValueError(f"发送范围无效: {offset}+{length}")
+    file_size = os.stat(filename)[6]
+    offset = min(offset, file_size)
+    total_length = file_size - offset
+    if length is not None and length < total_length:
+        total_length = length
+    compress = compress and total_length >= COMPRESS_MIN_SIZE
+    debug_log("流式发送文件: %s, 范围: %s+%s/%s 字节，窗口: %s，压缩: %s", filename, offset, total_length, file_size, window, compress)
+    started = stats.start()
+    if not _send_length(socket, total_length, compress):
+        return False
+    
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    try:
+        with open(filename, "rb") as f:
+            f.seek(offset)
+            sender, ok = _send_body(socket, total_length, lambda size: view[:f.readinto(view[:size])],
+                                    chunk_size, window, compress)
+    except OSError as e:
+        log_error("流式发送文件出错: %s", e)
+        sender, ok = None, False
+    stats.record(stats.SEND, started, tx=sender.sent if sender else 0)
+    
+    if not ok:
+        # 记录客户端已确认的位置（压缩传输的确认位置不对应文件偏移，不记录），便于通过 resume <文件名> down 查询
+        if sender and not compress:
+            log_warn("流式发送文件失败: 已确认 %s/%s 字节", sender.acked, total_length)
+            TransferCheckpoint(filename, file_size, offset, DOWNLOAD).save(None, offset + sender.acked)
+        return False
+    
+    delete_transfer_status(filename, DOWNLOAD)
+    debug_log("流式发送文件成功: %s", filename)
+    return True
+
+# 未压缩数据读取：按块对齐直接收进调用方的缓冲区并发送确认
+class _PlainReader:
+    def __init__(self, socket, acker):
+        self.socket = socket
+        self.acker = acker
+
+    def readinto(self, buf, remaining):
+        want = self.acker.want(remaining)
+        n = recv_into(self.socket, buf[:want] if len(buf) > want else buf)
+        if n:
+            self.acker.update(n, n >= remaining)
+        return n
+
+# 压缩分段流：逐段读取压缩数据供解压器使用，每段读完后发送确认
+class _SegmentStream(io.IOBase):
+    def __init__(self, socket, acker):
+        self.socket = socket
+        self.acker = acker
+        self.header = memoryview(bytearray(2))
+        self.left = 0
+        self.ended = False
+
+    def readinto(self, buf):
+        if self.ended:
+            return 0
+        if self.left == 0:
+            if recv_exact_into(self.socket, self.header) < 2:
+                raise OSError("连接中断")
+            self.left = (self.header[0] << 8) | self.header[1]
+            self.ended = self.left == 0
+            self.acker.update(2, self.ended)
+            if self.ended:
+                return 0
+        # 解压器传入的可能是bytearray，切片会复制，需通过memoryview切片
+        n = recv_into(self.socket, memoryview(buf)[:self.left] if len(buf) > self.left else buf)
+        if not n:
+            raise OSError("连接中断")
+        self.left -= n
+        self.acker.update(n, self.left == 0)
+        return n
+
+    # 读完剩余的段直到结束标记
+    def drain(self):
+        buffer = bytearray(64)
+        while self.readinto(buffer):
+            pass
+
+# 解压数据读取：解压结果直接写入调用方的缓冲区
+class _InflateReader:
+    def __init__(self, socket, acker):
+        self.stream = _SegmentStream(socket, acker)
+        self.decompressor = open_decompressor(self.stream)
+
+    def readinto(self, buf, remaining):
+        n = self.decompressor.readinto(buf[:remaining] if len(buf) > remaining else buf)
+        if n and n >= remaining:
+            # 原始数据已完整，读掉结束标记
+            self.stream.drain()
+        return n
+
 # 接收分块数据
-def receive_chunked_data(socket, filename=None, resume_position=0):
-    debug_log(f"接收分块数据，文件名: {filename}, 恢复位置: {resume_position}")
-    # 接收数据总长度
-    length_str = socket.recv(1024).decode()
+@_transfer
+# header为调用方已读取的长度头
+def receive_chunked_data(socket, filename=None, resume_position=0, chunk_size=TRANSFER_CHUNK_SIZE, window=1, resume_hash=0, header=None):
+    debug_log("接收分块数据，文件名: %s, 恢复位置: %s, 窗口: %s", filename, resume_position, window)
+    started = stats.start()
+    # 接收数据总长度，"Z"开头表示压缩传输
+    length_str = (header or socket.recv(1024)).decode()
+    compressed = length_str.startswith("Z")
     try:
-        total_length = int(length_str)
-        debug_log(f"数据总长度: {total_length} 字节")
+        total_length = int(length_str[1:] if compressed else length_str)
+        debug_log("数据总长度: %s 字节，压缩: %s", total_length, compressed)
+        if compressed and not compression_available():
+            raise ValueError("固件不支持解压")
     except Exception as e:
-        debug_log(f"接收数据总长度错误: {str(e)}")
+        log_error("接收数据总长度错误: %s", e)
         return None, 0
     
     # 发送确认
     socket.send("OK".encode())
+    if compressed:
+        acker = _Acker(socket, window, chunk_size + 2)
+        reader = _InflateReader(socket, acker)
+    else:
+        acker = _Acker(socket, window, chunk_size)
+        reader = _PlainReader(socket, acker)
     
     # 如果提供了文件名，则写入文件
     if filename:
-        mode = "ab" if resume_position > 0 else "wb"
-        debug_log(f"写入文件模式: {mode}")
+        # 续传时用读写模式从断点覆盖写入，断点之后未记录的残留数据会被覆盖
+        mode = "r+b" if resume_position > 0 else "wb"
+        debug_log("写入文件模式: %s", mode)
         with open(filename, mode) as f:
             if resume_position > 0:
                 f.seek(resume_position)
-                debug_log(f"文件指针移动到位置: {resume_position}")
+                debug_log("文件指针移动到位置: %s", resume_position)
             
-            # 分块接收数据
+            # 分块接收数据，边收边计算CRC32，按检查点策略批量保存传输状态
+            # 所有块复用同一个预分配缓冲区，整块时不再切片
             received = resume_position
-            while received < total_length:
-                chunk = socket.recv(1024)
-                f.write(chunk)
-                received += len(chunk)
-                # 发送确认
-                socket.send("OK".encode())
-                
-                # 保存传输状态
-                save_transfer_status(filename, received, total_length, 0)
-                debug_log(f"已接收: {received}/{total_length} 字节")
+            checksum = Checksum(value=resume_hash)
+            checkpoint = TransferCheckpoint(filename, total_length, resume_position)
+            buffer = memoryview(bytearray(chunk_size))
+            try:
+                while received < total_length:
+                    n = reader.readinto(buffer, total_length - received)
+                    if not n:
+                        break
+                    chunk = buffer if n == chunk_size else buffer[:n]
+                    f.write(chunk)
+                    checksum.update(chunk)
+                    received += n
+                    checkpoint.update(f, received, checksum.value)
+            except OSError as e:
+                log_error("接收数据出错: %s", e)
+            stats.record(stats.RECV, started, rx=acker.received)
+            
+            if received < total_length:
+                # 连接断开时保存最后的检查点，便于续传
+                checkpoint.save(f, received, checksum.value)
+                log_warn("连接中断，已接收: %s/%s 字节，检查点写入 %s 次", received, total_length, checkpoint.writes)
+                return None, received
             
             # 传输完成，删除状态文件
-            delete_transfer_status()
-            debug_log(f"文件接收完成: {filename}, 大小: {total_length} 字节")
+            delete_transfer_status(filename)
+            debug_log("文件接收完成: %s, 大小: %s 字节，CRC32: %s，检查点写入 %s 次", filename, total_length, checksum.hexdigest(), checkpoint.writes)
             return filename, total_length
     else:
-        # 如果没有提供文件名，则返回接收到的数据
-        data = b""
+        # 如果没有提供文件名，则返回接收到的数据：按总长度一次分配，数据直接收进对应位置
+        data = bytearray(total_length)
+        view = memoryview(data)
         received = 0
-        while received < total_length:
-            chunk = socket.recv(1024)
-            data += chunk
-            received += len(chunk)
-            # 发送确认
-            socket.send("OK".encode())
-            debug_log(f"已接收: {received}/{total_length} 字节")
+        try:
+            while received < total_length:
+                n = reader.readinto(view[received:], total_length - received)
+                if not n:
+                    break
+                received += n
+        except OSError as e:
+            log_error("接收数据出错: %s", e)
+        stats.record(stats.RECV, started, rx=acker.received)
+        if received < total_length:
+            log_warn("连接中断，已接收: %s/%s 字节", received, total_length)
+            return None, received
         
-        debug_log(f"数据接收完成，大小: {total_length} 字节")
-        return data.decode(), total_length
+        debug_log("数据接收完成，大小: %s 字节", total_length)
+        return str(data, "utf-8"), total_length
+
+# 解析客户端握手确认，格式: OK[;选项=值...]
+def parse_handshake(ack):
+    parts = ack.decode().strip().split(";")
+    if parts[0] != "OK":
+        return None
+    options = {}
+    for part in parts[1:]:
+        if "=" in part:
+            key, value = part.split("=", 1)
+            options[key.strip()] = value.strip()
+    return options
+
+# 列出文件命令
+@command("ls", help="ls - 列出文件")
+def cmd_ls(cl, args, session):
+    files = list_files()
+    if session["compress"]:
+        # 协商了压缩的客户端按分块协议接收文件列表
+        send_chunked_data(cl, files, window=session["window"], compress=True)
+    else:
+        cl.send(files.encode())
+
+# 读取文件命令
+@command("cat", help="cat <文件名> - 读取文件内容")
+def cmd_cat(cl, args, session):
+    filename = args.strip()
+    if not filename:
+        cl.send('请指定文件名'.encode())
+    elif get_file_size(filename) >= 0:
+        # 流式分块发送，按原始字节发送，二进制文件也不会损坏
+        if not send_file_chunked(cl, filename, window=session["window"], compress=session["compress"]):
+            cl.send('文件发送失败'.encode())
+    else:
+        cl.send(f'读取文件错误: 文件 {filename} 不存在'.encode())
+
+# 上传文件命令
+@command("upload", help="upload <文件名> - 上传文件")
+def cmd_upload(cl, args, session):
+    filename = args.strip()
+    if not filename:
+        cl.send('请指定文件名'.encode())
+        return
+    # 检查是否已有传输状态
+    transfer_status = get_transfer_status(filename, UPLOAD)
+    if transfer_status and verify_transfer_status(filename, transfer_status):
+        # 断点续传，已接收部分的CRC32校验通过；附上该CRC32，由客户端确认本地文件的同一部分未被修改
+        cl.send(f"RESUME:{transfer_status['position']}:{transfer_status['total_size']}:{transfer_status['file_hash']:08x}".encode())
+        header = cl.recv(1024)
+        if header == b"RESTART":
+            # 本地文件已改变，放弃断点从头接收
+            debug_log("客户端文件已改变，重新上传: %s", filename)
+            delete_transfer_status(filename)
+            cl.send("READY".encode())
+            received_filename, received_size = receive_chunked_data(cl, filename, window=session["window"])
+        else:
+            # 接收文件数据
+            received_filename, received_size = receive_chunked_data(
+                cl, filename, transfer_status["position"], window=session["window"],
+                resume_hash=transfer_status["file_hash"], header=header)
+    else:
+        # 新上传
+        cl.send("READY".encode())
+        # 接收文件数据
+        received_filename, received_size = receive_chunked_data(cl, filename, window=session["window"])
+    if received_filename:
+        cl.send(f"文件 {filename} 上传成功，共 {received_size} 字节".encode())
+    else:
+        cl.send("文件上传失败".encode())
+
+# 增量同步命令
+@command("sync", help="sync <文件名> [块大小] - 增量同步文件")
+def cmd_sync(cl, args, session):
+    params = args.split()
+    if not params:
+        cl.send('请指定文件名'.encode())
+        return
+    filename = params[0]
+    try:
+        block_size = int(params[1]) if len(params) > 1 else SYNC_BLOCK_SIZE
+    except ValueError:
+        block_size = -1
+    # 块大小决定签名和应用增量时的缓冲区大小，超出范围时在分配之前拒绝；
+    # 不能改用其他块大小，客户端按自己指定的块大小生成增量
+    if not SYNC_MIN_BLOCK_SIZE <= block_size <= SYNC_MAX_BLOCK_SIZE:
+        cl.send(f'块大小无效，应为 {SYNC_MIN_BLOCK_SIZE}-{SYNC_MAX_BLOCK_SIZE} 字节，格式: sync <文件名> [块大小]'.encode())
+        return
+    delta_filename = filename + ".delta"
+    # 发送分块签名，客户端据此只发送变化的部分
+    if not send_chunked_data(cl, file_signature(filename, block_size), window=session["window"]):
+        return
+    received_filename, received_size = receive_chunked_data(cl, delta_filename, window=session["window"])
+    if not received_filename:
+        cl.send("同步失败: 增量数据接收不完整".encode())
+        return
+    try:
+        size = apply_delta(filename, delta_filename, block_size)
+        checksum = calculate_file_hash(filename)
+        cl.send(f"SYNCED:{size}:{checksum.hexdigest()}".encode())
+    except Exception as e:
+        log_warn("应用增量失败: %s", e)
+        cl.send(f"同步失败: {str(e)}".encode())
+
+# 解析 <文件名> [偏移] [长度]：文件名可以含空格，从右边取出至多两个整数作为偏移和长度，其余为文件名；
+# 剩余部分已是存在的文件名时不再拆分（如文件名以数字结尾）。返回(文件名, 偏移, 长度)，未指定的偏移为0、长度为None
+def _parse_range_args(args):
+    filename = args.strip()
+    numbers = []
+    while len(numbers) < 2 and " " in filename and get_file_size(filename) < 0:
+        head, tail = filename.rsplit(" ", 1)
+        try:
+            numbers.insert(0, int(tail))
+        except ValueError:
+            break
+        filename = head.rstrip()
+    offset = numbers[0] if numbers else 0
+    length = numbers[1] if len(numbers) > 1 else None
+    return filename, offset, length
+
+# 下载文件命令
+@command("get", help="get <文件名> [偏移] [长度] - 下载文件（可指定范围）")
+def cmd_get(cl, args, session):
+    # 可选的偏移和长度，用于断点续传下载
+    filename, offset, length = _parse_range_args(args)
+    if not filename:
+        cl.send('请指定文件名'.encode())
+        return
+    file_size = get_file_size(filename)
+    if file_size < 0:
+        cl.send("文件不存在".encode())
+    elif offset < 0 or (length is not None and length < 0):
+        cl.send('偏移或长度无效，格式: get <文件名> [偏移] [长度]'.encode())
+    # 发送范围大小并流式分块发送文件内容，按协商的窗口流水线发送；偏移超过文件大小时发送0字节
+    elif send_file_chunked(cl, filename, window=session["window"], offset=offset, length=length, compress=session["compress"]):
+        cl.send("COMPLETE".encode())
+    else:
+        cl.send("文件下载失败".encode())
 
 # 处理客户端连接
 def handle_client_connection(cl, addr, credentials):
-    debug_log(f'客户端连接成功，地址: {addr}')
+    debug_log('客户端连接成功，地址: %s', addr)
 
     # 客户端连接成功后，LED常亮
     led_on()
     
+    # 关闭Nagle算法，避免窗口模式下的小确认包被延迟（部分固件不支持）
+    try:
+        cl.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except:
+        pass
+    
     # 发送初始握手消息
     debug_log("发送握手消息...")
+    started = stats.start()
     cl.send('y'.encode())
     
-    # 等待客户端确认，使用非阻塞方式
-    cl.setblocking(False)
-    start_time = time.time()
-    ack_received = False
+    # 等待客户端确认，poll等待数据到达，不轮询
+    poller = select.poll()
+    poller.register(cl, select.POLLIN)
+    deadline = _ticks_add(_ticks_ms(), HANDSHAKE_TIMEOUT * 1000)
     
     debug_log("等待客户端确认...")
-    while time.time() - start_time < 5:  # 5秒超时
+    options = None
+    while options is None:
+        remaining = _ticks_diff(deadline, _ticks_ms())
+        if remaining <= 0 or not poller.poll(remaining):
+            break
         try:
-            ack = cl.recv(10)
-            if ack.decode() == "OK":
-                ack_received = True
-                debug_log("握手成功")
-                break
-        except:
-            # 非阻塞模式下，没有数据会抛出异常
-            time.sleep(0.1)
-    
-    # 恢复阻塞模式
-    cl.setblocking(True)
+            ack = cl.recv(64)
+        except OSError:
+            break
+        if not ack:
+            break
+        options = parse_handshake(ack)
+    poller.unregister(cl)
     
-    if not ack_received:
-        debug_log("客户端握手超时")
+    if options is None:
+        log_warn("客户端握手超时")
         cl.close()
         led_off()
-        return False
+        return None
+    debug_log("握手成功")
 
     # 接收客户端数据
     debug_log("开始接收客户端数据...")
-    return True
+    session = open_session(cl, addr, options)
+    stats.record(stats.HANDSHAKE, started)
+    return session
+
+# 根据握手选项建立会话，旧客户端只回复"OK"，保持逐块确认、不压缩
+def open_session(cl, addr, options):
+    session = {"addr": addr, "window": 1, "compress": False, "frame": False}
+    if "win" in options:
+        try:
+            session["window"] = max(1, min(int(options["win"]), MAX_WINDOW))
+        except ValueError:
+            pass
+    if options.get("z") == "1":
+        session["compress"] = compression_available()
+    session["frame"] = options.get("frame") == "1"
+    if options:
+        reply = f"OK;win={session['window']};z={1 if session['compress'] else 0}"
+        if session["frame"]:
+            reply += ";frame=1"
+        cl.send(reply.encode())
+        debug_log("协商会话参数: 窗口 %s，压缩 %s，帧模式 %s", session['window'], session['compress'], session['frame'])
+    return session
+
+# poll()在设备上返回socket对象，在CPython中返回文件描述符，统一换算为连接表的键
+def _poll_key(obj):
+    return obj.fileno() if hasattr(obj, "fileno") else obj
+
+# 基于select.poll的事件循环：在一个循环中处理新连接、握手、命令、日志跟随和定时任务，
+# 空闲时阻塞在poll上不占用CPU，定时任务按时运行而不依赖客户端连接。
+# 命令本身仍同步执行：upload、get、cat、sync 等传输命令在传输结束前不让出事件循环，期间其他会话、
+# 指标抓取和定时任务都要等待；对方停止响应时每次读写最多等待TRANSFER_TIMEOUT秒后放弃传输
+class PollServer:
+    def __init__(self, server, handler, credentials, metrics=None):
+        self.server = server
+        self.server_key = _poll_key(server)
+        self.handler = handler
+        self.credentials = credentials
+        self.poller = select.poll()
+        self.poller.register(server, select.POLLIN)
+        # 监控指标HTTP服务器，抓取连接同样登记在poller中，在事件循环中读取请求并回复
+        self.metrics = metrics
+        if metrics:
+            metrics.attach(self.poller)
+        # 键 -> 连接状态，due为握手超时或下次推送数据流的时间，started为发送握手消息的时间（用于统计），
+        # frame为帧模式下已收到的不完整请求帧
+        self.clients = {}
+        # 定时任务: [下次运行时间, 间隔毫秒, 回调]
+        self.timers = []
+        # 刚执行过命令时先检查是否还有待处理的请求，没有才算空闲
+        self.busy = False
+
+    # 登记定时任务，间隔单位为秒
+    def add_timer(self, interval, callback):
+        interval = int(interval * 1000)
+        self.timers.append([_ticks_add(_ticks_ms(), interval), interval, callback])
+
+    def run(self):
+        while True:
+            events = self.poller.poll(self._timeout(_ticks_ms()))
+            for obj, event in events:
+                key = _poll_key(obj)
+                if key == self.server_key:
+                    self._accept()
+                elif self.metrics and self.metrics.handle(key):
+                    pass
+                else:
+                    client = self.clients.get(key)
+                    if client:
+                        self._on_readable(client)
+            if not events:
+                # 没有待处理的请求时刷新已过期的缓存
+                refresh_cache()
+            self._run_due(_ticks_ms())
+            if self.metrics:
+                self.metrics.expire(_ticks_ms())
+
+    # 距最近一个到期时间的毫秒数，没有待办时无限等待
+    def _timeout(self, now):
+        if self.busy:
+            self.busy = False
+            return 0
+        timeout = -1
+        for due in [timer[0] for timer in self.timers] + [c["due"] for c in self.clients.values()]:
+            if due is None:
+                continue
+            remaining = max(0, _ticks_diff(due, now))
+            if timeout < 0 or remaining < timeout:
+                timeout = remaining
+        if self.metrics:
+            remaining = self.metrics.timeout(now)
+            if remaining >= 0 and (timeout < 0 or remaining < timeout):
+                timeout = remaining
+        return timeout
+
+    # 执行到期的定时任务、握手超时和数据流推送
+    def _run_due(self, now):
+        for timer in self.timers:
+            if _ticks_diff(timer[0], now) <= 0:
+                timer[0] = _ticks_add(now, timer[1])
+                try:
+                    timer[2]()
+                except Exception as e:
+                    log_error("定时任务出错: %s", e)
+        for client in list(self.clients.values()):
+            if client["due"] is None or _ticks_diff(client["due"], now) > 0:
+                continue
+            if client["session"] is None:
+                log_warn("客户端握手超时: %s", client["addr"])
+                self._close(client)
+                continue
+            client["due"] = _ticks_add(now, int(LOG_TAIL_INTERVAL * 1000))
+            try:
+                client["stream"].send_new()
+            except OSError as e:
+                debug_log("客户端断开连接(%s): %s", client["addr"], e)
+                self._close(client)
+
+    # 接受新连接并发送握手消息，确认由事件循环异步等待
+    def _accept(self):
+        cl, addr = self.server.accept()
+        if len(self.clients) >= MAX_CLIENTS:
+            log_warn("连接数已满，拒绝客户端: %s", addr)
+            cl.close()
+            return
+        debug_log('客户端连接成功，地址: %s', addr)
+        led_on()
+        try:
+            cl.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except:
+            pass
+        debug_log("发送握手消息...")
+        started = stats.start()
+        cl.send('y'.encode())
+        key = _poll_key(cl)
+        self.clients[key] = {
+            "socket": cl,
+            "key": key,
+            "addr": addr,
+            "session": None,
+            "stream": None,
+            "due": _ticks_add(_ticks_ms(), HANDSHAKE_TIMEOUT * 1000),
+            "started": started,
+            "frame": b""
+        }
+        self.poller.register(cl, select.POLLIN)
+
+    def _on_readable(self, client):
+        try:
+            if client["session"] is None:
+                self._handshake(client)
+            elif client["stream"]:
+                self._stop_stream(client)
+            else:
+                self._serve(client)
+        except OSError as e:
+            debug_log("客户端断开连接(%s): %s", client["addr"], e)
+            self._close(client)
+        except Exception as e:
+            log_error("会话出错(%s): %s", client["addr"], e)
+            self._close(client)
+
+    def _handshake(self, client):
+        cl = client["socket"]
+        ack = cl.recv(64)
+        options = parse_handshake(ack) if ack else None
+        if options is None:
+            log_warn("客户端握手失败: %s", client["addr"])
+            self._close(client)
+            return
+        debug_log("握手成功")
+        client["session"] = open_session(cl, client["addr"], options)
+        client["due"] = None
+        stats.record(stats.HANDSHAKE, client["started"])
+
+    # 日志跟随期间客户端发来任意数据表示停止
+    def _stop_stream(self, client):
+        stream = client["stream"]
+        client["stream"] = None
+        client["due"] = None
+        if not client["socket"].recv(16):
+            debug_log("客户端断开连接: %s", client["addr"])
+            self._close(client)
+            return
+        stream.send_new()
+        stream.finish()
+
+    # 帧模式下读取请求帧的一部分：每次可读时只接收一次，且不超过当前帧的剩余字节（不读走后续数据），
+    # 帧不完整时返回b""，等下次可读再继续，不阻塞其他连接；连接断开时返回None
+    def _read_frame_part(self, client):
+        cl = client["socket"]
+        frame = client["frame"]
+        if len(frame) < FRAME_HEADER_SIZE:
+            want = FRAME_HEADER_SIZE - len(frame)
+        else:
+            length = parse_frame_header(frame[:FRAME_HEADER_SIZE])[0]
+            want = FRAME_HEADER_SIZE + length - len(frame)
+        if want:
+            chunk = cl.recv(want)
+            if not chunk:
+                return None
+            frame += chunk
+        if len(frame) >= FRAME_HEADER_SIZE:
+            length, request_id, _ = parse_frame_header(frame[:FRAME_HEADER_SIZE])
+            if length > FRAME_MAX_REQUEST:
+                raise OSError(f"请求帧过大: {length}")
+            if len(frame) == FRAME_HEADER_SIZE + length:
+                client["frame"] = b""
+                return request_id, frame[FRAME_HEADER_SIZE:]
+        client["frame"] = frame
+        return b""
+
+    # 读取并执行一条命令
+    def _serve(self, client):
+        cl = client["socket"]
+        session = client["session"]
+        if session["frame"]:
+            request = self._read_frame_part(client)
+            if request == b"":
+                return
+            request_id, data = request if request else (0, None)
+        else:
+            data = cl.recv(1024) or None
+        if data is None:
+            debug_log("客户端断开连接: %s", client["addr"])
+            self._close(client)
+            return
+        if log_enabled(DEBUG):
+            debug_log('接收到的数据(%s): %s', client["addr"], data.decode())
+        if session["frame"]:
+            keep = run_framed_command(cl, request_id, data, self.handler, self.credentials, session)
+        else:
+            keep = self.handler(cl, data, self.credentials, session)
+        self.busy = True
+        if not keep:
+            self._close(client)
+            return
+        # 命令留下的数据流（如日志跟随）由定时推送，客户端发来数据时结束
+        stream = session.pop("stream", None)
+        if stream:
+            client["stream"] = stream
+            client["due"] = _ticks_add(_ticks_ms(), int(LOG_TAIL_INTERVAL * 1000))
+
+    # 命令处理函数（如exit、reboot）可能已经关闭了socket，此时fileno()为-1，按登记时的键注销
+    def _close(self, client):
+        if self.clients.pop(client["key"], None) is None:
+            return
+        self.poller.unregister(client["key"])
+        try:
+            client["socket"].close()
+        except OSError:
+            pass
+        if not self.clients:
+            led_off()
+
+# 启动poll事件循环服务器，server为start_server()创建的监听socket，handler为命令处理函数，
+# metrics为start_metrics_server()创建的指标服务器（可为None）
+def start_poll_server(server, handler, credentials, metrics=None):
+    debug_log("启动事件循环服务器，最多 %s 个客户端", MAX_CLIENTS)
+    loop = PollServer(server, handler, credentials, metrics)
+    loop.add_timer(MONITOR_INTERVAL, monitor_system_status)
+    # 定期把缓冲的日志写入闪存
+    loop.add_timer(LOG_FLUSH_INTERVAL, flush_log)
+    loop.run()
+
+# 取得异步流对应的底层socket，命令处理函数仍按阻塞方式读写
+def _stream_socket(reader, writer):
+    # uasyncio的Stream直接持有socket
+    if hasattr(reader, "s"):
+        return reader.s
+    # CPython的传输层socket不可直接收发，复制一个文件描述符使用
+    return writer.get_extra_info("socket").dup()
+
+# 异步握手，超时不阻塞其他会话
+async def _async_handshake(reader, cl, addr):
+    debug_log('客户端连接成功，地址: %s', addr)
+    led_on()
+    debug_log("发送握手消息...")
+    started = stats.start()
+    cl.send('y'.encode())
+    try:
+        ack = await asyncio.wait_for(reader.read(64), HANDSHAKE_TIMEOUT)
+        options = parse_handshake(ack)
+    except Exception as e:
+        log_warn("客户端握手失败: %s", e)
+        options = None
+    if options is None:
+        log_warn("客户端握手超时")
+        return None
+    debug_log("握手成功")
+    session = open_session(cl, addr, options)
+    stats.record(stats.HANDSHAKE, started)
+    return session
+
+# 异步读取一个请求帧，连接断开时返回None
+async def _async_read_frame(reader):
+    try:
+        header = await reader.readexactly(FRAME_HEADER_SIZE)
+        length, request_id, _ = parse_frame_header(header)
+        if length > FRAME_MAX_REQUEST:
+            raise OSError(f"请求帧过大: {length}")
+        payload = await reader.readexactly(length) if length else b""
+    except EOFError:
+        return None
+    return request_id, payload
+
+# 单个客户端会话：异步等待命令，命令本身同步执行，多个会话按命令交替进行；
+# 与poll模式相同，传输命令执行期间不让出事件循环，其他会话和监控任务等到传输结束（或超时放弃）后才继续
+async def _serve_session(reader, writer, handler, credentials):
+    addr = writer.get_extra_info("peername")
+    cl = _stream_socket(reader, writer)
+    try:
+        session = await _async_handshake(reader, cl, addr)
+        while session:
+            if session["frame"]:
+                request = await _async_read_frame(reader)
+                if request is None:
+                    debug_log("客户端断开连接: %s", addr)
+                    break
+                request_id, data = request
+            else:
+                data = await reader.read(1024)
+                if not data:
+                    debug_log("客户端断开连接: %s", addr)
+                    break
+            if log_enabled(DEBUG):
+                debug_log('接收到的数据(%s): %s', addr, data.decode())
+            # 传输类命令需要阻塞收发，执行期间临时切换为阻塞模式
+            cl.setblocking(True)
+            try:
+                if session["frame"]:
+                    keep = run_framed_command(cl, request_id, data, handler, credentials, session)
+                else:
+                    keep = handler(cl, data, credentials, session)
+                if not keep:
+                    break
+                # 日志跟随等数据流：按间隔推送，等待期间不阻塞其他会话，客户端发来任意数据时结束
+                stream = session.pop("stream", None)
+                while stream:
+                    stream.send_new()
+                    cl.setblocking(False)
+                    try:
+                        await asyncio.wait_for(reader.read(16), LOG_TAIL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        continue
+                    finally:
+                        cl.setblocking(True)
+                    stream.send_new()
+                    stream.finish()
+                    stream = None
+            finally:
+                try:
+                    cl.setblocking(False)
+                except OSError:
+                    pass
+    except Exception as e:
+        log_error("会话出错(%s): %s", addr, e)
+    finally:
+        led_off()
+        if cl is not getattr(reader, "s", None):
+            cl.close()
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+# 定时系统监控，客户端连接期间也按周期运行
+async def _monitor_loop():
+    while True:
+        await asyncio.sleep(MONITOR_INTERVAL)
+        monitor_system_status()
+
+# 空闲任务：定期把缓冲的日志写入闪存，执行登记的缓存刷新
+async def _idle_loop():
+    while True:
+        await asyncio.sleep(LOG_FLUSH_INTERVAL)
+        flush_log()
+        refresh_cache()
+
+# 异步处理一次指标抓取，不阻塞命令会话
+async def _serve_metrics_async(reader, writer):
+    try:
+        request = await asyncio.wait_for(reader.read(512), METRICS_TIMEOUT)
+        writer.write(metrics_response(request))
+        await writer.drain()
+    except Exception as e:
+        debug_log("指标抓取出错: %s", e)
+    finally:
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+async def _run_async_server(handler, credentials):
+    # 当前会话数，与poll模式一样超过MAX_CLIENTS时拒绝新连接
+    sessions = 0
+
+    async def on_connect(reader, writer):
+        nonlocal sessions
+        if sessions >= MAX_CLIENTS:
+            log_warn("连接数已满，拒绝客户端: %s", writer.get_extra_info("peername"))
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+            return
+        sessions += 1
+        try:
+            await _serve_session(reader, writer, handler, credentials)
+        finally:
+            sessions -= 1
+    await asyncio.start_server(on_connect, '0.0.0.0', SERVER_PORT, backlog=MAX_CLIENTS)
+    debug_log('异步服务器启动成功，正在监听端口 %s...', SERVER_PORT)
+    if METRICS_PORT:
+        try:
+            await asyncio.start_server(_serve_metrics_async, '0.0.0.0', METRICS_PORT)
+            debug_log("监控指标HTTP服务器启动成功，正在监听端口 %s...", METRICS_PORT)
+        except Exception as e:
+            log_error("启动监控指标HTTP服务器时出错: %s", e)
+    asyncio.create_task(_idle_loop())
+    await _monitor_loop()
+
+# 启动异步多客户端服务器，handler为命令处理函数
+def start_async_server(handler, credentials):
+    debug_log("启动异步TCP服务器")
+    asyncio.run(_run_async_server(handler, credentials))
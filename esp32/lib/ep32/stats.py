@@ -0,0 +1,153 @@
+# stats.py
+# 运行统计：记录每个命令和关键环节（握手、分块收发、日志、检查点、指标抓取）的耗时直方图与字节数
+# 直方图按2的幂划分微秒，每个名称占用固定大小的内存，名称数有上限，长时间运行内存也不会增长
+import time
+from array import array
+from ep32.config import STATS_ENABLED, STATS_MAX_NAMES, STATS_BUCKETS
+
+# 微秒和毫秒时钟：设备上使用ticks系列函数（会回绕），主机模拟环境下由time.time换算
+try:
+    _ticks_us = time.ticks_us
+    _ticks_ms = time.ticks_ms
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    def _ticks_us():
+        return int(time.time() * 1000000)
+
+    def _ticks_ms():
+        return int(time.time() * 1000)
+
+    def _ticks_diff(end, start):
+        return end - start
+
+# 关键环节的名称以"@"开头，与命令名区分
+HANDSHAKE = "@handshake"
+SEND = "@send"
+RECV = "@recv"
+LOG = "@log"
+LOG_FLUSH = "@log_flush"
+CHECKPOINT = "@checkpoint"
+SCRAPE = "@scrape"
+# 名称数达到上限后，新名称的统计都计入该项
+OTHER = "other"
+
+# 单个名称的统计：次数、总耗时、最大耗时（微秒）、接收和发送的字节数，以及耗时直方图；
+# 命令的接收字节数包括请求和分块接收的数据，发送字节数只计分块发送的数据，不含普通回复
+# 第0桶为0微秒，第b桶为[2^(b-1), 2^b)微秒
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.rx = 0
+        self.tx = 0
+        self.buckets = array("I", [0] * STATS_BUCKETS)
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        bucket = 0
+        while elapsed and bucket < STATS_BUCKETS - 1:
+            elapsed >>= 1
+            bucket += 1
+        self.buckets[bucket] += 1
+
+    # 估算百分位耗时，返回所在桶的上限（微秒）
+    def percentile(self, fraction):
+        if not self.count:
+            return 0
+        target = self.count * fraction
+        seen = 0
+        for bucket in range(STATS_BUCKETS):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                if bucket == STATS_BUCKETS - 1:
+                    return self.max
+                return 1 << bucket if bucket else 0
+        return self.max
+
+# 名称 -> Histogram
+_table = {}
+# 开始统计的时间，重置时更新
+_started = time.time()
+# 正在执行的命令，分块收发的字节数同时计入该命令
+_current = None
+
+def _get(name):
+    entry = _table.get(name)
+    if entry is None:
+        if len(_table) >= STATS_MAX_NAMES:
+            name = OTHER
+            entry = _table.get(name)
+        if entry is None:
+            entry = _table[name] = Histogram()
+    return entry
+
+# 开始计时，返回传给record()或end_command()的起始时间
+def start():
+    return _ticks_us() if STATS_ENABLED else 0
+
+# 记录一个环节的耗时和字节数，字节数同时计入正在执行的命令
+def record(name, started, rx=0, tx=0):
+    if not STATS_ENABLED:
+        return
+    entry = _get(name)
+    entry.add(_ticks_diff(_ticks_us(), started))
+    entry.rx += rx
+    entry.tx += tx
+    if _current is not None:
+        _current.rx += rx
+        _current.tx += tx
+
+# 开始执行命令，request_size为请求的字节数
+def begin_command(name, request_size):
+    global _current
+    if not STATS_ENABLED:
+        return 0
+    _current = _get(name)
+    _current.rx += request_size
+    return _ticks_us()
+
+# 命令执行结束，记录耗时
+def end_command(started):
+    global _current
+    if _current is None:
+        return
+    _current.add(_ticks_diff(_ticks_us(), started))
+    _current = None
+
+# 按名称排序的统计项: [(名称, Histogram)]
+def entries():
+    return [(name, _table[name]) for name in sorted(_table)]
+
+# 启动以来的毫秒数：累加ticks的差值，不受校时影响；ticks会回绕，需至少每隔几天调用一次
+_uptime_ms = 0
+_uptime_ticks = _ticks_ms()
+
+# 运行时长（秒）
+def uptime():
+    global _uptime_ms, _uptime_ticks
+    now = _ticks_ms()
+    _uptime_ms += _ticks_diff(now, _uptime_ticks)
+    _uptime_ticks = now
+    return _uptime_ms // 1000
+
+# 清空统计
+def reset():
+    global _started
+    _table.clear()
+    _started = time.time()
+
+# 生成统计报告：第一行为统计时长，第二行为表头，之后每个名称一行，
+# 字段以空格分隔，分布为"桶:次数"列表（逗号分隔，无记录时为"-"）
+def report():
+    lines = [f"统计时长: {int(time.time() - _started)} 秒",
+             "名称 次数 平均us P50us P90us P99us 最大us 接收字节 分块发送字节 分布"]
+    for name, entry in entries():
+        average = entry.total // entry.count if entry.count else 0
+        histogram = ",".join(f"{b}:{n}" for b, n in enumerate(entry.buckets) if n) or "-"
+        lines.append(f"{name} {entry.count} {average} {entry.percentile(0.5)} {entry.percentile(0.9)} "
+                     f"{entry.percentile(0.99)} {entry.max} {entry.rx} {entry.tx} {histogram}")
+    return "\n".join(lines) + "\n"
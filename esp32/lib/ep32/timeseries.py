@@ -0,0 +1,88 @@
+# timeseries.py
+# 监控样本的时间序列：样本以整数保存在内存中由array实现的定长环形缓冲区里，不写闪存
+# 分为多级（如每分钟、每小时、每天），每级把上一级的若干个样本取平均后写入，内存占用固定
+import time
+from array import array
+from ep32.config import METRICS_TIERS, MONITOR_INTERVAL
+
+# 缺失值（如无法读取温度、Wi-Fi未连接时的信号强度），取平均时跳过
+MISSING = -0x80000000
+
+# 时间序列的一级：累积上一级的factor个样本，取平均后写入环形缓冲区
+class Tier:
+    def __init__(self, seconds, capacity, width, factor):
+        self.seconds = seconds
+        self.capacity = capacity
+        self.width = width
+        self.factor = factor
+        # 样本时间戳和数值，第n个样本位于n % capacity
+        self.times = array("I", [0] * capacity)
+        self.values = array("i", [0] * (capacity * width))
+        # 写入过的样本总数
+        self.count = 0
+        # 正在累积的样本：各字段的和、有效样本数，以及已累积的样本数
+        self.sums = [0] * width
+        self.valid = [0] * width
+        self.pending = 0
+
+    # 累积一个样本，凑满factor个时写入平均值并返回，供下一级累积；否则返回None
+    def add(self, timestamp, values):
+        for i in range(self.width):
+            if values[i] != MISSING:
+                self.sums[i] += values[i]
+                self.valid[i] += 1
+        self.pending += 1
+        if self.pending < self.factor:
+            return None
+        index = self.count % self.capacity
+        self.times[index] = timestamp
+        base = index * self.width
+        for i in range(self.width):
+            self.values[base + i] = round(self.sums[i] / self.valid[i]) if self.valid[i] else MISSING
+            self.sums[i] = 0
+            self.valid[i] = 0
+        self.pending = 0
+        self.count += 1
+        return self.values[base:base + self.width]
+
+    # 按时间顺序返回时间戳晚于since的样本: (时间戳, 数值)
+    def since(self, since):
+        for n in range(max(0, self.count - self.capacity), self.count):
+            index = n % self.capacity
+            if self.times[index] > since:
+                base = index * self.width
+                yield self.times[index], self.values[base:base + self.width]
+
+# 多级时间序列：fields为各字段名，interval为监控样本的间隔（秒）
+class TimeSeries:
+    def __init__(self, fields, tiers=METRICS_TIERS, interval=MONITOR_INTERVAL):
+        self.fields = fields
+        self.tiers = []
+        for seconds, capacity in tiers:
+            self.tiers.append(Tier(seconds, capacity, len(fields), max(1, seconds // interval)))
+            interval = seconds
+
+    # 添加一个样本，values按fields的顺序，缺失的值为MISSING
+    def add(self, values, timestamp=None):
+        if timestamp is None:
+            timestamp = int(time.time())
+        for tier in self.tiers:
+            values = tier.add(timestamp, values)
+            if values is None:
+                break
+
+    # 按级别、时间顺序返回时间戳晚于since的样本: (级别秒数, 时间戳, 数值)
+    def since(self, since=0):
+        for tier in self.tiers:
+            for timestamp, values in tier.since(since):
+                yield tier.seconds, timestamp, values
+
+    # 以CSV返回时间戳晚于since的样本，第一行为表头，缺失的值留空
+    def csv(self, since=0):
+        lines = ["tier,time," + ",".join(self.fields)]
+        for seconds, timestamp, values in self.since(since):
+            lines.append(f"{seconds},{timestamp}," + ",".join("" if v == MISSING else str(v) for v in values))
+        return "\n".join(lines) + "\n"
+
+# 系统监控的时间序列，由monitor_system_status()定期写入
+system_series = TimeSeries(("mem_free", "mem_alloc", "rssi", "temp", "files"))
@@ -7,21 +7,14 @@ import machine
 import network
 import socket
 import urequests
-from ep32.config import DEBUG_MODE, DEBUG_LOG_FILE
-
-# 调试信息输出函数
-def debug_log(message):
-    if DEBUG_MODE:
-        timestamp = time.time()
-        formatted_time = format_time(timestamp)
-        log_entry = f"[{formatted_time}] {message}\n"
-        print(log_entry)
-        
-        try:
-            with open(DEBUG_LOG_FILE, "a") as f:
-                f.write(log_entry)
-        except Exception as e:
-            print(f"无法写入调试日志: {str(e)}")
+from ep32.commands import command
+# 日志函数由logger提供，其他模块继续从utils导入
+from ep32.logger import flush_log, debug_log, log_error, log_warn, log_info
+from ep32.cache import ttl_cache
+from ep32.jsonscan import scan_json
+from ep32.timeseries import system_series, MISSING
+from ep32 import stats
+from ep32.config import LOCATION_TTL, LOCATION_STALE, WEATHER_TTL, WEATHER_STALE
 
 # 格式化时间
 def format_time(timestamp):
@@ -32,7 +25,8 @@ def format_time(timestamp):
 def get_ntp_time():
     debug_log("获取网络时间")
     NTP_SERVER = "ntp1.aliyun.com"
-    NTP_DELTA = 3155673600  # 1970-1900年的秒数
+    # NTP时间从1900年起算，换算为time.time()的纪元：ESP32上为2000年，其他端口（及模拟器）为1970年
+    NTP_DELTA = 3155673600 if time.gmtime(0)[0] == 2000 else 2208988800
     NTP_QUERY = bytearray(48)
     NTP_QUERY[0] = 0x1B
     addr = socket.getaddrinfo(NTP_SERVER, 123)[0][-1]
@@ -45,8 +39,8 @@ def get_ntp_time():
     val = ustruct.unpack("!I", msg[40:44])[0]
     return val - NTP_DELTA
 
-# 获取IP位置信息
-def get_ip_location():
+# 查询IP位置信息，失败时抛出异常
+def _fetch_ip_location():
     debug_log("获取IP位置信息")
     try:
         # 使用ipinfo.io获取IP位置信息（免费版本，不需要SSL）
@@ -54,102 +48,212 @@ def get_ip_location():
         response = urequests.get(url)
         data = response.json()
         response.close()
-        
-        if "country" in data:
-            # 解析位置信息
-            loc = data.get("loc", "0,0").split(",")
-            location = {
-                "country": data.get("country", "未知"),
-                "region": data.get("region", "未知"),
-                "city": data.get("city", "未知"),
-                "lat": float(loc[0]) if len(loc) > 0 else 0,
-                "lon": float(loc[1]) if len(loc) > 1 else 0,
-                "timezone": data.get("timezone", "未知"),
-                "ip": data.get("ip", "未知")
-            }
-            debug_log(f"获取位置信息成功: {location['city']}, {location['country']}")
-            return location
-        else:
-            debug_log("无法获取位置信息: 无country字段")
-            return {"error": "无法获取位置信息"}
     except Exception as e:
-        debug_log(f"获取位置信息时出错: {str(e)}")
-        return {"error": f"获取位置信息时出错: {str(e)}"}
+        log_warn("获取位置信息时出错: %s", e)
+        raise OSError(f"获取位置信息时出错: {str(e)}")
+    
+    if "country" not in data:
+        log_warn("无法获取位置信息: 无country字段")
+        raise ValueError("无法获取位置信息")
+    # 解析位置信息
+    loc = data.get("loc", "0,0").split(",")
+    location = {
+        "country": data.get("country", "未知"),
+        "region": data.get("region", "未知"),
+        "city": data.get("city", "未知"),
+        "lat": float(loc[0]) if len(loc) > 0 else 0,
+        "lon": float(loc[1]) if len(loc) > 1 else 0,
+        "timezone": data.get("timezone", "未知"),
+        "ip": data.get("ip", "未知")
+    }
+    debug_log("获取位置信息成功: %s, %s", location['city'], location['country'])
+    return location
 
-# 获取天气信息
-def get_weather():
+# 获取IP位置信息，结果缓存，过期后先返回旧值再在后台刷新
+def get_ip_location():
+    try:
+        return ttl_cache.get("location", _fetch_ip_location, LOCATION_TTL, LOCATION_STALE, True)
+    except Exception as e:
+        return {"error": str(e)}
+
+# 天气字段 -> wttr.in j1格式响应中的路径
+_WEATHER_FIELDS = {
+    "temperature": ("current_condition", 0, "temp_C"),
+    "description": ("current_condition", 0, "weatherDesc", 0, "value"),
+    "humidity": ("current_condition", 0, "humidity"),
+    "pressure": ("current_condition", 0, "pressure"),
+    "feels_like": ("current_condition", 0, "FeelsLikeC"),
+    "visibility": ("current_condition", 0, "visibility"),
+    "uv_index": ("current_condition", 0, "uvIndex")
+}
+
+# 查询天气信息，失败时抛出异常
+def _fetch_weather():
     debug_log("获取天气信息")
+    # 首先获取位置信息
+    location = get_ip_location()
+    if "error" in location:
+        log_warn("获取天气信息失败: %s", location['error'])
+        raise OSError(location["error"])
+    
+    city = location["city"]
     try:
-        # 首先获取位置信息
-        location = get_ip_location()
-        if "error" in location:
-            debug_log(f"获取天气信息失败: {location['error']}")
-            return {"error": location["error"]}
-        
-        city = location["city"]
-        # 使用wttr.in免费天气API
+        # 使用wttr.in免费天气API，流式提取需要的字段，不在内存中构建完整响应
         url = f"http://wttr.in/{city}?format=j1"
         response = urequests.get(url)
-        data = response.json()
-        response.close()
-        
-        if "weather" in data:
-            current = data["current_condition"][0]
-            weather = {
-                "city": city,
-                "country": location["country"],
-                "region": location["region"],
-                "temperature": current["temp_C"],
-                "description": current["weatherDesc"][0]["value"],
-                "humidity": current["humidity"],
-                "pressure": current["pressure"],
-                "lat": location["lat"],
-                "lon": location["lon"],
-                "timezone": location["timezone"],
-                "feels_like": current["FeelsLikeC"],
-                "visibility": current["visibility"],
-                "uv_index": current["uvIndex"]
-            }
-            debug_log(f"获取天气信息成功: {weather['city']}, {weather['temperature']}°C")
-            return weather
-        else:
-            debug_log("无法获取天气信息: 无weather字段")
-            return {"error": "无法获取天气信息"}
+        try:
+            values = scan_json(response.raw, _WEATHER_FIELDS.values())
+        finally:
+            response.close()
     except Exception as e:
-        debug_log(f"获取天气信息时出错: {str(e)}")
-        return {"error": f"获取天气信息时出错: {str(e)}"}
+        log_warn("获取天气信息时出错: %s", e)
+        raise OSError(f"获取天气信息时出错: {str(e)}")
+    
+    weather = {
+        "city": city,
+        "country": location["country"],
+        "region": location["region"],
+        "lat": location["lat"],
+        "lon": location["lon"],
+        "timezone": location["timezone"]
+    }
+    for name, path in _WEATHER_FIELDS.items():
+        if path not in values:
+            log_warn("无法获取天气信息: 缺少%s字段", path[-1])
+            raise ValueError("无法获取天气信息")
+        weather[name] = values[path]
+    debug_log("获取天气信息成功: %s, %s°C", weather['city'], weather['temperature'])
+    return weather
 
-# 系统状态监控
-def monitor_system_status():
-    debug_log("开始系统状态监控")
+# 获取天气信息，结果缓存，过期后先返回旧值再在后台刷新
+def get_weather():
     try:
-        # 获取内存信息
-        mem_free = gc.mem_free()
-        mem_alloc = gc.mem_alloc()
-        debug_log(f"内存状态 - 空闲: {mem_free} 字节, 已分配: {mem_alloc} 字节")
-        
-        # 获取Wi-Fi状态
-        wlan = network.WLAN(network.STA_IF)
-        if wlan.isconnected():
-            debug_log(f"Wi-Fi状态 - 已连接, IP: {wlan.ifconfig()[0]}")
-        else:
-            debug_log("Wi-Fi状态 - 未连接")
-        
-        # 获取CPU温度
-        try:
-            import esp32
-            temp = esp32.raw_temperature()
-            debug_log(f"CPU温度: {temp} °C")
-        except:
-            debug_log("无法获取CPU温度")
-        
-        # 检查文件系统
+        return ttl_cache.get("weather", _fetch_weather, WEATHER_TTL, WEATHER_STALE, True)
+    except Exception as e:
+        return {"error": str(e)}
+
+# 采样系统状态，返回(空闲内存, 已分配内存, Wi-Fi信号强度, CPU温度, 文件数量)，无法读取的值为MISSING
+def sample_system_status():
+    mem_free = gc.mem_free()
+    mem_alloc = gc.mem_alloc()
+    
+    # Wi-Fi未连接或无法读取信号强度时记为缺失
+    rssi = MISSING
+    wlan = network.WLAN(network.STA_IF)
+    if wlan.isconnected():
         try:
-            import os
-            files = os.listdir()
-            debug_log(f"文件系统 - 文件数量: {len(files)}")
-        except:
-            debug_log("无法访问文件系统")
-            
+            rssi = wlan.status("rssi")
+        except Exception:
+            pass
+    
+    # 获取CPU温度
+    try:
+        import esp32
+        temp = esp32.raw_temperature()
+    except:
+        temp = MISSING
+    
+    # 检查文件系统
+    try:
+        import os
+        files = len(os.listdir())
+    except:
+        files = MISSING
+    return mem_free, mem_alloc, rssi, temp, files
+
+# 系统状态监控：采样写入内存中的时间序列，用 metrics 命令查询
+def monitor_system_status():
+    try:
+        sample = sample_system_status()
+        system_series.add(sample)
+        # 定期更新运行时长，避免ticks回绕
+        stats.uptime()
+        debug_log("系统状态 - 空闲内存: %s 字节, 已分配: %s 字节, Wi-Fi信号: %s, CPU温度: %s, 文件数量: %s", *sample)
     except Exception as e:
-        debug_log(f"系统状态监控出错: {str(e)}")
+        log_error("系统状态监控出错: %s", e)
+
+# 查询Wi-Fi状态命令
+@command("wifistatus", help="wifistatus - 查询Wi-Fi状态")
+def cmd_wifistatus(cl, args, session):
+    wlan = network.WLAN(network.STA_IF)
+    if wlan.isconnected():
+        status = f"Wi-Fi已连接\nIP地址: {wlan.ifconfig()[0]}\n子网掩码: {wlan.ifconfig()[1]}\n网关: {wlan.ifconfig()[2]}\nDNS: {wlan.ifconfig()[3]}"
+        debug_log("Wi-Fi状态: 已连接, IP: %s", wlan.ifconfig()[0])
+    else:
+        status = "Wi-Fi未连接"
+        debug_log("Wi-Fi状态: 未连接")
+    cl.send(status.encode())
+
+# 系统信息命令
+@command("sysinfo", help="sysinfo - 显示系统信息")
+def cmd_sysinfo(cl, args, session):
+    import esp32
+    debug_log("获取系统信息")
+    freq = machine.freq()
+    mem_free = gc.mem_free()
+    mem_alloc = gc.mem_alloc()
+    try:
+        temp = esp32.raw_temperature()
+        temp_info = f"内部温度: {temp} °C"
+    except:
+        temp_info = "内部温度: 不可用"
+    try:
+        hall = esp32.hall_sensor()
+        hall_info = f"霍尔传感器: {hall}"
+    except AttributeError:
+        hall_info = "霍尔传感器: 不可用"
+    info = f"系统信息:\nCPU频率: {freq/1000000} MHz\n空闲内存: {mem_free} 字节\n已分配内存: {mem_alloc} 字节\n{temp_info}\n{hall_info}"
+    debug_log("系统信息: CPU频率: %s MHz, 空闲内存: %s 字节", freq/1000000, mem_free)
+    cl.send(info.encode())
+
+# 重启命令
+@command("reboot", help="reboot - 重启系统")
+def cmd_reboot(cl, args, session):
+    debug_log("收到重启命令")
+    cl.send('系统即将重启'.encode())
+    # 复位前关闭连接，帧模式下缓存的回复随最终帧发出
+    cl.close()
+    flush_log()
+    time.sleep(1)
+    machine.reset()
+
+# 当前时间命令
+@command("time", help="time - 显示当前时间")
+def cmd_time(cl, args, session):
+    current_time = format_time(time.time())
+    debug_log("请求当前时间: %s", current_time)
+    cl.send(f"当前时间: {current_time}".encode())
+
+# 天气命令
+@command("weather", help="weather - 查询天气信息(自动定位)")
+def cmd_weather(cl, args, session):
+    weather = get_weather()
+    if "error" in weather:
+        cl.send(weather["error"].encode())
+        return
+    weather_info = f"位置: {weather['city']}, {weather['region']}, {weather['country']}\n"
+    weather_info += f"坐标: {weather['lat']}, {weather['lon']}\n"
+    weather_info += f"时区: {weather['timezone']}\n"
+    weather_info += f"温度: {weather['temperature']}°C\n"
+    weather_info += f"体感温度: {weather['feels_like']}°C\n"
+    weather_info += f"天气: {weather['description']}\n"
+    weather_info += f"湿度: {weather['humidity']}%\n"
+    weather_info += f"气压: {weather['pressure']} hPa\n"
+    weather_info += f"能见度: {weather['visibility']} km\n"
+    weather_info += f"紫外线指数: {weather['uv_index']}"
+    cl.send(weather_info.encode())
+
+# 位置命令
+@command("location", help="location - 查询位置信息")
+def cmd_location(cl, args, session):
+    location = get_ip_location()
+    if "error" in location:
+        cl.send(location["error"].encode())
+        return
+    location_info = f"国家: {location['country']}\n"
+    location_info += f"地区: {location['region']}\n"
+    location_info += f"城市: {location['city']}\n"
+    location_info += f"坐标: {location['lat']}, {location['lon']}\n"
+    location_info += f"时区: {location['timezone']}\n"
+    location_info += f"IP地址: {location['ip']}"
+    cl.send(location_info.encode())
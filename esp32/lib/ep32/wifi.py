@@ -2,7 +2,7 @@
 import network
 import time
 import machine
-from ep32.utils import debug_log, get_ntp_time, format_time
+from ep32.utils import debug_log, log_warn, get_ntp_time, format_time
 from ep32.config import SSID, PASSWORD
 
 # 初始化Wi-Fi连接
@@ -20,15 +20,17 @@ def connect_wifi():
                 return False
             time.sleep(1)
     
-    debug_log(f"Wi-Fi连接成功，IP地址: {wlan.ifconfig()[0]}")
+    debug_log("Wi-Fi连接成功，IP地址: %s", wlan.ifconfig()[0])
     
     # 同步时间
     try:
         debug_log("尝试同步时间...")
         ntp_time = get_ntp_time()
-        machine.RTC().datetime(time.localtime(ntp_time)[0:7] + (0,))
-        debug_log(f"时间已同步: {format_time(ntp_time)}")
+        # RTC的格式为(年, 月, 日, 星期, 时, 分, 秒, 亚秒)，与localtime()的字段顺序不同
+        tm = time.localtime(ntp_time)
+        machine.RTC().datetime((tm[0], tm[1], tm[2], tm[6], tm[3], tm[4], tm[5], 0))
+        debug_log("时间已同步: %s", format_time(ntp_time))
     except Exception as e:
-        debug_log(f"时间同步失败: {str(e)}")
+        log_warn("时间同步失败: %s", e)
     
     return True
@@ -3,13 +3,49 @@ import time
 import os
 import sys
 import json
+import zlib
+import struct
+import hashlib
+import subprocess
+import threading
 
 class ESP32Client:
-    def __init__(self, host, port=5555):
+    CHUNK_SIZE = 1024
+    ACK_SIZE = 10
+
+    COMPRESS_MIN_SIZE = 256
+    COMPRESS_WBITS = 10
+
+    # 帧模式：8字节帧头（负载长度、请求ID、状态码）+ 负载
+    FRAME_HEADER = ">IHH"
+    FRAME_HEADER_SIZE = 8
+    STATUS_OK = 0
+    STATUS_MORE = 1
+    STATUS_ERROR = 2
+
+    # debug tail 日志流的结束标志
+    LOG_TAIL_END = b"\x04"
+
+    # TCP keepalive：空闲多少秒后开始探测、探测间隔、失败几次判定断开
+    KEEPALIVE_IDLE = 30
+    KEEPALIVE_INTERVAL = 10
+    KEEPALIVE_COUNT = 3
+
+    def __init__(self, host, port=5555, window=8, compress=True, framed=True):
         self.host = host
         self.port = port
         self.socket = None
         self.connected = False
+        # 传输窗口（在途块数），1表示与旧服务端兼容的逐块确认
+        self.window = window
+        # 是否请求压缩传输，握手后为服务端确认的结果
+        self.compress = compress
+        # 是否请求帧模式，握手后为服务端确认的结果；旧服务端不支持时回退到文本模式
+        self.framed = framed
+        self._request_id = 0
+        self._pending = b""
+        self._final = True
+        self.last_status = self.STATUS_OK
         
     def connect(self, timeout=15):
         """连接到ESP32服务器"""
@@ -17,6 +53,9 @@ class ESP32Client:
             print(f"尝试连接到 {self.host}:{self.port}...")
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(timeout)  # 设置超时时间
+            # 关闭Nagle算法，避免窗口模式下的小确认包被延迟
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._enable_keepalive(self.socket)
             self.socket.connect((self.host, self.port))
             print(f"已建立TCP连接，等待握手...")
             
@@ -31,7 +70,15 @@ class ESP32Client:
                         print(f"收到握手消息: {handshake.decode()}")
                         if handshake.decode() == 'y':
                             print("发送确认...")
-                            self.socket.send('OK'.encode())
+                            # 在握手确认中请求传输窗口和压缩，服务端回复协商结果
+                            ack = f'OK;win={self.window};z={1 if self.compress else 0}'
+                            if self.framed:
+                                ack += ';frame=1'
+                            self.socket.send(ack.encode())
+                            self.socket.settimeout(timeout)
+                            reply = self.socket.recv(64).decode()
+                            self._parse_session(reply)
+                            print(f"协商传输窗口: {self.window}，压缩: {self.compress}，帧模式: {self.framed}")
                             self.connected = True
                             print(f"已成功连接到ESP32服务器 {self.host}:{self.port}")
                             return True
@@ -57,11 +104,128 @@ class ESP32Client:
             print(f"连接失败: {str(e)}")
             return False
     
+    @classmethod
+    def _enable_keepalive(cls, sock):
+        """开启TCP keepalive，设备断电或离开网络时由系统发现半开连接；各平台支持的选项不同"""
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        options = [
+            # Linux用TCP_KEEPIDLE，macOS用TCP_KEEPALIVE
+            (getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None)), cls.KEEPALIVE_IDLE),
+            (getattr(socket, "TCP_KEEPINTVL", None), cls.KEEPALIVE_INTERVAL),
+            (getattr(socket, "TCP_KEEPCNT", None), cls.KEEPALIVE_COUNT),
+        ]
+        try:
+            for option, value in options:
+                if option is not None:
+                    sock.setsockopt(socket.IPPROTO_TCP, option, value)
+            if hasattr(socket, "SIO_KEEPALIVE_VALS") and options[0][0] is None:
+                # 旧版Windows只能通过ioctl设置
+                sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, cls.KEEPALIVE_IDLE * 1000, cls.KEEPALIVE_INTERVAL * 1000))
+        except (OSError, ValueError):
+            pass
+
+    def reconnect(self, retries=5, backoff=0.5, max_backoff=8, timeout=5):
+        """重新连接并握手，失败时按指数退避重试，返回是否成功"""
+        delay = backoff
+        for attempt in range(retries):
+            if self.socket:
+                try:
+                    self.socket.close()
+                except OSError:
+                    pass
+            self.connected = False
+            if self.connect(timeout):
+                return True
+            if attempt + 1 < retries:
+                print(f"{delay:.1f} 秒后重试...")
+                time.sleep(delay)
+                delay = min(delay * 2, max_backoff)
+        return False
+
+    def ping(self, timeout=5):
+        """发送心跳，返回往返时间（秒）；连接已断开或无响应时标记为断开并返回None"""
+        if not self.connected:
+            return None
+        start = time.time()
+        try:
+            self._send_request("ping")
+            self.socket.settimeout(timeout)
+            response = self._recv(64) + self._finish_response()
+        except OSError:
+            response = None
+        if response != b"pong":
+            # 超时后迟到的回复会打乱文本模式的响应边界，只能重新连接
+            self.connected = False
+            return None
+        return time.time() - start
+
+    def _parse_session(self, reply):
+        """解析服务端的握手回复，格式: OK;win=<窗口>;z=<0|1>[;frame=1]"""
+        options = dict(part.split("=", 1) for part in reply.strip().split(";")[1:] if "=" in part)
+        self.window = max(1, int(options.get("win", 1)))
+        self.compress = options.get("z") == "1"
+        self.framed = options.get("frame") == "1"
+
+    def _send_request(self, command):
+        """发送一条命令；帧模式下附带新的请求ID"""
+        if not self.framed:
+            self.socket.send(command.encode())
+            return
+        self._request_id = (self._request_id + 1) & 0xFFFF
+        payload = command.encode()
+        self.socket.sendall(struct.pack(self.FRAME_HEADER, len(payload), self._request_id, self.STATUS_OK) + payload)
+        self._pending = b""
+        self._final = False
+        self.last_status = self.STATUS_OK
+
+    def _read_frame(self):
+        """读取当前请求的下一帧响应，返回负载"""
+        header = self._recv_socket_exact(self.FRAME_HEADER_SIZE)
+        length, request_id, status = struct.unpack(self.FRAME_HEADER, header)
+        if request_id != self._request_id:
+            raise ConnectionError(f"响应的请求ID不符: {request_id}/{self._request_id}")
+        self._final = status != self.STATUS_MORE
+        self.last_status = status
+        return self._recv_socket_exact(length)
+
+    def _recv(self, size):
+        """读取最多size字节的响应数据；帧模式下从帧负载中读取，响应结束时返回空字节串"""
+        if not self.framed:
+            return self.socket.recv(size)
+        while not self._pending:
+            if self._final:
+                return b""
+            self._pending = self._read_frame()
+        data = self._pending[:size]
+        self._pending = self._pending[size:]
+        return data
+
+    def _finish_response(self):
+        """帧模式下读取当前响应的剩余部分直到最终帧；文本模式下无法判断响应边界，返回空字节串"""
+        if not self.framed:
+            return b""
+        data = self._pending
+        self._pending = b""
+        while not self._final:
+            data += self._read_frame()
+        return data
+
     def test_connection(self):
         """测试连接是否可达"""
         print(f"测试到 {self.host} 的网络连接...")
-        # 使用ping测试连接
-        response = os.system(f"ping -n 1 -w 2000 {self.host} > nul")
+        # 使用系统ping命令测试连接，Windows与Linux/macOS/Termux的参数不同
+        if sys.platform.startswith("win"):
+            command = ["ping", "-n", "1", "-w", "2000", self.host]
+        elif sys.platform == "darwin":
+            command = ["ping", "-c", "1", "-t", "2", self.host]
+        else:
+            command = ["ping", "-c", "1", "-W", "2", self.host]
+        try:
+            response = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5).returncode
+        except (OSError, subprocess.TimeoutExpired) as e:
+            # 没有ping命令（或无权限）时无法判断，交给后续的端口测试
+            print(f"无法执行ping，跳过网络测试: {str(e)}")
+            return True
         if response == 0:
             print(f"可以ping通 {self.host}")
             return True
@@ -106,21 +270,484 @@ class ESP32Client:
             
         try:
             print(f"发送命令: {command}")
-            self.socket.send(command.encode())
+            self._send_request(command)
             print("等待响应...")
             
             # 设置接收超时
             self.socket.settimeout(10)
-            response = self.socket.recv(4096)
-            print(f"收到响应: {response.decode()}")
-            return response.decode()
+            response = self._recv(4096)
+            # 日志、统计、监控样本和（协商压缩后的）文件列表按分块协议返回
+            if command in ("debug log", "stats") or command.startswith("metrics") or (command == "ls" and self.compress):
+                if self._is_length_header(response):
+                    response = self.receive_chunked(response)
+            response += self._finish_response()
+            if self.last_status == self.STATUS_ERROR:
+                print("服务端返回错误状态")
+            print(f"收到响应: {response.decode(errors='replace')}")
+            return response.decode(errors='replace')
         except socket.timeout:
             print("等待响应超时")
             return None
+        except OSError as e:
+            print(f"连接已断开: {str(e)}")
+            self.connected = False
+            return None
         except Exception as e:
             print(f"发送命令失败: {str(e)}")
             return None
     
+    def batch(self, commands):
+        """在一次往返中批量执行多条命令，返回 [{"cmd", "ok", "output"}, ...]，失败时返回None"""
+        if not self.connected:
+            print("未连接到服务器")
+            return None
+        self.socket.settimeout(30)
+        self._send_request("batch " + json.dumps(commands, ensure_ascii=False))
+        if self.framed:
+            # 帧模式下结果JSON即为整个响应
+            reply = self._finish_response()
+            if not reply.startswith(b"["):
+                print(f"批处理失败: {reply.decode(errors='replace')}")
+                return None
+            return json.loads(reply.decode())
+        header = self._recv(64)
+        if not self._is_length_header(header):
+            header += self._finish_response()
+            print(f"批处理失败: {header.decode(errors='replace')}")
+            return None
+        results = json.loads(self.receive_chunked(header).decode())
+        self._finish_response()
+        return results
+
+    def stats(self, reset=False):
+        """查询设备的运行统计，返回 {"uptime": 秒, "commands": {...}, "sections": {...}}，失败时返回None。
+        每项为 {"count", "avg_us", "p50_us", "p90_us", "p99_us", "max_us", "rx", "tx", "histogram"}，
+        rx包括请求和分块接收的数据，tx只计分块发送的数据（不含普通回复）；histogram为 {桶上限微秒: 次数}；"@"开头的关键环节（握手、分块收发、日志、检查点）放在sections中，去掉"@"。
+        reset为True时清空设备上的统计，成功返回True"""
+        if not self.connected:
+            print("未连接到服务器")
+            return None
+        self.socket.settimeout(10)
+        if reset:
+            self._send_request("stats reset")
+            reply = self._recv(64) + self._finish_response()
+            return reply.decode(errors="replace") == "统计已清空"
+        self._send_request("stats")
+        header = self._recv(64)
+        if not self._is_length_header(header):
+            header += self._finish_response()
+            print(f"查询统计失败: {header.decode(errors='replace')}")
+            return None
+        report = self.receive_chunked(header).decode()
+        self._finish_response()
+        return self.parse_stats(report)
+
+    @staticmethod
+    def parse_stats(report):
+        """解析stats命令返回的统计表"""
+        lines = report.strip().split("\n")
+        result = {"uptime": int(lines[0].split(":", 1)[1].split()[0]), "commands": {}, "sections": {}}
+        for line in lines[2:]:
+            fields = line.split()
+            if len(fields) != 10:
+                continue
+            histogram = {}
+            if fields[9] != "-":
+                for item in fields[9].split(","):
+                    bucket, count = item.split(":")
+                    histogram[1 << int(bucket) if int(bucket) else 0] = int(count)
+            entry = dict(zip(("count", "avg_us", "p50_us", "p90_us", "p99_us", "max_us", "rx", "tx"),
+                             (int(value) for value in fields[1:9])))
+            entry["histogram"] = histogram
+            if fields[0].startswith("@"):
+                result["sections"][fields[0][1:]] = entry
+            else:
+                result["commands"][fields[0]] = entry
+        return result
+
+    @staticmethod
+    def format_stats(stats):
+        """把stats()的结果格式化为表格"""
+        lines = [f"统计时长: {stats['uptime']} 秒",
+                 f"{'名称':<14}{'次数':>8}{'平均ms':>10}{'P90ms':>10}{'最大ms':>10}{'接收':>12}{'发送':>12}"]
+        for group, prefix in (("sections", "@"), ("commands", "")):
+            for name, entry in sorted(stats[group].items()):
+                lines.append(f"{prefix + name:<16}{entry['count']:>10}{entry['avg_us'] / 1000:>12.2f}"
+                             f"{entry['p90_us'] / 1000:>11.2f}{entry['max_us'] / 1000:>12.2f}"
+                             f"{entry['rx']:>14}{entry['tx']:>14}")
+        return "\n".join(lines)
+
+    def metrics(self, since=0):
+        """查询设备内存中的监控样本，since为设备时间戳（秒），负数表示最近多少秒。
+        返回按级别、时间排序的列表 [{"tier": 级别秒数, "time": 时间戳, "mem_free": …, …}]，缺失的值为None；失败时返回None"""
+        if not self.connected:
+            print("未连接到服务器")
+            return None
+        self.socket.settimeout(10)
+        self._send_request(f"metrics {int(since)}")
+        header = self._recv(64)
+        if not self._is_length_header(header):
+            header += self._finish_response()
+            print(f"查询监控样本失败: {header.decode(errors='replace')}")
+            return None
+        report = self.receive_chunked(header).decode()
+        self._finish_response()
+        return self.parse_metrics(report)
+
+    @staticmethod
+    def parse_metrics(report):
+        """解析metrics命令返回的CSV"""
+        lines = report.strip().split("\n")
+        fields = lines[0].split(",")
+        samples = []
+        for line in lines[1:]:
+            values = [int(value) if value else None for value in line.split(",")]
+            samples.append(dict(zip(fields, values)))
+        return samples
+
+    def tail(self, lines=20, follow=False, output=None):
+        """查看设备最近的日志；follow为True时持续输出新日志，按Ctrl+C停止跟随"""
+        output = output or (lambda text: print(text, end="", flush=True))
+        command = f"debug tail -n {lines}" + (" -f" if follow else "")
+        self._send_request(command)
+        self.socket.settimeout(None if follow else 10)
+        pending = b""
+        stopping = False
+        while True:
+            try:
+                chunk = self._recv(4096)
+            except KeyboardInterrupt:
+                if stopping:
+                    raise
+                # 通知设备停止跟随，继续读取直到结束标志
+                self.socket.send(b"q")
+                stopping = True
+                continue
+            if not chunk:
+                raise ConnectionError("连接已断开")
+            end = chunk.find(self.LOG_TAIL_END)
+            pending += chunk if end < 0 else chunk[:end]
+            # 只输出完整的行，避免多字节字符被截断
+            complete, _, pending = pending.rpartition(b"\n")
+            if complete:
+                output(complete.decode(errors="replace") + "\n")
+            if end >= 0:
+                break
+        if pending:
+            output(pending.decode(errors="replace"))
+        self._finish_response()
+
+    def _recv_exact(self, size):
+        """接收指定字节数的数据"""
+        data = bytearray()
+        while len(data) < size:
+            chunk = self._recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("连接已断开")
+            data += chunk
+        return bytes(data)
+
+    def _recv_socket_exact(self, size):
+        """直接从socket接收指定字节数的数据（不经过帧解析）"""
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.socket.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("连接已断开")
+            data += chunk
+        return bytes(data)
+
+    def _wait_acks(self, state, limit):
+        """读取确认，直到未确认字节数不超过limit"""
+        while state["sent"] - state["acked"] > limit:
+            if self.window == 1:
+                if self._recv_exact(2) != b"OK":
+                    raise ConnectionError("服务端未确认数据块")
+                state["acked"] = state["sent"]
+                continue
+            # 累计确认格式: A<8位十六进制已接收字节数>\n
+            ack = self._recv_exact(self.ACK_SIZE)
+            if ack[0:1] != b"A":
+                raise ConnectionError(f"意外的确认: {ack!r}")
+            state["acked"] = max(state["acked"], int(ack[1:9], 16))
+
+    def _send_ack(self, received):
+        """发送确认：窗口为1时发送"OK"，否则发送累计已接收字节数"""
+        if self.window == 1:
+            self.socket.send("OK".encode())
+        else:
+            self.socket.send(f"A{received:08x}\n".encode())
+
+    @staticmethod
+    def _is_length_header(header):
+        """判断是否为分块传输的长度头（压缩传输以"Z"开头）"""
+        text = header.decode(errors="ignore")
+        return text[1:].isdigit() if text.startswith("Z") else text.isdigit()
+
+    def send_chunked(self, data, total_length=None):
+        """按协商的窗口分块发送数据，total_length用于断点续传时声明完整长度"""
+        if total_length is None:
+            total_length = len(data)
+        compress = self.compress and len(data) >= self.COMPRESS_MIN_SIZE
+        self.socket.send((f"Z{total_length}" if compress else str(total_length)).encode())
+        if self._recv_exact(2) != b"OK":
+            raise ConnectionError("服务端未确认数据长度")
+        state = {"sent": 0, "acked": 0}
+        if compress:
+            # 压缩数据按段发送：2字节长度 + 数据，长度为0的段表示结束，每段确认一次
+            compressor = zlib.compressobj(6, zlib.DEFLATED, self.COMPRESS_WBITS)
+            payload = compressor.compress(data) + compressor.flush()
+            segments = [payload[i:i + self.CHUNK_SIZE] for i in range(0, len(payload), self.CHUNK_SIZE)]
+            segments = [struct.pack(">H", len(seg)) + seg for seg in segments] + [b"\x00\x00"]
+            unit = self.CHUNK_SIZE + 2
+        else:
+            view = memoryview(data)
+            segments = [view[i:i + self.CHUNK_SIZE] for i in range(0, len(data), self.CHUNK_SIZE)]
+            unit = self.CHUNK_SIZE
+        for segment in segments:
+            self.socket.sendall(segment)
+            state["sent"] += len(segment)
+            self._wait_acks(state, (self.window - 1) * unit)
+        self._wait_acks(state, 0)
+
+    def receive_chunked(self, header=None, sink=None):
+        """接收服务端分块发送的数据；指定sink时边收边写入，否则返回字节串"""
+        if header is None:
+            header = self._recv(64)
+        text = header.decode()
+        if text.startswith("Z"):
+            return self._receive_compressed(int(text[1:]), sink)
+        total_length = int(text)
+        self.socket.send("OK".encode())
+        data = bytearray()
+        received = 0
+        unacked = 0
+        while received < total_length:
+            want = min(self.CHUNK_SIZE - unacked, total_length - received)
+            chunk = self._recv(want)
+            if not chunk:
+                raise ConnectionError("连接已断开")
+            if sink is not None:
+                sink.write(chunk)
+            else:
+                data += chunk
+            received += len(chunk)
+            unacked += len(chunk)
+            if unacked >= self.CHUNK_SIZE or received >= total_length:
+                self._send_ack(received)
+                unacked = 0
+        return bytes(data) if sink is None else received
+
+    def _receive_compressed(self, total_length, sink=None):
+        """接收压缩分段数据并解压，每段确认一次"""
+        self.socket.send("OK".encode())
+        decompressor = zlib.decompressobj()
+        data = bytearray()
+        wire = 0
+        received = 0
+        while True:
+            size = struct.unpack(">H", self._recv_exact(2))[0]
+            segment = self._recv_exact(size)
+            wire += 2 + size
+            self._send_ack(wire)
+            if not size:
+                break
+            chunk = decompressor.decompress(segment)
+            received += len(chunk)
+            if sink is not None:
+                sink.write(chunk)
+            else:
+                data += chunk
+        if received != total_length:
+            raise ConnectionError(f"解压后长度不符: {received}/{total_length}")
+        return bytes(data) if sink is None else received
+
+    @staticmethod
+    def file_checksum(path, algorithm="crc32"):
+        """计算本地文件校验和，算法与设备端 checksum 命令一致"""
+        crc = 0
+        hasher = hashlib.sha256() if algorithm == "sha256" else None
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                if hasher:
+                    hasher.update(chunk)
+                else:
+                    crc = zlib.crc32(chunk, crc)
+        return hasher.hexdigest() if hasher else f"{crc:08x}"
+
+    def remote_checksum(self, remote_name, algorithm="crc32"):
+        """查询设备上文件的校验和与大小，失败时返回None"""
+        response = self.send_command(f"checksum {remote_name} {algorithm}")
+        if not response or not response.startswith("CHECKSUM:"):
+            return None
+        _, file_hash, size = response.split(":")
+        return file_hash, int(size)
+
+    def download(self, remote_name, local_name=None, resume=True):
+        """下载设备上的文件；本地存在未完成的 .part 文件时从其大小处继续，完成后校验"""
+        local_name = local_name or os.path.basename(remote_name)
+        part_name = local_name + ".part"
+        offset = os.path.getsize(part_name) if resume and os.path.exists(part_name) else 0
+        self.socket.settimeout(30)
+        if offset:
+            print(f"从 {offset} 字节处继续下载")
+            self._send_request(f"get {remote_name} {offset}")
+        else:
+            self._send_request(f"get {remote_name}")
+        header = self._recv(64)
+        if not self._is_length_header(header):
+            header += self._finish_response()
+            print(f"下载失败: {header.decode(errors='ignore')}")
+            return False
+        start = time.time()
+        with open(part_name, "ab" if offset else "wb") as f:
+            received = self.receive_chunked(header, f)
+        if self._recv_exact(len(b"COMPLETE")) != b"COMPLETE":
+            print("下载失败: 未收到完成标志")
+            return False
+        self._finish_response()
+        # 校验完整文件，不一致时删除本地文件，下次重新下载
+        remote = self.remote_checksum(remote_name)
+        if remote is None or remote != (self.file_checksum(part_name), os.path.getsize(part_name)):
+            print("下载失败: 校验和不一致")
+            os.remove(part_name)
+            return False
+        os.replace(part_name, local_name)
+        elapsed = max(time.time() - start, 1e-6)
+        print(f"已下载 {remote_name} -> {local_name}，{received} 字节，{received / elapsed / 1024:.1f} KB/s，校验通过")
+        return True
+
+    def cat(self, remote_name):
+        """读取设备上的文件内容"""
+        self.socket.settimeout(30)
+        self._send_request(f"cat {remote_name}")
+        header = self._recv(64)
+        if not self._is_length_header(header):
+            header += self._finish_response()
+            print(header.decode(errors="ignore"))
+            return None
+        content = self.receive_chunked(header)
+        self._finish_response()
+        return content.decode(errors="replace")
+
+    def upload(self, local_name, remote_name=None):
+        """上传文件到设备，服务端有断点时从断点继续"""
+        remote_name = remote_name or os.path.basename(local_name)
+        with open(local_name, "rb") as f:
+            data = f.read()
+        self.socket.settimeout(30)
+        self._send_request(f"upload {remote_name}")
+        reply = self._recv(64).decode()
+        position = 0
+        if reply.startswith("RESUME:"):
+            position, _, crc = reply.split(":")[1:4]
+            position = int(position)
+            # 本地文件的前position字节与设备上已接收的部分不同（文件已修改）时从头上传
+            if position <= len(data) and f"{zlib.crc32(memoryview(data)[:position]):08x}" == crc:
+                print(f"从 {position} 字节处继续上传")
+            else:
+                print("本地文件与设备上已接收的部分不一致，从头上传")
+                self.socket.send(b"RESTART")
+                reply = self._recv(64).decode()
+                position = 0
+        if reply != "READY" and not reply.startswith("RESUME:"):
+            reply += self._finish_response().decode()
+            print(f"上传失败: {reply}")
+            return False
+        start = time.time()
+        self.send_chunked(memoryview(data)[position:], len(data))
+        result = (self._recv(4096) + self._finish_response()).decode()
+        elapsed = max(time.time() - start, 1e-6)
+        print(f"{result}，{(len(data) - position) / elapsed / 1024:.1f} KB/s")
+        # 校验设备上的完整文件
+        if self.remote_checksum(remote_name) != (f"{zlib.crc32(data):08x}", len(data)):
+            print("上传校验失败: 校验和不一致")
+            return False
+        return True
+
+    @staticmethod
+    def make_delta(data, signature, block_size):
+        """根据设备端签名生成增量：匹配的块发送复制指令，其余发送原始数据"""
+        blocks = {}
+        for index in range(len(signature) // 8):
+            weak, strong = struct.unpack_from(">II", signature, index * 8)
+            blocks.setdefault(weak, {}).setdefault(strong, index)
+        delta = bytearray()
+        literal = bytearray()
+        copy = None  # 正在合并的连续复制指令 [起始块号, 块数]
+
+        def flush_literal():
+            if literal:
+                delta.extend(b"D" + struct.pack(">I", len(literal)) + literal)
+                literal.clear()
+
+        def flush_copy():
+            if copy:
+                delta.extend(b"C" + struct.pack(">II", copy[0], copy[1]))
+
+        i = 0
+        n = len(data)
+        a = b = 0
+        if n >= block_size:
+            window = data[:block_size]
+            a = sum(window) & 0xFFFF
+            b = sum((block_size - k) * x for k, x in enumerate(window)) & 0xFFFF
+        while i + block_size <= n:
+            match = blocks.get((b << 16) | a)
+            if match:
+                index = match.get(zlib.crc32(data[i:i + block_size]))
+                if index is not None:
+                    flush_literal()
+                    if copy and copy[0] + copy[1] == index:
+                        copy[1] += 1
+                    else:
+                        flush_copy()
+                        copy = [index, 1]
+                    i += block_size
+                    if i + block_size <= n:
+                        window = data[i:i + block_size]
+                        a = sum(window) & 0xFFFF
+                        b = sum((block_size - k) * x for k, x in enumerate(window)) & 0xFFFF
+                    continue
+            flush_copy()
+            copy = None
+            # 窗口向后滚动一个字节
+            old = data[i]
+            literal.append(old)
+            if i + block_size < n:
+                new = data[i + block_size]
+                a = (a - old + new) & 0xFFFF
+                b = (b - block_size * old + a) & 0xFFFF
+            i += 1
+        flush_copy()
+        literal.extend(data[i:])
+        flush_literal()
+        return bytes(delta)
+
+    def sync(self, local_name, remote_name=None, block_size=512):
+        """增量同步：只发送与设备上旧文件不同的部分"""
+        remote_name = remote_name or os.path.basename(local_name)
+        with open(local_name, "rb") as f:
+            data = f.read()
+        self.socket.settimeout(30)
+        start = time.time()
+        self._send_request(f"sync {remote_name} {block_size}")
+        header = self._recv(64)
+        if not self._is_length_header(header):
+            header += self._finish_response()
+            print(f"同步失败: {header.decode(errors='replace')}")
+            return False
+        signature = self.receive_chunked(header)
+        delta = self.make_delta(data, signature, block_size)
+        self.send_chunked(delta)
+        result = (self._recv(4096) + self._finish_response()).decode()
+        if result != f"SYNCED:{len(data)}:{zlib.crc32(data):08x}":
+            print(f"同步失败: {result}")
+            return False
+        wire = len(signature) + len(delta)
+        print(f"已同步 {local_name} -> {remote_name}，传输 {wire} 字节（文件 {len(data)} 字节），用时 {time.time() - start:.2f} 秒")
+        return True
+
     def interactive_mode(self):
         """交互模式"""
         print("进入交互模式，输入'help'查看可用命令，输入'exit'退出")
@@ -135,6 +762,60 @@ class ESP32Client:
                     self.send_command("exit")
                     break
                 
+                # 文件传输命令
+                parts = command.split()
+                if parts[0] == "get" and len(parts) >= 2:
+                    self.download(parts[1], parts[2] if len(parts) > 2 else None)
+                    continue
+                if parts[0] == "cat" and len(parts) >= 2:
+                    content = self.cat(parts[1])
+                    if content is not None:
+                        print(content)
+                    continue
+                if parts[0] == "sync" and len(parts) >= 2:
+                    self.sync(parts[1], parts[2] if len(parts) > 2 else None)
+                    continue
+                if parts[0] == "debug" and len(parts) >= 2 and parts[1] == "tail":
+                    # debug tail [-n 条数] [-f]
+                    try:
+                        lines = int(parts[parts.index("-n") + 1]) if "-n" in parts else 20
+                    except (ValueError, IndexError):
+                        print("格式: debug tail [-n 条数] [-f]")
+                        continue
+                    self.tail(lines, "-f" in parts)
+                    continue
+                if parts[0] == "batch" and len(parts) >= 2:
+                    # 以逗号分隔多条命令，如: batch wifistatus,sysinfo,time
+                    results = self.batch([c.strip() for c in command[6:].split(",") if c.strip()])
+                    for result in results or []:
+                        print(f"[{result['cmd']}] {'' if result['ok'] else '失败: '}{result['output']}")
+                    continue
+                if parts[0] == "stats":
+                    # stats [reset]
+                    if parts[1:] == ["reset"]:
+                        print("统计已清空" if self.stats(reset=True) else "清空统计失败")
+                    else:
+                        result = self.stats()
+                        if result is not None:
+                            print(self.format_stats(result))
+                    continue
+                if parts[0] == "metrics":
+                    # metrics [since]
+                    try:
+                        since = int(parts[1]) if len(parts) > 1 else 0
+                    except ValueError:
+                        print("格式: metrics [since]")
+                        continue
+                    samples = self.metrics(since)
+                    for sample in samples or []:
+                        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sample["time"]))
+                        values = ", ".join(f"{k}={v}" for k, v in sample.items() if k not in ("tier", "time"))
+                        print(f"[{sample['tier']}s] {stamp} {values}")
+                    continue
+                if parts[0] == "upload" and len(parts) >= 2:
+                    self.upload(parts[1], parts[2] if len(parts) > 2 else None)
+                    continue
+                
                 # 普通命令
                 response = self.send_command(command)
                 if response:
@@ -144,40 +825,126 @@ class ESP32Client:
             except Exception as e:
                 print(f"错误: {str(e)}")
 
+class ESP32Session:
+    """持久会话：空闲时定期发送心跳，发现连接断开后按指数退避自动重连。
+    请求和心跳共用一把锁，心跳不会插入到命令的响应中间"""
+
+    # 空闲多少秒后发送心跳
+    HEARTBEAT_INTERVAL = 30
+    # 通过会话转发、需要连接的客户端方法
+    REQUESTS = ("send_command", "batch", "stats", "metrics", "tail", "download", "cat", "upload", "sync", "remote_checksum", "ping")
+
+    def __init__(self, client, heartbeat=HEARTBEAT_INTERVAL, retries=5, backoff=0.5, max_backoff=8):
+        self.client = client
+        self.heartbeat = heartbeat
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_activity = time.time()
+
+    @property
+    def connected(self):
+        """会话关闭前一直视为连接，断开由下一次请求或心跳自动恢复"""
+        return not self._stop.is_set()
+
+    def open(self):
+        """建立连接（失败时按退避重试）并启动心跳线程，返回是否成功"""
+        if not self.client.connect() and not self._reconnect():
+            return False
+        self._last_activity = time.time()
+        if self.heartbeat:
+            self._thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+            self._thread.start()
+        return True
+
+    def close(self):
+        """停止心跳并断开连接"""
+        self._stop.set()
+        with self._lock:
+            self.client.disconnect()
+
+    def _reconnect(self):
+        print("连接已断开，尝试重新连接...")
+        return self.client.reconnect(self.retries, self.backoff, self.max_backoff)
+
+    def _call(self, name, *args, **kwargs):
+        """执行一次请求；连接已断开时先重连，请求中发现断开时留给下一次请求或心跳重连"""
+        with self._lock:
+            if not self.client.connected and not self._reconnect():
+                print("重新连接失败")
+                return None
+            try:
+                return getattr(self.client, name)(*args, **kwargs)
+            except OSError as e:
+                print(f"连接已断开: {str(e)}")
+                self.client.connected = False
+                return None
+            finally:
+                self._last_activity = time.time()
+
+    def __getattr__(self, name):
+        if name in self.REQUESTS:
+            return lambda *args, **kwargs: self._call(name, *args, **kwargs)
+        return getattr(self.client, name)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(1):
+            if time.time() - self._last_activity < self.heartbeat:
+                continue
+            with self._lock:
+                if self._stop.is_set():
+                    break
+                if self.client.connected and self.client.ping() is None:
+                    print("\n心跳无响应")
+                if not self.client.connected:
+                    self._reconnect()
+                self._last_activity = time.time()
+
+    # 交互模式与客户端相同，命令经由会话转发
+    interactive_mode = ESP32Client.interactive_mode
+
 def main():
-    if len(sys.argv) < 2:
-        print("用法: python esp32_client.py <ESP32_IP地址> [端口]")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(args) < 1:
+        print("用法: python esp32_client.py <ESP32_IP地址> [端口] [--no-probe]")
+        print("  --no-probe  跳过连接前的ping和端口测试，直接连接")
         return
     
-    host = sys.argv[1]
-    port = int(sys.argv[2]) if len(sys.argv) > 2 else 5555
+    host = args[0]
+    port = int(args[1]) if len(args) > 1 else 5555
     
     client = ESP32Client(host, port)
     
-    # 首先测试网络连接
-    if not client.test_connection():
-        print("网络连接测试失败，请检查IP地址和网络连接")
-        return
-    
-    # 然后测试端口
-    if not client.test_port():
-        print("端口测试失败，请检查ESP32服务器是否正在运行以及端口是否开放")
-        return
+    # 连接前的网络和端口测试可用 --no-probe 跳过，缩短启动时间
+    if "--no-probe" not in sys.argv:
+        # 首先测试网络连接
+        if not client.test_connection():
+            print("网络连接测试失败，请检查IP地址和网络连接")
+            return
+        
+        # 然后测试端口
+        if not client.test_port():
+            print("端口测试失败，请检查ESP32服务器是否正在运行以及端口是否开放")
+            return
     
-    # 尝试连接
-    if client.connect():
+    # 尝试连接，会话在断开后自动重连
+    session = ESP32Session(client)
+    if session.open():
         try:
             # 连接成功后发送一个测试命令
-            response = client.send_command("hello")
+            response = session.send_command("hello")
             if response:
                 print("测试命令成功!")
             else:
                 print("测试命令失败!")
             
             # 进入交互模式
-            client.interactive_mode()
+            session.interactive_mode()
         finally:
-            client.disconnect()
+            session.close()
     else:
         print("无法连接到ESP32服务器")
 
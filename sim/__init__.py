@@ -0,0 +1,135 @@
+"""ESP32设备模拟器：在CPython上运行esp32/下的固件，用于在普通电脑上测试传输和命令的性能。
+
+sim/modules 中是 machine、network、esp32、bluetooth、urequests、ustruct 的替身模块，
+install() 把它们放到导入路径最前面，并给 gc、time 补上MicroPython特有的函数；
+固件模块中的 os、socket 和 open() 换成 uos、usocket 中的版本：文件只能访问模拟闪存目录，NTP校时不访问外部网络。
+boot() 在一个目录（模拟闪存）中运行 esp32/boot.py，与设备上电时一样执行 main()。
+
+命令行用法见 python -m sim --help。
+"""
+import os
+import sys
+import gc
+import time
+import runpy
+import builtins
+import tracemalloc
+import importlib.machinery
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES_DIR = os.path.join(SIM_DIR, "modules")
+FIRMWARE_DIR = os.path.join(os.path.dirname(SIM_DIR), "esp32")
+BOOT_FILE = os.path.join(FIRMWARE_DIR, "boot.py")
+
+# 模拟的堆大小（字节），无PSRAM的ESP32上MicroPython可用的堆约为110KB
+HEAP_SIZE = 110 * 1024
+# 不跟踪内存时gc.mem_alloc()返回的固定值
+IDLE_ALLOC = 20 * 1024
+
+# MicroPython的ticks在2^30处回绕，模拟相同的回绕行为
+_TICKS_PERIOD = 1 << 30
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALF = _TICKS_PERIOD // 2
+
+def _ticks_ms():
+    return int(time.monotonic() * 1000) & _TICKS_MAX
+
+def _ticks_us():
+    return int(time.monotonic() * 1000000) & _TICKS_MAX
+
+def _ticks_add(ticks, delta):
+    return (ticks + delta) & _TICKS_MAX
+
+def _ticks_diff(end, start):
+    return ((end - start + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF
+
+def _mem_alloc():
+    """已分配的堆内存；开启跟踪时为tracemalloc统计的当前分配量"""
+    if tracemalloc.is_tracing():
+        return min(tracemalloc.get_traced_memory()[0], HEAP_SIZE)
+    return IDLE_ALLOC
+
+def _mem_free():
+    return HEAP_SIZE - _mem_alloc()
+
+# 固件中 import 这些模块时得到的替身模块
+FIRMWARE_IMPORTS = {"os": "uos", "socket": "usocket"}
+
+def _firmware_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if not level and name in FIRMWARE_IMPORTS:
+        name = FIRMWARE_IMPORTS[name]
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+def firmware_builtins():
+    """固件模块的内置命名空间：import 按 FIRMWARE_IMPORTS 换成替身模块，open() 限制在模拟闪存目录"""
+    import uos
+    namespace = dict(vars(builtins))
+    namespace["__import__"] = _firmware_import
+    namespace["open"] = uos.open
+    return namespace
+
+class _FirmwareLoader(importlib.machinery.SourceFileLoader):
+    """加载ep32模块时在执行模块代码之前换上固件的内置命名空间"""
+
+    def exec_module(self, module):
+        module.__builtins__ = firmware_builtins()
+        super().exec_module(module)
+
+class _FirmwareFinder:
+    """为ep32包中的模块使用 _FirmwareLoader"""
+
+    @classmethod
+    def find_spec(cls, name, path=None, target=None):
+        if name.split(".")[0] != "ep32":
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(name, path)
+        if spec and isinstance(spec.loader, importlib.machinery.SourceFileLoader):
+            spec.loader = _FirmwareLoader(spec.loader.name, spec.loader.path)
+        return spec
+
+def install(trace_heap=False):
+    """安装替身模块和MicroPython扩展函数；trace_heap为True时用tracemalloc统计固件的内存分配（会变慢）"""
+    for path in (os.path.join(FIRMWARE_DIR, "lib"), MODULES_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    if _FirmwareFinder not in sys.meta_path:
+        sys.meta_path.insert(0, _FirmwareFinder)
+    gc.mem_alloc = _mem_alloc
+    gc.mem_free = _mem_free
+    time.ticks_ms = _ticks_ms
+    time.ticks_us = _ticks_us
+    time.ticks_add = _ticks_add
+    time.ticks_diff = _ticks_diff
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+    time.sleep_us = lambda us: time.sleep(us / 1000000)
+    # 与设备一致，time.time()和time.localtime()读取RTC，固件校时后随之改变
+    import machine
+    time.time = machine.rtc_time
+    time.localtime = machine.rtc_localtime
+    if trace_heap and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def _unload_firmware():
+    """卸载已导入的固件模块，重启时重新执行模块级代码（与设备复位一致）"""
+    for name in list(sys.modules):
+        if name == "ep32" or name.startswith("ep32."):
+            del sys.modules[name]
+
+def boot(root, settings=None):
+    """在root目录中启动固件，settings为覆盖ep32.config的配置项；固件调用machine.reset()时重新启动"""
+    import machine
+    os.makedirs(root, exist_ok=True)
+    os.chdir(root)
+    while True:
+        _unload_firmware()
+        import ep32.config as config
+        for name, value in (settings or {}).items():
+            if not hasattr(config, name):
+                raise ValueError(f"未知的配置项: {name}")
+            setattr(config, name, value)
+        try:
+            runpy.run_path(BOOT_FILE, {"__builtins__": firmware_builtins()}, run_name="__main__")
+            return
+        except machine.ResetRequested as e:
+            print(f"[sim] {e}，重新启动")
+            machine.Timer.deinit_all()
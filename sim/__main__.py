@@ -0,0 +1,49 @@
+"""命令行入口：python -m sim [--root 目录] [--port 端口] [--metrics-port 端口] [--http 主机:端口] [--set 配置项=值 ...]"""
+import argparse
+import ast
+import tempfile
+
+import sim
+
+def _parse_setting(text):
+    """解析 配置项=值，值按Python字面量解析，解析失败时作为字符串"""
+    name, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"格式应为 配置项=值: {text}")
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass
+    return name.strip(), value
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m sim", description="在本机上运行ESP32固件")
+    parser.add_argument("--root", help="模拟闪存的目录，默认为新建的临时目录")
+    parser.add_argument("--port", type=int, default=5555, help="服务器监听端口，默认5555")
+    parser.add_argument("--metrics-port", type=int, default=9100, help="监控指标HTTP端口，默认9100，设为0不启动")
+    parser.add_argument("--ip", default="127.0.0.1", help="Wi-Fi接口报告的IP地址")
+    parser.add_argument("--http", metavar="主机:端口", help="把urequests的请求转发到本地替身服务器，路径为 /<原主机><原路径>")
+    parser.add_argument("--set", dest="settings", metavar="配置项=值", type=_parse_setting, action="append", default=[],
+                        help="覆盖ep32.config中的配置，如 --set SERVER_MODE=async --set LOG_LEVEL=error")
+    parser.add_argument("--trace-heap", action="store_true", help="用tracemalloc统计gc.mem_alloc()（较慢）")
+    args = parser.parse_args()
+
+    sim.install(trace_heap=args.trace_heap)
+    import network
+    import urequests
+    network.ip = args.ip
+    if args.http:
+        host, port = args.http.rsplit(":", 1)
+        urequests.standin = (host, int(port))
+    settings = dict(args.settings)
+    settings.setdefault("SERVER_PORT", args.port)
+    settings.setdefault("METRICS_PORT", args.metrics_port or None)
+    root = args.root or tempfile.mkdtemp(prefix="esp32-sim-")
+    print(f"[sim] 闪存目录: {root}，端口: {settings['SERVER_PORT']}")
+    try:
+        sim.boot(root, settings)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
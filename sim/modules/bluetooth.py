@@ -0,0 +1,27 @@
+# bluetooth.py
+# 模拟器中的bluetooth模块：只记录广播参数，不收发数据
+
+class BLE:
+    def __init__(self):
+        self._active = False
+        self._config = {"gap_name": "ESP32"}
+        self.advertising = None
+
+    def active(self, active=None):
+        if active is None:
+            return self._active
+        self._active = bool(active)
+        return self._active
+
+    def config(self, *args, **kwargs):
+        if args:
+            return self._config[args[0]]
+        self._config.update(kwargs)
+
+    def irq(self, handler):
+        self._irq = handler
+
+    def gap_advertise(self, interval_us, adv_data=None, resp_data=None, connectable=True):
+        if not self._active:
+            raise OSError("BLE未激活")
+        self.advertising = None if interval_us is None else (interval_us, adv_data)
@@ -0,0 +1,10 @@
+# esp32.py
+# 模拟器中的esp32模块：片上传感器返回固定读数
+
+# 内部温度（华氏度），与设备上的raw_temperature()一致
+temperature_f = 120
+
+def raw_temperature():
+    return temperature_f
+
+# 新版固件已移除霍尔传感器，这里同样不提供hall_sensor()
@@ -0,0 +1,126 @@
+# machine.py
+# 模拟器中的machine模块：引脚、定时器、RTC、CPU频率和复位
+import threading
+import time
+
+# machine.reset()抛出的异常，模拟器捕获后重新启动固件
+class ResetRequested(SystemExit):
+    pass
+
+# GPIO引脚，只记录电平；changes记录每次电平变化的时间，便于检查LED闪烁
+class Pin:
+    IN = 1
+    OUT = 3
+    OPEN_DRAIN = 7
+    PULL_UP = 2
+    PULL_DOWN = 1
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = mode
+        self._value = 0
+        self.changes = []
+        if value is not None:
+            self.value(value)
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        value = 1 if value else 0
+        if value != self._value:
+            self.changes.append((time.monotonic(), value))
+            del self.changes[:-64]
+        self._value = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+# 软件定时器：设备上回调在主循环的间隙执行，这里由后台线程按周期调用
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+    # 运行中的定时器，模拟器重启固件时全部停止
+    _running = set()
+
+    def __init__(self, id=-1):
+        self.id = id
+        self._stop = None
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=None):
+        self.deinit()
+        if freq:
+            period = 1000 / freq
+        stop = threading.Event()
+        self._stop = stop
+        Timer._running.add(self)
+
+        def run():
+            while not stop.wait(period / 1000):
+                callback(self)
+                if mode == Timer.ONE_SHOT:
+                    break
+        threading.Thread(target=run, daemon=True).start()
+
+    def deinit(self):
+        if self._stop:
+            self._stop.set()
+            self._stop = None
+        Timer._running.discard(self)
+
+    # 模拟器专用：停止所有定时器
+    @classmethod
+    def deinit_all(cls):
+        for timer in list(cls._running):
+            timer.deinit()
+
+# 主机时间，RTC设置的时间以偏移量叠加在其上
+_host_time = time.time
+_host_localtime = time.localtime
+
+# 实时时钟：设置时间时记录与主机时间的差值，不改变主机时间；之后读取RTC、time.time()和
+# time.localtime()（由sim.install()替换）都按设置的时间继续走
+class RTC:
+    # 设置的时间减去主机时间（秒）
+    _offset = 0
+
+    def datetime(self, datetimetuple=None):
+        if datetimetuple is not None:
+            year, month, day, weekday, hour, minute, second = tuple(datetimetuple)[:7]
+            RTC._offset = time.mktime((year, month, day, hour, minute, second, 0, 0, -1)) - int(_host_time())
+            return
+        tm = rtc_localtime()
+        return (tm[0], tm[1], tm[2], tm[6], tm[3], tm[4], tm[5], 0)
+
+# 模拟器专用：按RTC计算的当前时间（秒）
+def rtc_time():
+    return _host_time() + RTC._offset
+
+# 模拟器专用：按RTC计算的本地时间，secs为None时取当前时间
+def rtc_localtime(secs=None):
+    return _host_localtime(rtc_time() if secs is None else secs)
+
+_freq = 240000000
+
+def freq(hz=None):
+    global _freq
+    if hz is None:
+        return _freq
+    _freq = hz
+
+def unique_id():
+    return b"\x24\x0a\xc4\x00\x00\x01"
+
+def reset():
+    raise ResetRequested("machine.reset()")
+
+def soft_reset():
+    raise ResetRequested("machine.soft_reset()")
+
+def idle():
+    time.sleep(0.001)
@@ -0,0 +1,77 @@
+# network.py
+# 模拟器中的network模块：Wi-Fi接口在模拟器中总是连接到本机
+import time
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+
+# 模拟器的网络参数，由sim在启动前设置
+ip = "127.0.0.1"
+# 调用connect()后多少秒连上，设为None模拟无法连接
+connect_delay = 0
+rssi = -50
+
+# 每个接口只有一个实例，与设备上的行为一致
+_interfaces = {}
+
+class WLAN:
+    def __new__(cls, interface_id=STA_IF):
+        if interface_id not in _interfaces:
+            wlan = object.__new__(cls)
+            wlan.interface_id = interface_id
+            wlan._active = False
+            wlan._connected_at = None
+            wlan._config = {"mac": b"\x24\x0a\xc4\x00\x00\x01", "essid": ""}
+            _interfaces[interface_id] = wlan
+        return _interfaces[interface_id]
+
+    def __init__(self, interface_id=STA_IF):
+        pass
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+        if not self._active:
+            self._connected_at = None
+
+    def connect(self, ssid=None, key=None, **kwargs):
+        self._config["essid"] = ssid
+        if connect_delay is not None:
+            self._connected_at = time.monotonic() + connect_delay
+
+    def disconnect(self):
+        self._connected_at = None
+
+    def isconnected(self):
+        return self._active and self._connected_at is not None and time.monotonic() >= self._connected_at
+
+    def status(self, param=None):
+        if param == "rssi":
+            return rssi
+        if param is not None:
+            raise ValueError("unknown status param")
+        if self.isconnected():
+            return STAT_GOT_IP
+        return STAT_CONNECTING if self._connected_at is not None else STAT_IDLE
+
+    def ifconfig(self, config=None):
+        global ip
+        if config is not None:
+            ip = config[0]
+            return
+        if not self.isconnected():
+            return ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+        return (ip, "255.255.255.0", ip, ip)
+
+    def config(self, *args, **kwargs):
+        if args:
+            return self._config[args[0]]
+        self._config.update(kwargs)
+
+    def scan(self):
+        return []
@@ -0,0 +1,46 @@
+# uos.py
+# 模拟器中固件的os模块（固件里的 import os 得到本模块）：文件操作限制在模拟闪存目录中。
+# 模拟器启动时已切换到该目录，固件只能使用其中的相对路径，绝对路径和含..的路径一律拒绝，
+# 监听0.0.0.0的模拟器不会把主机上的其他文件暴露给客户端
+import errno
+import os as _os
+import builtins as _builtins
+
+sep = "/"
+
+# 检查路径并原样返回，越出模拟闪存目录时抛出OSError
+def _confine(path):
+    path = _os.fspath(path)
+    if isinstance(path, bytes):
+        path = path.decode()
+    if _os.path.isabs(path) or path.startswith(("/", "\\")) or ".." in path.replace("\\", "/").split("/"):
+        raise OSError(errno.EACCES, "模拟器只允许访问闪存目录中的相对路径", path)
+    return path
+
+# 固件命名空间中的open()
+def open(file, mode="r", *args, **kwargs):
+    return _builtins.open(_confine(file), mode, *args, **kwargs)
+
+def listdir(path=""):
+    return _os.listdir(_confine(path) if path else ".")
+
+def stat(path):
+    return tuple(_os.stat(_confine(path)))
+
+def remove(path):
+    _os.remove(_confine(path))
+
+def rename(old, new):
+    _os.rename(_confine(old), _confine(new))
+
+def mkdir(path):
+    _os.mkdir(_confine(path))
+
+def rmdir(path):
+    _os.rmdir(_confine(path))
+
+def getcwd():
+    return "/"
+
+def urandom(n):
+    return _os.urandom(n)
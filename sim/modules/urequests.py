@@ -0,0 +1,109 @@
+# urequests.py
+# 模拟器中的urequests模块：与MicroPython的urequests一样用HTTP/1.0发送请求，
+# raw为响应体的流（读到响应头之后）
+# 设置standin=(主机, 端口)后所有请求转发到本地替身服务器，路径为 /<原主机><原路径>，便于离线测试
+import json as _json
+import socket
+
+standin = None
+
+class Response:
+    def __init__(self, sock, raw):
+        self._sock = sock
+        self.raw = raw
+        self.status_code = None
+        self.reason = b""
+        self.headers = {}
+        self._cached = None
+
+    def close(self):
+        if self.raw:
+            self.raw.close()
+            self.raw = None
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    @property
+    def content(self):
+        if self._cached is None:
+            try:
+                self._cached = self.raw.read()
+            finally:
+                self.close()
+        return self._cached
+
+    @property
+    def text(self):
+        return str(self.content, "utf-8")
+
+    def json(self):
+        return _json.loads(self.content)
+
+def request(method, url, data=None, json=None, headers=None, timeout=None, **kwargs):
+    try:
+        proto, _, host, path = url.split("/", 3)
+    except ValueError:
+        proto, _, host = url.split("/", 2)
+        path = ""
+    if proto not in ("http:", "https:"):
+        raise ValueError("Unsupported protocol: " + proto)
+    if standin:
+        address = standin
+        path = host + "/" + path
+    else:
+        if proto == "https:":
+            raise OSError("模拟器不支持https，请设置替身服务器")
+        if ":" in host:
+            name, port = host.split(":", 1)
+            address = (name, int(port))
+        else:
+            address = (host, 80)
+    if json is not None:
+        data = _json.dumps(json)
+    if isinstance(data, str):
+        data = data.encode()
+    sock = socket.create_connection(address, timeout)
+    try:
+        request_head = f"{method} /{path} HTTP/1.0\r\nHost: {host}\r\n"
+        for name, value in (headers or {}).items():
+            request_head += f"{name}: {value}\r\n"
+        if data:
+            request_head += f"Content-Length: {len(data)}\r\n"
+        sock.sendall(request_head.encode() + b"\r\n")
+        if data:
+            sock.sendall(data)
+        raw = sock.makefile("rb")
+        line = raw.readline().split(None, 2)
+        if len(line) < 2:
+            raise OSError("无效的HTTP响应")
+        response = Response(sock, raw)
+        response.status_code = int(line[1])
+        if len(line) > 2:
+            response.reason = line[2].rstrip()
+        while True:
+            line = raw.readline()
+            if not line or line == b"\r\n":
+                break
+            if b":" in line:
+                name, value = line.decode().split(":", 1)
+                response.headers[name.strip()] = value.strip()
+        return response
+    except:
+        sock.close()
+        raise
+
+def head(url, **kwargs):
+    return request("HEAD", url, **kwargs)
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+def put(url, **kwargs):
+    return request("PUT", url, **kwargs)
+
+def delete(url, **kwargs):
+    return request("DELETE", url, **kwargs)
@@ -0,0 +1,34 @@
+# usocket.py
+# 模拟器中固件的socket模块（固件里的 import socket 得到本模块）：TCP与本机socket相同；
+# 发往NTP端口的UDP请求由模拟的时间服务器按主机时间立即回复，不解析域名也不访问外部网络
+import struct
+import socket as _socket
+import machine
+from socket import *
+
+NTP_PORT = 123
+# 1900年（NTP时间戳的起点）到1970年的秒数，回复的是主机时间，不受RTC设置影响
+NTP_DELTA = 2208988800
+
+def getaddrinfo(host, port, *args):
+    if port == NTP_PORT:
+        return [(AF_INET, SOCK_DGRAM, IPPROTO_UDP, "", ("127.0.0.1", NTP_PORT))]
+    return _socket.getaddrinfo(host, port, *args)
+
+class socket(_socket.socket):
+    _ntp_reply = None
+
+    def sendto(self, data, *args):
+        if self.type == SOCK_DGRAM and args[-1][1] == NTP_PORT:
+            reply = bytearray(48)
+            reply[0] = 0x24
+            struct.pack_into("!I", reply, 40, int(machine._host_time()) + NTP_DELTA)
+            self._ntp_reply = bytes(reply)
+            return len(data)
+        return super().sendto(data, *args)
+
+    def recv(self, size, *args):
+        if self._ntp_reply is not None:
+            reply, self._ntp_reply = self._ntp_reply[:size], None
+            return reply
+        return super().recv(size, *args)
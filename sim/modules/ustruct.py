@@ -0,0 +1,3 @@
+# ustruct.py
+# 模拟器中的ustruct模块，与CPython的struct相同
+from struct import *
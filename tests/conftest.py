@@ -0,0 +1,31 @@
+"""测试的公共夹具：模拟器子进程复用 bench/harness.py 的 Simulator，进程内的固件由 load_firmware() 加载。"""
+import os
+import sys
+
+import pytest
+
+# 放在最后，bench下的脚本名不会遮蔽标准库模块
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+
+from harness import Simulator, load_firmware
+
+@pytest.fixture
+def simulator():
+    """启动模拟器的函数 start(settings, **options)，返回已启动的 Simulator，测试结束时全部停止"""
+    started = []
+
+    def start(settings=None, **options):
+        sim = Simulator(settings, **options)
+        started.append(sim)
+        return sim.start()
+
+    yield start
+    for sim in started:
+        sim.__exit__(None, None, None)
+
+@pytest.fixture
+def firmware(tmp_path, monkeypatch):
+    """在当前进程中加载固件，模拟闪存为tmp_path，测试结束后恢复工作目录"""
+    monkeypatch.chdir(tmp_path)
+    load_firmware(root=str(tmp_path))
+    return tmp_path
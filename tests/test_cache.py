@@ -0,0 +1,94 @@
+"""位置和天气查询的缓存：通过urequests.standin访问本地替身服务器，检查命中、过期后先返回旧值再刷新、
+失败退避、持久化和条目上限，以及天气字段由流式JSON扫描提取。"""
+import time
+
+import pytest
+
+from harness import IPINFO, StandinServer, wttr_payload
+
+@pytest.fixture
+def standin(firmware, monkeypatch):
+    import urequests
+    from ep32.cache import ttl_cache
+    with StandinServer.weather() as server:
+        monkeypatch.setattr(urequests, "standin", server.address)
+        ttl_cache.clear()
+        yield server
+    ttl_cache.clear()
+
+def test_location_is_cached(standin):
+    from ep32.utils import get_ip_location
+    first = get_ip_location()
+    assert first["city"] == IPINFO["city"]
+    assert (first["lat"], first["lon"]) == (30.2936, 120.1614)
+    assert get_ip_location() == first
+    assert standin.hits["/ipinfo.io/"] == 1
+
+def test_weather_fields_come_from_scanner(standin):
+    from ep32.utils import get_weather
+    current = wttr_payload()["current_condition"][0]
+    weather = get_weather()
+    assert weather["temperature"] == current["temp_C"]
+    assert weather["description"] == "Partly cloudy"
+    assert weather["uv_index"] == current["uvIndex"]
+    assert get_weather() == weather
+    assert standin.hits == {"/ipinfo.io/": 1, "/wttr.in/": 1}
+
+def test_stale_entry_answers_instantly_and_refreshes_later(standin):
+    from ep32.cache import ttl_cache, refresh_cache
+    from ep32.config import WEATHER_TTL
+    from ep32.utils import get_weather
+    weather = get_weather()
+    # 过期但仍在可用期内；替身服务器变慢，命令不应等待它
+    ttl_cache.entries["weather"][1] -= WEATHER_TTL + 1
+    standin.delay = 0.5
+    started = time.monotonic()
+    assert get_weather() == weather
+    assert time.monotonic() - started < 0.1
+    assert standin.hits["/wttr.in/"] == 1
+    # 回复之后由主循环执行登记的刷新
+    assert refresh_cache()
+    assert standin.hits["/wttr.in/"] == 2
+    assert not refresh_cache()
+    assert time.time() - ttl_cache.entries["weather"][1] < WEATHER_TTL
+
+def test_failure_is_not_retried_on_every_command(standin):
+    from ep32.utils import get_ip_location
+    standin.status = 500
+    standin.routes["/ipinfo.io/"] = b"{}"
+    assert "error" in get_ip_location()
+    assert "error" in get_ip_location()
+    assert standin.hits["/ipinfo.io/"] == 1
+
+def test_persisted_entries_survive_reboot(standin):
+    from ep32.cache import TTLCache
+    from ep32.utils import get_ip_location
+    location = get_ip_location()
+    # 新建的缓存对象（如重启后）从闪存加载，不再请求
+    rebooted = TTLCache()
+    assert rebooted.get("location", lambda: pytest.fail("不应重新加载"), 3600) == location
+    assert standin.hits["/ipinfo.io/"] == 1
+
+def test_entries_are_limited(firmware):
+    from ep32.cache import TTLCache
+    cache = TTLCache(max_entries=2, filename="limited.json")
+    for key in ("a", "b", "c"):
+        cache.put(key, key, 60)
+        time.sleep(0.01)
+    assert sorted(cache.entries) == ["b", "c"]
+
+def test_store_replaces_file_on_filesystems_without_overwrite(firmware, monkeypatch):
+    from ep32 import cache
+    rename = cache.os.rename
+
+    # FAT等文件系统上目标文件已存在时rename失败
+    def fat_rename(old, new):
+        if new in cache.os.listdir():
+            raise OSError(17, "EEXIST")
+        rename(old, new)
+
+    monkeypatch.setattr(cache.os, "rename", fat_rename)
+    store = cache.TTLCache(filename="fat.json")
+    store.put("location", "first", 3600, persist=True)
+    store.put("location", "second", 3600, persist=True)
+    assert cache.TTLCache(filename="fat.json").get("location", lambda: pytest.fail("不应重新加载"), 3600) == "second"
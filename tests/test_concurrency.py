@@ -0,0 +1,95 @@
+"""多客户端并发：20个以上的客户端同时执行命令和上传，其中一个客户端的上传中途停止发送；
+各模式按MAX_CLIENTS限制会话数；命令关闭连接后事件循环回到空闲。"""
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from harness import payload
+
+CLIENTS = 20
+
+@pytest.mark.parametrize("mode", ["poll", "async"])
+def test_concurrent_clients_with_stalled_transfer(simulator, tmp_path, mode):
+    # 连接数上限放宽到能容纳全部客户端；传输命令同步执行，停滞的上传会让其他会话等待一次TRANSFER_TIMEOUT，
+    # 调低它只是为了缩短测试
+    sim = simulator({"SERVER_MODE": mode, "MAX_CLIENTS": CLIENTS + 4, "TRANSFER_TIMEOUT": 1, "LOG_LEVEL": "error"})
+
+    # 上传声明了100000字节，之后不再发送数据
+    stalled = sim.client(compress=False)
+    stalled._send_request("upload stall.bin")
+    assert stalled._recv(64) == b"READY"
+    stalled.socket.sendall(b"100000")
+    assert stalled._recv(2) == b"OK"
+
+    def session(index):
+        client = sim.client()
+        try:
+            for _ in range(3):
+                assert client.send_command("hello") == "你好，esp32单片机"
+            source = tmp_path / f"source{index}.bin"
+            source.write_bytes(payload(8192, seed=index))
+            assert client.upload(str(source), f"client{index}.bin")
+            return index
+        finally:
+            client.disconnect()
+
+    started = time.time()
+    with ThreadPoolExecutor(CLIENTS) as pool:
+        served = list(pool.map(session, range(CLIENTS)))
+    elapsed = time.time() - started
+    assert served == list(range(CLIENTS))
+    # 停滞的传输只让其他会话等待一次TRANSFER_TIMEOUT，超时后被放弃
+    assert elapsed < 10
+    for index in range(CLIENTS):
+        with open(sim.path(f"client{index}.bin"), "rb") as f:
+            assert f.read() == payload(8192, seed=index)
+
+    # 停滞的传输在超时后被放弃，该会话仍可继续使用
+    stalled.socket.settimeout(5)
+    assert (stalled._recv(64) + stalled._finish_response()).decode() == "文件上传失败"
+    assert stalled.send_command("hello") == "你好，esp32单片机"
+    stalled.disconnect()
+
+def _rejected(sim):
+    """新连接是否被立即关闭（未收到握手消息）"""
+    with socket.create_connection(("127.0.0.1", sim.port), timeout=5) as s:
+        return s.recv(16) == b""
+
+@pytest.mark.parametrize("mode", ["poll", "async"])
+def test_sessions_are_capped_at_max_clients(simulator, mode):
+    sim = simulator({"SERVER_MODE": mode, "MAX_CLIENTS": 2, "LOG_LEVEL": "error"})
+    first = sim.client()
+    second = sim.client()
+    assert _rejected(sim)
+    # 已有会话不受影响，断开一个后可以再连接
+    assert first.send_command("hello") == "你好，esp32单片机"
+    second.disconnect()
+    time.sleep(0.2)
+    third = sim.client()
+    assert third.send_command("hello") == "你好，esp32单片机"
+    first.disconnect()
+    third.disconnect()
+
+def _cpu_seconds(pid):
+    """进程已用的CPU时间（用户态+内核态，秒）"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="需要/proc统计进程CPU时间")
+def test_loop_is_idle_after_exit_closes_socket(simulator):
+    sim = simulator({"SERVER_MODE": "poll", "LOG_LEVEL": "error"})
+    client = sim.client()
+    # exit在返回前已关闭socket，事件循环仍须注销它，否则poll不断返回POLLNVAL
+    client.send_command("exit")
+    client.disconnect()
+    time.sleep(0.2)
+    before = _cpu_seconds(sim.process.pid)
+    time.sleep(1)
+    assert _cpu_seconds(sim.process.pid) - before < 0.3
+    other = sim.client()
+    assert other.send_command("hello") == "你好，esp32单片机"
+    other.disconnect()
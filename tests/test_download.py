@@ -0,0 +1,32 @@
+"""下载：文件名可以含空格，可选的偏移和长度从参数右边解析。"""
+from harness import payload
+
+def test_get_filename_with_spaces(simulator, tmp_path):
+    sim = simulator()
+    data = payload(5000)
+    sim.write_file("my file.txt", data)
+    # 文件名以数字结尾时按已存在的文件名处理
+    sim.write_file("log 2", data[:100])
+    client = sim.client()
+    assert client.download("my file.txt", str(tmp_path / "full.bin"))
+    assert (tmp_path / "full.bin").read_bytes() == data
+    assert client.download("log 2", str(tmp_path / "log.bin"))
+    assert (tmp_path / "log.bin").read_bytes() == data[:100]
+    # 断点续传：从本地 .part 文件的大小处继续
+    (tmp_path / "part.bin.part").write_bytes(data[:1234])
+    assert client.download("my file.txt", str(tmp_path / "part.bin"))
+    assert (tmp_path / "part.bin").read_bytes() == data
+    assert client.send_command("checksum my file.txt sha256").startswith("CHECKSUM:")
+    client.disconnect()
+
+def test_get_range_after_filename_with_spaces(firmware):
+    from ep32.server import _parse_range_args
+    with open("my file.txt", "wb") as f:
+        f.write(b"x")
+    with open("log 2", "wb") as f:
+        f.write(b"x")
+    assert _parse_range_args("my file.txt") == ("my file.txt", 0, None)
+    assert _parse_range_args(" my file.txt  10  20 ") == ("my file.txt", 10, 20)
+    assert _parse_range_args("log 2 100") == ("log 2", 100, None)
+    assert _parse_range_args("missing 5") == ("missing", 5, None)
+    assert _parse_range_args("a.txt -1") == ("a.txt", -1, None)
@@ -0,0 +1,84 @@
+"""LED闪烁由定时器驱动：用记录调用线程的假引脚检查命令立即返回，闪烁只在定时器线程中进行。"""
+import runpy
+import threading
+import time
+
+import pytest
+
+# 记录每次电平变化的线程和时间
+class FakePin:
+    def __init__(self):
+        self.level = 0
+        self.changes = []
+
+    def value(self, value=None):
+        if value is None:
+            return self.level
+        if value != self.level:
+            self.changes.append((threading.current_thread(), time.monotonic(), value))
+        self.level = value
+
+# 回复直接丢弃
+class NullSocket:
+    def send(self, data):
+        return len(data)
+
+@pytest.fixture
+def led(firmware, monkeypatch):
+    import machine
+    from ep32 import led
+    monkeypatch.setattr(led, "led_pin", FakePin())
+    led.led_stop()
+    yield led
+    machine.Timer.deinit_all()
+    led._timer = None
+    led.led_stop()
+
+def wait_idle(led, timeout=3):
+    """等待队列中的闪烁全部播放完"""
+    deadline = time.monotonic() + timeout
+    while (led._queue or led._current is not None) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not led._queue and led._current is None, "闪烁没有在预期时间内播放完"
+
+def test_blink_command_returns_before_blinking(led):
+    started = time.monotonic()
+    led.cmd_blink(NullSocket(), "20 0.5", {})
+    assert time.monotonic() - started < 0.05
+    # 命令返回时至多刚点亮，其余亮灭都留给定时器
+    assert len(led.led_pin.changes) <= 1
+    led.led_stop()
+
+def test_pattern_plays_on_timer_thread(led):
+    caller = threading.current_thread()
+    started = time.monotonic()
+    led.cmd_blink(NullSocket(), "3 0.1", {})
+    wait_idle(led)
+    changes = led.led_pin.changes
+    assert [value for _, _, value in changes] == [1, 0] * 3
+    assert all(thread is not caller for thread, _, _ in changes)
+    # 每次亮灭持续约100ms，由定时器节拍推进而不是调用者sleep
+    durations = [b[1] - a[1] for a, b in zip(changes, changes[1:])]
+    assert min(durations) >= 0.08
+    assert changes[-1][1] - started >= 0.5
+
+def test_full_queue_never_blocks(led):
+    from ep32.config import LED_QUEUE_MAX
+    cl = NullSocket()
+    started = time.monotonic()
+    for _ in range(200):
+        led.cmd_blink(cl, "5 0.5", {})
+    assert time.monotonic() - started < 0.1
+    assert len(led._queue) <= LED_QUEUE_MAX
+
+def test_commands_are_not_delayed_by_led(led):
+    import sim
+    handle = runpy.run_path(sim.BOOT_FILE, run_name="test")["handle_client_command"]
+    cl = NullSocket()
+    credentials = {"username": "root", "password": "root"}
+    # hello、未知命令都会触发闪烁（原来各自阻塞约1秒）
+    for data in (b"hello", b"bogus", b"blink 20 0.5", b"time"):
+        started = time.monotonic()
+        handle(cl, data, credentials, {"window": 1, "compress": False, "frame": False})
+        assert time.monotonic() - started < 0.05, data
+    assert led._queue or led._current is not None
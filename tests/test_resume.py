@@ -0,0 +1,37 @@
+"""断点续传：中断的上传从断点继续；本地文件在两次上传之间被修改时从头上传，设备上的文件不会混合新旧内容。"""
+import pytest
+
+from harness import payload
+
+SIZE = 16 * 1024
+
+def _interrupted_upload(sim, data, sent):
+    """上传data，只发送前sent字节后断开连接，设备保存断点"""
+    client = sim.client(compress=False)
+    client._send_request("upload target.bin")
+    assert client._recv(64) == b"READY"
+    client.socket.sendall(str(len(data)).encode())
+    assert client._recv_exact(2) == b"OK"
+    client.socket.sendall(data[:sent])
+    client.disconnect()
+
+@pytest.mark.parametrize("modified", [False, True])
+def test_resume_checks_local_prefix(simulator, tmp_path, modified):
+    sim = simulator({"CHECKPOINT_BYTES": 1024, "LOG_LEVEL": "debug"})
+    original = payload(SIZE, seed=1)
+    _interrupted_upload(sim, original, SIZE // 2)
+    local = bytearray(original)
+    if modified:
+        local[100:110] = b"0123456789"
+    source = tmp_path / "source.bin"
+    source.write_bytes(local)
+
+    client = sim.client()
+    assert client.upload(str(source), "target.bin")
+    client.disconnect()
+    with open(sim.path("target.bin"), "rb") as f:
+        assert f.read() == local
+    # 未修改时从断点继续，修改后从0开始接收
+    received = [line for line in sim.log().splitlines() if "恢复位置" in line][-1]
+    assert ("恢复位置: 0," in received) == modified
+    assert ("客户端文件已改变" in sim.log()) == modified
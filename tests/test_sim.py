@@ -0,0 +1,24 @@
+"""模拟器：固件只能访问模拟闪存目录中的文件，NTP校时不访问外部网络。"""
+import os
+
+def test_paths_outside_flash_are_rejected(simulator, tmp_path):
+    sim = simulator()
+    outside = tmp_path / "outside.txt"
+    outside.write_text("host")
+    client = sim.client()
+    # 绝对路径和含..的路径不能读写主机上的文件
+    assert client.cat(str(outside)) is None
+    assert client.cat(os.path.join("..", os.path.basename(sim.log_name))) is None
+    assert "错误" in client.send_command(f"write {outside} changed")
+    assert "错误" in client.send_command(f"write ../escape.txt changed")
+    assert outside.read_text() == "host"
+    assert not os.path.exists(os.path.join(os.path.dirname(sim.root), "escape.txt"))
+    # 闪存目录中的相对路径照常使用
+    assert client.send_command("write notes.txt hello") == "文件 notes.txt 已保存"
+    assert client.cat("notes.txt") == "hello"
+    client.disconnect()
+
+def test_ntp_sync_is_answered_locally(simulator):
+    sim = simulator({"LOG_LEVEL": "debug"})
+    assert "时间已同步" in sim.log()
+    assert "时间同步失败" not in sim.log()
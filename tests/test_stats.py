@@ -0,0 +1,20 @@
+"""运行统计：按命令名记录次数和字节数，监控指标的字节计数注明只包括分块传输。"""
+import urllib.request
+
+def test_commands_are_counted_by_verb(simulator):
+    sim = simulator(metrics=True)
+    client = sim.client()
+    client.stats(reset=True)
+    client.send_command("hello")
+    client.send_command("write notes.txt a b c")
+    client.send_command("nosuch command")
+    commands = client.stats()["commands"]
+    assert commands["hello"]["count"] == 1
+    assert commands["write"]["count"] == 1
+    assert commands["write"]["rx"] == len("write notes.txt a b c")
+    assert "nosuch" not in commands
+    client.disconnect()
+    with urllib.request.urlopen(f"http://127.0.0.1:{sim.metrics_port}/metrics", timeout=5) as response:
+        metrics = response.read().decode()
+    assert 'esp32_commands_total{command="write"} 1' in metrics
+    assert "esp32_command_chunked_sent_bytes_total" in metrics
@@ -0,0 +1,67 @@
+"""流式下载：get 和 cat 发送比模拟堆（110KB）大得多的文件时，堆占用有上限，不随文件大小增长。"""
+import os
+import socket
+import tracemalloc
+import zlib
+
+import pytest
+
+import sim
+from harness import ESP32Client, payload
+
+# 客户端收到的数据只计算CRC32，不保存
+class _Crc:
+    def __init__(self):
+        self.value = 0
+
+    def write(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+def _serve(command, filename, window):
+    """当前进程执行命令处理函数，客户端在子进程中接收并校验；返回处理期间的内存峰值（字节）"""
+    from ep32 import server
+    handler = {"get": server.cmd_get, "cat": server.cmd_cat}[command]
+    with open(filename, "rb") as f:
+        expected = zlib.crc32(f.read())
+    ours, theirs = socket.socketpair()
+    pid = os.fork()
+    if pid == 0:
+        # 子进程无论成败都直接退出，不回到pytest
+        ok = False
+        try:
+            ours.close()
+            client = ESP32Client("local", window=window, compress=False, framed=False)
+            client.socket = theirs
+            client.connected = True
+            sink = _Crc()
+            client.receive_chunked(client._recv(64), sink)
+            # get在数据之后发送完成标志
+            ok = sink.value == expected and (command != "get" or client._recv_exact(8) == b"COMPLETE")
+        finally:
+            os._exit(0 if ok else 1)
+    theirs.close()
+    session = {"addr": "local", "window": window, "compress": False, "frame": False}
+    # 客户端在子进程中，统计到的只有固件的分配
+    tracemalloc.start()
+    try:
+        handler(ours, filename, session)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        ours.close()
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0, "客户端收到的数据与文件不一致"
+    return peak
+
+@pytest.mark.parametrize("window", [1, 8])
+@pytest.mark.parametrize("command", ["get", "cat"])
+def test_streaming_heap_is_bounded(firmware, command, window):
+    with open("small.bin", "wb") as f:
+        f.write(payload(16 * 1024))
+    with open("large.bin", "wb") as f:
+        f.write(payload(4 * sim.HEAP_SIZE, seed=2))
+    small = _serve(command, "small.bin", window)
+    large = _serve(command, "large.bin", window)
+    # 文件是堆的4倍，峰值仍只是一小部分，且与16KB的文件相差无几
+    assert large < sim.HEAP_SIZE // 8
+    assert large - small < 2048
@@ -0,0 +1,18 @@
+"""增量同步：客户端指定的块大小超出范围时回复格式错误，不在设备上分配缓冲区，会话仍可继续使用。"""
+import pytest
+
+from harness import payload
+
+@pytest.mark.parametrize("block_size", [-1, 0, 32, 1 << 30])
+def test_block_size_out_of_range_is_rejected(simulator, tmp_path, block_size):
+    sim = simulator()
+    source = tmp_path / "source.bin"
+    source.write_bytes(payload(4096))
+    client = sim.client()
+    assert not client.sync(str(source), "target.bin", block_size=block_size)
+    assert "块大小无效" in client.send_command(f"sync target.bin {block_size}")
+    # 默认块大小照常同步
+    assert client.sync(str(source), "target.bin")
+    client.disconnect()
+    with open(sim.path("target.bin"), "rb") as f:
+        assert f.read() == source.read_bytes()